@@ -0,0 +1,180 @@
+"""Admission control for the render endpoints
+
+Each gunicorn worker serves a fixed number of threads. Without a limit an
+end-of-month burst of invoices takes every thread and queues the rest, so
+even /health stops answering. init_admission(app, render_endpoints) puts a
+bounded pool of cost units in front of every request:
+
+- a render request costs 1 unit plus 1 per TRIPS_PER_UNIT trips (the
+  multiple_trips / line_items lists and uploaded trip spreadsheets) and per
+  IMAGE_BYTES_PER_UNIT bytes of uploaded images, so one 5,000-trip manifest
+  counts like many single-trip invoices; a cost is capped at the render
+  capacity, so the heaviest document is still admitted when nothing else
+  runs;
+- render requests may only take ADMISSION_CAPACITY - ADMISSION_RESERVED
+  units: the reserved units (and threads) are left to the cheap endpoints
+  (search, suggestions, verification, exports), which cost 1 unit each;
+- a request that does not fit is refused at once with 503 and a Retry-After
+  estimated from recent render times, instead of holding a thread while it
+  waits; /health, /static and /assets are never held back.
+
+    admission = init_admission(app, ('generate_invoice', 'generate_receipt'))
+    admission.stats()   # units in use, admitted and rejected requests
+"""
+import math
+import os
+import threading
+import time
+
+from flask import g, jsonify, request
+
+# Cost units of the whole pool; by default the threads of a gunicorn worker (render.yaml runs 8)
+DEFAULT_CAPACITY = 8
+# Units only cheap endpoints may use
+DEFAULT_RESERVED = 2
+# Trips (or line items) rendered for the cost of one more unit
+TRIPS_PER_UNIT = 100
+# Uploaded image bytes counted as one more unit
+IMAGE_BYTES_PER_UNIT = 1024 * 1024
+# Bytes of an uploaded trip spreadsheet taken as one trip
+SPREADSHEET_BYTES_PER_TRIP = 60
+# Form fields holding JSON lists of trips or line items
+LIST_FIELDS = ('multiple_trips', 'line_items')
+# Upload fields holding trip spreadsheets rather than images
+SPREADSHEET_FIELDS = ('trips_file',)
+# Endpoints never held back
+EXEMPT_ENDPOINTS = ('health_check', 'static', 'assets')
+# Weight of the latest render in the running average of render seconds per unit
+RENDER_TIME_SMOOTHING = 0.2
+# Bounds of the Retry-After header, in seconds
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 60
+
+
+def _upload_size(upload):
+    stream = upload.stream
+    try:
+        position = stream.tell()
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return upload.content_length or 0
+
+
+def estimate_cost(req):
+    """Cost units of a render request: 1, plus its trips and uploaded images"""
+    trips = 0
+    for name in LIST_FIELDS:
+        raw = req.form.get(name)
+        if raw:
+            # Counting objects is enough for an estimate; the view parses the list
+            trips += raw.count('{')
+    image_bytes = 0
+    for name, upload in req.files.items():
+        if not upload or not upload.filename:
+            continue
+        if name in SPREADSHEET_FIELDS:
+            trips += _upload_size(upload) // SPREADSHEET_BYTES_PER_TRIP
+        else:
+            image_bytes += _upload_size(upload)
+    return 1 + trips // TRIPS_PER_UNIT + image_bytes // IMAGE_BYTES_PER_UNIT
+
+
+class Admission:
+    """Bounded pool of cost units shared by the threads of one worker process"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, reserved=DEFAULT_RESERVED):
+        if not 0 <= reserved < capacity:
+            raise ValueError("reserved units must be fewer than the capacity")
+        self.capacity = capacity
+        self.reserved = reserved
+        self.render_capacity = capacity - reserved
+        self.in_use = 0
+        self.render_in_use = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.seconds_per_unit = None
+        self.lock = threading.Lock()
+
+    def acquire(self, cost, render=True):
+        """Take cost units (capped at what render requests may hold) if they are free; returns the units taken or 0"""
+        limit = self.render_capacity if render else self.capacity
+        cost = max(1, min(cost, limit))
+        with self.lock:
+            if self.in_use + cost > self.capacity or (render and self.render_in_use + cost > self.render_capacity):
+                self.rejected += 1
+                return 0
+            self.in_use += cost
+            if render:
+                self.render_in_use += cost
+            self.admitted += 1
+            return cost
+
+    def release(self, cost, render=True, seconds=None):
+        """Give back units taken by acquire(), noting how long the render took"""
+        with self.lock:
+            self.in_use -= cost
+            if render:
+                self.render_in_use -= cost
+                if seconds is not None:
+                    per_unit = seconds / cost
+                    self.seconds_per_unit = per_unit if self.seconds_per_unit is None else (
+                        RENDER_TIME_SMOOTHING * per_unit + (1 - RENDER_TIME_SMOOTHING) * self.seconds_per_unit)
+
+    def retry_after(self, cost):
+        """Seconds a refused request should wait: about the time a render of cost units takes"""
+        with self.lock:
+            per_unit = self.seconds_per_unit or 0.0
+            wanted = min(cost, self.render_capacity)
+        seconds = per_unit * wanted
+        return int(min(MAX_RETRY_AFTER, max(MIN_RETRY_AFTER, math.ceil(seconds))))
+
+    def stats(self):
+        """Units in use and requests admitted and refused so far"""
+        with self.lock:
+            return {'capacity': self.capacity, 'reserved': self.reserved, 'in_use': self.in_use,
+                    'render_in_use': self.render_in_use, 'admitted': self.admitted, 'rejected': self.rejected,
+                    'seconds_per_unit': round(self.seconds_per_unit or 0.0, 3)}
+
+
+def init_admission(app, render_endpoints, cost=estimate_cost):
+    """Hold every request of app to the admission pool; render_endpoints are weighted by cost(request)"""
+    admission = Admission(int(os.environ.get('ADMISSION_CAPACITY', DEFAULT_CAPACITY)),
+                          int(os.environ.get('ADMISSION_RESERVED', DEFAULT_RESERVED)))
+    render_endpoints = frozenset(render_endpoints)
+
+    @app.before_request
+    def admit_request():
+        if request.endpoint is None or request.endpoint in EXEMPT_ENDPOINTS:
+            return None
+        render = request.endpoint in render_endpoints
+        units = 1
+        if render:
+            try:
+                units = cost(request)
+            except Exception as e:
+                # The view reports bodies that cannot be read
+                print(f"WARNING: Could not estimate the cost of {request.endpoint}: {e}")
+        taken = admission.acquire(units, render)
+        if not taken:
+            retry_after = admission.retry_after(units)
+            print(f"WARNING: Busy, refused {request.endpoint} (cost {units}); retry after {retry_after}s")
+            response = jsonify({'error': 'The server is busy rendering other documents; please retry shortly',
+                                'retry_after': retry_after})
+            response.status_code = 503
+            response.headers['Retry-After'] = str(retry_after)
+            return response
+        g.admission = (taken, render, time.perf_counter())
+        return None
+
+    @app.teardown_request
+    def release_request(exc):
+        held = g.pop('admission', None)
+        if held is not None:
+            taken, render, start = held
+            admission.release(taken, render, time.perf_counter() - start if exc is None else None)
+
+    return admission
+
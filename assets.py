@@ -0,0 +1,178 @@
+"""Front-end asset build and serving
+
+Build step (run after create_templates.py and on deploy):
+
+    python assets.py
+
+extracts the inline <style> and <script> blocks of templates/index.html into
+static/dist/index.<hash>.css and .js, precompresses them with gzip (and
+brotli when the brotli package is installed) and writes
+templates/dist/index.html linking to them.
+
+init_assets(app) serves /assets/<name> with the best precompressed variant
+the client accepts and a one-year immutable Cache-Control (the name changes
+whenever the content does). render_page() serves the built page when it
+exists and is newer than its source, otherwise the original template, compressed once per template change
+and with an ETag, so a repeat visit is answered with 304 Not Modified.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+
+from flask import Response, render_template, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_DIR = os.path.join(BASE_DIR, 'templates')
+DIST_DIR = os.path.join(BASE_DIR, 'static', 'dist')
+BUILT_TEMPLATE_DIR = 'dist'
+ASSET_URL = '/assets/'
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Unfingerprinted files under /static (logo, signature) are revalidated daily
+STATIC_MAX_AGE = 24 * 60 * 60
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+MIMETYPES = {'.css': 'text/css', '.js': 'application/javascript'}
+
+STYLE_PATTERN = re.compile(r'<style>(.*?)</style>', re.DOTALL)
+SCRIPT_PATTERN = re.compile(r'<script>(.*?)</script>', re.DOTALL)
+
+_pages = {}
+
+
+def fingerprint(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def compress(data):
+    """Precompressed variants of data keyed by file suffix"""
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    return variants
+
+
+def write_asset(stem, suffix, text):
+    """Write a fingerprinted asset and its compressed variants; returns its file name"""
+    data = text.strip().encode('utf-8') + b'\n'
+    name = f"{stem}.{fingerprint(data)}{suffix}"
+    path = os.path.join(DIST_DIR, name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    for extension, compressed in compress(data).items():
+        with open(path + extension, 'wb') as f:
+            f.write(compressed)
+    return name
+
+
+def _replace_blocks(pattern, html, tag, keep):
+    """Replace block number keep of pattern with tag and drop the others"""
+    blocks = iter(range(len(pattern.findall(html))))
+    return pattern.sub(lambda match: tag if next(blocks) == keep else '', html)
+
+
+def build_page(template):
+    """Extract the inline CSS and JS of a template; returns its manifest entry"""
+    stem = os.path.splitext(template)[0]
+    with open(os.path.join(TEMPLATE_DIR, template), encoding='utf-8') as f:
+        html = f.read()
+
+    entry = {}
+    styles = STYLE_PATTERN.findall(html)
+    if styles:
+        entry['css'] = write_asset(stem, '.css', '\n'.join(styles))
+        html = _replace_blocks(STYLE_PATTERN, html, f'<link rel="stylesheet" href="{ASSET_URL}{entry["css"]}">',
+                               0)
+    scripts = SCRIPT_PATTERN.findall(html)
+    if scripts:
+        # Scripts run where the last block was, after the markup they use
+        entry['js'] = write_asset(stem, '.js', '\n'.join(scripts))
+        html = _replace_blocks(SCRIPT_PATTERN, html, f'<script src="{ASSET_URL}{entry["js"]}"></script>',
+                               len(scripts) - 1)
+
+    built_dir = os.path.join(TEMPLATE_DIR, BUILT_TEMPLATE_DIR)
+    os.makedirs(built_dir, exist_ok=True)
+    with open(os.path.join(built_dir, template), 'w', encoding='utf-8') as f:
+        f.write(html)
+    return entry
+
+
+def build_assets(templates=('index.html',)):
+    """Build every template and remove assets left over from earlier builds"""
+    os.makedirs(DIST_DIR, exist_ok=True)
+    manifest = {template: build_page(template) for template in templates}
+    current = {name for entry in manifest.values() for name in entry.values()}
+    for name in os.listdir(DIST_DIR):
+        if name != 'manifest.json' and re.sub(r'\.(br|gz)$', '', name) not in current:
+            os.remove(os.path.join(DIST_DIR, name))
+    with open(os.path.join(DIST_DIR, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _accepted(encoding):
+    return request.accept_encodings[encoding] > 0
+
+
+def serve_asset(filename):
+    """Send a fingerprinted asset, precompressed when the client accepts it"""
+    mimetype = MIMETYPES.get(os.path.splitext(filename)[1])
+    for encoding, extension in ENCODINGS:
+        if _accepted(encoding) and os.path.exists(os.path.join(DIST_DIR, filename + extension)):
+            response = send_from_directory(DIST_DIR, filename + extension, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(DIST_DIR, filename, mimetype=mimetype)
+    response.headers['Cache-Control'] = IMMUTABLE
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def render_page(template):
+    """Response for a static page template, built version first, with ETag and compression"""
+    name = template
+    built = f"{BUILT_TEMPLATE_DIR}/{template}"
+    built_path = os.path.join(TEMPLATE_DIR, built)
+    if os.path.exists(built_path):
+        if os.path.getmtime(built_path) >= os.path.getmtime(os.path.join(TEMPLATE_DIR, template)):
+            name = built
+        elif template not in _pages:
+            print(f"WARNING: {built} is older than {template}; run python assets.py")
+    stat = os.stat(os.path.join(TEMPLATE_DIR, name))
+    signature = (name, stat.st_mtime_ns, stat.st_size)
+
+    page = _pages.get(template)
+    if page is None or page['signature'] != signature:
+        body = render_template(name).encode('utf-8')
+        page = _pages[template] = {'signature': signature, 'etag': fingerprint(body),
+                                   'variants': dict(compress(body), **{'': body})}
+
+    encoding, extension = next(((encoding, extension) for encoding, extension in ENCODINGS
+                                if extension in page['variants'] and _accepted(encoding)), (None, ''))
+    response = Response(page['variants'][extension], mimetype='text/html')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.set_etag(page['etag'] + extension)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response.make_conditional(request)
+
+
+def init_assets(app):
+    """Register the /assets route and cache headers for /static"""
+    app.config['SEND_FILE_MAX_AGE_DEFAULT'] = STATIC_MAX_AGE
+    app.add_url_rule(f"{ASSET_URL}<path:filename>", 'assets', serve_asset)
+
+
+if __name__ == '__main__':
+    for template, entry in build_assets().items():
+        print(f"Built {template}: {', '.join(entry.values()) or 'no inline assets'}")
+    if brotli is None:
+        print("brotli is not installed; only gzip variants were written")
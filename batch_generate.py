@@ -0,0 +1,245 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Seconds between progress lines
+PROGRESS_INTERVAL = 2.0
+# Documents queued per worker process ahead of the one it is rendering
+QUEUED_PER_JOB = 4
+# Failures listed in full at the end of a run
+MAX_REPORTED_FAILURES = 20
+
+_generator = None
+
+
+def read_specs(path):
+    """Generate (line number, spec dict, error) for the documents of a JSONL or CSV file.
+
+    Specs are flat: kind (invoice or receipt), number, date, name, address,
+    contact, description, quantity, price, amount and notes; invoices add
+    trip_type, pickup_point, dropoff_point, trip_date and return_date,
+    receipts amount_paid, payment_method and payment_date. An optional
+    output names the PDF written; blank fields (empty CSV cells) count as
+    missing. error is set (and spec None) for unreadable lines.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if path.lower().endswith('.csv'):
+            # Line 1 is the header
+            for number, row in enumerate(csv.DictReader(f), 2):
+                yield number, row, None
+            return
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                spec = json.loads(line)
+            except ValueError as e:
+                yield number, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(spec, dict):
+                yield number, None, "Expected a JSON object"
+                continue
+            yield number, spec, None
+
+
+def output_name(spec):
+    """File name of a spec's PDF, named like the apps' downloads (Invoice_INV-....pdf)"""
+    if spec.get('output'):
+        return os.path.basename(spec['output'])
+    number = str(spec.get('number') or '').strip()
+    if not number:
+        raise ValueError("number is required")
+    return f"{str(spec.get('kind') or 'invoice').capitalize()}_{number}.pdf"
+
+
+def spec_value(spec, name, required=False):
+    """A spec field, None when it is missing or blank (an empty CSV cell); ValueError when required"""
+    value = spec.get(name)
+    if isinstance(value, str):
+        value = value.strip()
+    if value is None or value == '':
+        if required:
+            raise ValueError(f"{name} is required")
+        return None
+    return value
+
+
+def spec_arguments(spec):
+    """generate_invoice_pdf() or generate_receipt_pdf() arguments for a spec, after output_path.
+
+    Receipts need only amount_paid (or amount): the line item's price,
+    quantity and description are optional for them.
+    """
+    kind = str(spec_value(spec, 'kind') or 'invoice').lower()
+    receipt = kind == 'receipt'
+    quantity = int(spec_value(spec, 'quantity') or 1)
+    amount = spec_value(spec, 'amount')
+    amount_paid = spec_value(spec, 'amount_paid')
+    price = spec_value(spec, 'price', required=not receipt)
+    if price is None:
+        total = amount if amount is not None else amount_paid
+        if total is None:
+            raise ValueError("price, amount or amount_paid is required")
+        price = float(total) / quantity
+    price = float(price)
+    amount = float(amount) if amount is not None else quantity * price
+    service_info = {
+        'description': spec_value(spec, 'description', required=not receipt) or '',
+        'quantity': quantity,
+        'price': price,
+        'amount': amount,
+    }
+    client_info = {
+        'name': spec_value(spec, 'name', required=True),
+        'address': spec_value(spec, 'address') or '',
+        'contact': spec_value(spec, 'contact') or '',
+        f'{kind}_number': spec_value(spec, 'number', required=True),
+        f'{kind}_date': spec_value(spec, 'date', required=True),
+    }
+    notes = spec_value(spec, 'notes') or ''
+    if kind == 'invoice':
+        trip_info = {
+            'trip_type': spec_value(spec, 'trip_type') or '',
+            'pickup_point': spec_value(spec, 'pickup_point') or '',
+            'dropoff_point': spec_value(spec, 'dropoff_point') or '',
+            'trip_date': spec_value(spec, 'trip_date') or '',
+            'return_date': spec_value(spec, 'return_date') or '',
+        }
+        return kind, (client_info, trip_info, service_info, notes)
+    if receipt:
+        payment_info = {
+            'amount_paid': float(amount_paid if amount_paid is not None else amount),
+            'payment_method': spec_value(spec, 'payment_method') or '',
+            'payment_date': spec_value(spec, 'payment_date') or '',
+        }
+        return kind, (client_info, payment_info, service_info, notes)
+    raise ValueError(f"Unknown kind '{kind}'")
+
+
+def _start_worker(logo_path, signature_path):
+    global _generator
+    from Both_Receipt_Invoice_pdf_generator import HeadlessPDFGenerator
+
+    # One generator per process: fonts, images and the layout are loaded once for all its documents
+    _generator = HeadlessPDFGenerator()
+    _generator.set_paths(logo_path or os.path.join(BASE_DIR, 'static', 'logo.png'),
+                         signature_path or os.path.join(BASE_DIR, 'static', 'signature.png'))
+
+
+def _render(spec, output_path):
+    """Render one spec (worker); returns (seconds, error message or None)"""
+    from invoice_core import render_document
+
+    start = time.perf_counter()
+    partial = output_path + '.part'
+    try:
+        kind, arguments = spec_arguments(spec)
+        build = _generator.build_invoice if kind == 'invoice' else _generator.build_receipt
+        render_document(build(*arguments), partial, theme='mobile')
+        # Only finished PDFs get their final name, so a resumed run never trusts a partial one
+        os.replace(partial, output_path)
+    except Exception as e:
+        if os.path.exists(partial):
+            os.remove(partial)
+        return time.perf_counter() - start, f"{type(e).__name__}: {e}"
+    return time.perf_counter() - start, None
+
+
+def percentile(values, fraction):
+    """Value at fraction (0 to 1) of the sorted values"""
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def batch_generate(spec_path, output_dir, jobs=None, resume=True, logo_path=None, signature_path=None):
+    """Render every spec of spec_path into output_dir on jobs processes; returns True when none failed"""
+    jobs = jobs or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+
+    rendered = skipped = 0
+    failures, latencies, names = [], [], set()
+    pending = {}
+    start = last_progress = time.perf_counter()
+
+    def collect(done):
+        nonlocal rendered
+        for future in done:
+            line, name = pending.pop(future)
+            seconds, error = future.result()
+            if error:
+                failures.append((line, name, error))
+            else:
+                rendered += 1
+                latencies.append(seconds)
+
+    def progress():
+        elapsed = time.perf_counter() - start
+        print(f"{rendered} rendered, {skipped} skipped, {len(failures)} failed, {len(pending)} in progress "
+              f"({rendered / elapsed if elapsed else 0.0:.1f} documents/s)")
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_start_worker,
+                             initargs=(logo_path, signature_path)) as executor:
+        for line, spec, error in read_specs(spec_path):
+            if error:
+                failures.append((line, '', error))
+                continue
+            try:
+                name = output_name(spec)
+            except ValueError as e:
+                failures.append((line, '', str(e)))
+                continue
+            if name in names:
+                failures.append((line, name, "Duplicate output name in this batch"))
+                continue
+            names.add(name)
+            output_path = os.path.join(output_dir, name)
+            if resume and os.path.exists(output_path):
+                skipped += 1
+                continue
+
+            # Specs are read as workers free up, so a large batch is never held in memory at once
+            while len(pending) >= jobs * QUEUED_PER_JOB:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+            pending[executor.submit(_render, spec, output_path)] = (line, name)
+
+            if time.perf_counter() - last_progress >= PROGRESS_INTERVAL:
+                progress()
+                last_progress = time.perf_counter()
+        while pending:
+            collect(wait(pending, timeout=PROGRESS_INTERVAL).done)
+            if pending:
+                progress()
+
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"Done: {rendered} rendered, {skipped} skipped (already in {output_dir}), {len(failures)} failed "
+          f"in {elapsed:.2f}s with {jobs} worker process(es)")
+    if rendered:
+        print(f"Throughput: {rendered / elapsed:.1f} documents/s; latency per document: "
+              f"mean {sum(latencies) / rendered * 1000:.0f} ms, p50 {percentile(latencies, 0.5) * 1000:.0f} ms, "
+              f"p95 {percentile(latencies, 0.95) * 1000:.0f} ms, max {latencies[-1] * 1000:.0f} ms")
+    for line, name, error in failures[:MAX_REPORTED_FAILURES]:
+        print(f"  line {line} {name}: {error}")
+    if len(failures) > MAX_REPORTED_FAILURES:
+        print(f"  ... and {len(failures) - MAX_REPORTED_FAILURES} more failures")
+    return not failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render invoices and receipts from a JSONL or CSV file of specs "
+                                                 "with HeadlessPDFGenerator.")
+    parser.add_argument('specs', help="JSONL or CSV file, one document per line or row")
+    parser.add_argument('output_dir', help="directory the PDFs are written to")
+    parser.add_argument('--jobs', '-j', type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument('--no-resume', dest='resume', action='store_false',
+                        help="render documents whose PDF already exists in output_dir again")
+    parser.add_argument('--logo', help="logo image (default: static/logo.png)")
+    parser.add_argument('--signature', help="signature image (default: static/signature.png)")
+    args = parser.parse_args()
+    sys.exit(0 if batch_generate(args.specs, args.output_dir, args.jobs, args.resume, args.logo, args.signature)
+             else 1)
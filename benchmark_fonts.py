@@ -0,0 +1,62 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Slowest the embedded Naira fonts may make a render, relative to base-14 fonts
+MAX_OVERHEAD = 0.10
+
+
+def time_renders(count):
+    """Seconds spent rendering count sample documents of every variant, by theme, after a warm-up render each"""
+    from invoice_core import render_document
+    from stress_render import VARIANTS, sample_document
+
+    timings = {}
+    for index in range(len(VARIANTS)):
+        theme, document = sample_document(index)
+        render_document(document, theme=theme)
+    for index in range(count * len(VARIANTS)):
+        theme, document = sample_document(index)
+        start = time.perf_counter()
+        render_document(document, theme=theme)
+        timings[theme] = timings.get(theme, 0.0) + time.perf_counter() - start
+    return timings
+
+
+def benchmark_fonts(count=20, rounds=3):
+    """Compare render times with the embedded Naira fonts (EMBED_FONTS=1) and base-14 fonts only.
+
+    The modes alternate for rounds rounds and the fastest round of each counts.
+    """
+    results = {'0': {}, '1': {}}
+    for _ in range(rounds):
+        for embed in ('0', '1'):
+            # A process per mode: fonts are chosen once per process
+            process = subprocess.run([sys.executable, os.path.abspath(__file__), '--time', str(count)],
+                                     env=dict(os.environ, EMBED_FONTS=embed), capture_output=True, text=True,
+                                     check=True)
+            for theme, seconds in json.loads(process.stdout.strip().splitlines()[-1]).items():
+                results[embed][theme] = min(seconds, results[embed].get(theme, seconds))
+
+    from stress_render import VARIANTS
+
+    passed = True
+    for theme, base in results['0'].items():
+        embedded = results['1'][theme]
+        documents = count * sum(1 for name, kind in VARIANTS if name == theme)
+        overhead = embedded / base - 1
+        passed = passed and overhead <= MAX_OVERHEAD
+        print(f"{theme:<10} base-14: {base * 1000 / documents:7.1f} ms/document  "
+              f"embedded: {embedded * 1000 / documents:7.1f} ms/document  ({overhead:+.1%})")
+    print("OK" if passed else f"Embedded fonts are more than {MAX_OVERHEAD:.0%} slower")
+    return passed
+
+
+if __name__ == "__main__":
+    # python benchmark_fonts.py [DOCUMENTS_PER_VARIANT] [ROUNDS]
+    if sys.argv[1:2] == ['--time']:
+        print(json.dumps(time_renders(int(sys.argv[2]))))
+    else:
+        sys.exit(0 if benchmark_fonts(*[int(value) for value in sys.argv[1:3]]) else 1)
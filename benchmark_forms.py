@@ -0,0 +1,118 @@
+import json
+import sys
+import time
+import tracemalloc
+
+from invoice_core import Branding
+from invoice_core.forms import SUMMARY_ERRORS, FormError, InvoiceForm, parse_trips
+from invoice_core.limits import MAX_TRIPS, DocumentTooLarge, check_document
+from invoice_core.trip_import import MAX_REPORTED_ERRORS
+
+
+def sample_form(trips, invalid=0):
+    """nextride_app invoice form with trips multiple trips, the first invalid of them missing their destination"""
+    rows = [{'pickup': f"Gbagada {index}", 'destination': '' if index < invalid else 'Ikeja', 'dropoff': '',
+             'tripDate': '2025-05-01', 'tripTime': '09:00', 'returnDate': '', 'returnTime': '',
+             'price': str(5000 + index % 100)} for index in range(trips)]
+    return {'client_name': 'Ada Obi', 'client_address': '1 Road, Lagos', 'invoice_number': 'INV-BENCH',
+            'invoice_date': '2025-05-03', 'trip_type': 'Multiple Round Trips', 'multiple_trips': json.dumps(rows)}
+
+
+def single_trip_form(trip_type, return_date=''):
+    """nextride_app invoice form of one trip of trip_type"""
+    return {'client_name': 'Ada Obi', 'client_address': '1 Road, Lagos', 'invoice_number': 'INV-CHECK',
+            'invoice_date': '2025-05-03', 'trip_type': trip_type, 'pickup_point': 'Gbagada', 'dropoff_point': 'Ikeja',
+            'trip_date': '2025-05-01', 'return_date': return_date, 'quantity': '1', 'price': '5000'}
+
+
+def form_error(form):
+    """The FormError InvoiceForm.parse() raises for form; AssertionError when it accepts it"""
+    try:
+        InvoiceForm.parse(form)
+    except FormError as e:
+        return e
+    raise AssertionError("the form was accepted")
+
+
+def check_forms(trips=MAX_TRIPS):
+    """Assert that parse_trips() and InvoiceForm accept and reject what they should, on forms of trips trips"""
+    # Three of the trips are made invalid below
+    trips = max(trips, SUMMARY_ERRORS + 1)
+    # A Round Trip needs its return date, and is priced twice
+    error = form_error(single_trip_form('Round Trip'))
+    assert error.errors == ["Return Date is required for Round Trips"], error.errors
+    form = InvoiceForm.parse(single_trip_form('Round Trip', return_date='2025-05-02'))
+    assert form.document(Branding()).total == 10000
+    for trip_type in ('Single Trip', 'One Way'):
+        assert InvoiceForm.parse(single_trip_form(trip_type)).trip.return_date == ''
+
+    # Every trip is parsed, and every invalid one counted, though only the first few are reported
+    rows = json.loads(sample_form(trips)['multiple_trips'])
+    parsed, trip_errors, invalid = parse_trips(rows, 'Multiple Round Trips')
+    assert len(parsed) == trips and trip_errors == [] and invalid == 0
+    assert [trip.price for trip in parsed[:3]] == [5000.0, 5001.0, 5002.0]
+    rows[0]['price'], rows[1]['price'], rows[2]['destination'] = 'abc', '0', ''
+    parsed, trip_errors, invalid = parse_trips(rows, 'Multiple Round Trips')
+    assert len(parsed) == trips - 3 and invalid == 3
+    assert trip_errors == [{'trip': 1, 'errors': ["Invalid price format 'abc'"]},
+                           {'trip': 2, 'errors': ["Price must be greater than 0"]},
+                           {'trip': 3, 'errors': ["Missing required fields (Pickup, Destination, or Trip Date)"]}]
+    for raw, message in (('not json', "not valid JSON"), ('{}', "must be a JSON array"), ('[]', "at least one trip")):
+        errors = []
+        assert parse_trips(raw, 'Multiple Round Trips', errors=errors) == ([], [], 0) and message in errors[0]
+
+    error = form_error(sample_form(trips, invalid=trips))
+    assert error.invalid_trips == trips and len(error.trip_errors) == min(trips, MAX_REPORTED_ERRORS)
+    assert str(error).endswith(f"(and {trips - SUMMARY_ERRORS} more)"), str(error)
+    assert error.as_dict()['invalid_trips'] == trips
+    error = form_error(dict(sample_form(trips), client_name='', invoice_date=''))
+    assert error.errors == ["Missing required fields: client_name, invoice_date"] and error.invalid_trips == 0
+
+    # The form parses any number of trips; documents of more than MAX_TRIPS are refused before rendering
+    check_document(InvoiceForm.parse(sample_form(MAX_TRIPS)).document(Branding()))
+    try:
+        check_document(InvoiceForm.parse(sample_form(MAX_TRIPS + 1)).document(Branding()))
+    except DocumentTooLarge as e:
+        assert e.problems == [f"Trips: {MAX_TRIPS + 1:,}, at most {MAX_TRIPS:,} allowed"], e.problems
+    else:
+        raise AssertionError(f"a document of {MAX_TRIPS + 1} trips was accepted")
+    print(f"Form checks passed ({trips} trips, MAX_TRIPS {MAX_TRIPS})")
+
+
+def benchmark_forms(trips=10000, rounds=5):
+    """Time parsing a form of trips trips, building its Document and rejecting it with every trip invalid.
+
+    The fastest of rounds runs counts.
+    """
+    valid, invalid = sample_form(trips), sample_form(trips, invalid=trips)
+    timings = {'parse': [], 'document': [], 'all errors': []}
+    for _ in range(rounds):
+        start = time.perf_counter()
+        form = InvoiceForm.parse(valid)
+        parsed = time.perf_counter()
+        document = form.document(Branding())
+        timings['parse'].append(parsed - start)
+        timings['document'].append(time.perf_counter() - parsed)
+
+        start = time.perf_counter()
+        try:
+            InvoiceForm.parse(invalid)
+        except FormError as e:
+            error = e
+        timings['all errors'].append(time.perf_counter() - start)
+    assert len(document.trips) == trips and error.invalid_trips == trips
+
+    tracemalloc.start()
+    form = InvoiceForm.parse(valid)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    for name, values in timings.items():
+        print(f"{name:<11} {min(values) * 1000:8.1f} ms  ({min(values) * 1e6 / trips:.2f} us/trip)")
+    print(f"parsed form {size / 1024:8.0f} KB  ({size / trips:.0f} bytes/trip, {len(form.trips)} trips)")
+
+
+if __name__ == "__main__":
+    # python benchmark_forms.py [TRIPS] [ROUNDS]
+    arguments = [int(value) for value in sys.argv[1:3]]
+    check_forms(*arguments[:1])
+    benchmark_forms(*arguments)
@@ -0,0 +1,50 @@
+import argparse
+import os
+import sys
+import time
+
+from Both_Receipt_Invoice_pdf_generator import HeadlessPDFGenerator
+from batch_generate import BASE_DIR, read_specs, spec_arguments
+from invoice_core import render_bundle
+
+
+def bundle_documents(spec_path, output_path, client=None, theme='mobile', title=None):
+    """Render the specs of spec_path (those of client when given) into one PDF; returns True when all were read"""
+    generator = HeadlessPDFGenerator()
+    generator.set_paths(os.path.join(BASE_DIR, 'static', 'logo.png'),
+                        os.path.join(BASE_DIR, 'static', 'signature.png'))
+
+    documents, failures = [], 0
+    for line, spec, error in read_specs(spec_path):
+        if not error and client and str(spec.get('name') or '').strip().lower() != client.strip().lower():
+            continue
+        try:
+            if error:
+                raise ValueError(error)
+            kind, arguments = spec_arguments(spec)
+            documents.append(generator.build_invoice(*arguments) if kind == 'invoice'
+                             else generator.build_receipt(*arguments))
+        except (KeyError, ValueError) as e:
+            failures += 1
+            print(f"  line {line}: {type(e).__name__}: {e}")
+    if not documents:
+        print("No documents to bundle")
+        return False
+
+    start = time.perf_counter()
+    render_bundle(documents, output_path, theme=theme, title=title or (client or 'Documents'))
+    print(f"Bundled {len(documents)} document(s) into {output_path} ({os.path.getsize(output_path) / 1024:.0f} KB) "
+          f"in {time.perf_counter() - start:.2f}s")
+    return not failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render invoice and receipt specs into one PDF with a table of "
+                                                 "contents and bookmarks.")
+    parser.add_argument('specs', help="JSONL or CSV file of specs, as read by batch_generate.py")
+    parser.add_argument('output', help="PDF file written")
+    parser.add_argument('--client', help="only the documents of this client (matched on name)")
+    parser.add_argument('--theme', default='mobile', help="layout used for every document (default: mobile)")
+    parser.add_argument('--title', help="heading of the table of contents (default: the client name)")
+    args = parser.parse_args()
+    sys.exit(0 if bundle_documents(args.specs, args.output, args.client, args.theme, args.title) else 1)
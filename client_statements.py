@@ -0,0 +1,86 @@
+import argparse
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from invoice_core import Ledger
+from invoice_core.ledger import iso_date
+from invoice_core.storage import DEFAULT_DB_PATH
+
+_generator = None
+_ledger = None
+
+
+def statement_filename(client, start, end):
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', client).strip('_') or 'client'
+    return f"Statement_{slug}_{start}_{end}.pdf"
+
+
+def _start_worker(db_path):
+    global _generator, _ledger
+    from Both_Receipt_Invoice_pdf_generator import HeadlessPDFGenerator
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    _generator = HeadlessPDFGenerator()
+    _generator.set_paths(os.path.join(base_dir, 'static', 'logo.png'),
+                         os.path.join(base_dir, 'static', 'signature.png'))
+    _ledger = Ledger(db_path)
+
+
+def _render_statement(client, start, end, output_path):
+    """Render one client's statement (worker); returns (entries, seconds)"""
+    from invoice_core import render_document
+
+    began = time.perf_counter()
+    document = _generator.build_statement(_ledger, client, start, end)
+    render_document(document, output_path, theme='mobile')
+    return len(document.entries), time.perf_counter() - began
+
+
+def client_statements(start, end, output_dir, clients=None, jobs=None, db_path=DEFAULT_DB_PATH):
+    """Render statements for clients (by default every client with documents dated start to end) on jobs processes"""
+    os.makedirs(output_dir, exist_ok=True)
+    if not clients:
+        clients = Ledger(db_path).active_clients(start, end)
+    if not clients:
+        print(f"No documents dated {start} to {end}")
+        return True
+    jobs = min(jobs or os.cpu_count() or 1, len(clients))
+
+    began = time.perf_counter()
+    failures = 0
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_start_worker, initargs=(db_path,)) as executor:
+        futures = {executor.submit(_render_statement, client, start, end,
+                                   os.path.join(output_dir, statement_filename(client, start, end))): client
+                   for client in clients}
+        for future in as_completed(futures):
+            client = futures[future]
+            try:
+                entries, seconds = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"ERROR: Statement for {client} failed: {e}")
+                continue
+            print(f"{client}: {entries} documents ({seconds:.2f}s)")
+    print(f"Rendered {len(clients) - failures} statements in {time.perf_counter() - began:.2f}s "
+          f"with {jobs} worker process(es); {failures} failed")
+    return not failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render client statements (invoices, receipts and running balance) "
+                                                 "from the document ledger.")
+    parser.add_argument('start', help="first day of the period (YYYY-MM-DD)")
+    parser.add_argument('end', help="last day of the period (YYYY-MM-DD)")
+    parser.add_argument('output_dir', help="directory the statements are written to")
+    parser.add_argument('--client', action='append', help="client name (repeatable; default: every client with "
+                                                          "documents in the period)")
+    parser.add_argument('--jobs', '-j', type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help=f"document database (default: {DEFAULT_DB_PATH})")
+    args = parser.parse_args()
+    for value in (args.start, args.end):
+        if iso_date(value) != value:
+            parser.error(f"dates must be given as YYYY-MM-DD, got '{value}'")
+    sys.exit(0 if client_statements(args.start, args.end, args.output_dir, args.client, args.jobs, args.db) else 1)
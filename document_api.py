@@ -0,0 +1,234 @@
+"""Document records and the JSON endpoints both web apps serve
+
+Every issued invoice or receipt is recorded in the same stores
+(data/documents.db): the verification registry, the search index, the
+client directory, the ledger, the revenue analytics and the archive of
+snapshots. DocumentRecords holds them, and init_document_api() registers the
+endpoints that only read them, so app.py and nextride_app.py differ only in
+how they render:
+
+- /prices/suggest, /clients/suggest and /search for the forms;
+- /verify/<number>, the link printed in every QR code;
+- /export/ledger and /analytics/revenue, /analytics/dashboard;
+- /thumbnail/<number>, from the app's Thumbnails (see invoice_core.thumbnails).
+
+    records = DocumentRecords()
+    init_document_api(app, records, thumbnails)
+"""
+import io
+import os
+import time
+from datetime import datetime
+
+from flask import Response, current_app, has_request_context, jsonify, request, send_file
+
+from invoice_core import (Analytics, ClientDirectory, DocumentArchive, DocumentRegistry, Ledger, SearchIndex,
+                          get_price_book)
+from invoice_core.analytics import year_range
+from invoice_core.ledger import FORMATS as LEDGER_FORMATS, export_chunks, iso_date
+from invoice_core.thumbnails import ThumbnailUnavailable
+
+
+def verification_base_url():
+    """Site root printed in verification QR codes (VERIFY_BASE_URL overrides the request host)"""
+    return os.environ.get('VERIFY_BASE_URL') or (request.url_root if has_request_context() else '')
+
+
+def autofill_requested():
+    """Whether prices left out of the form are filled from the price book (the app's AUTOFILL_PRICES by default)"""
+    value = request.form.get('autofill_prices')
+    if value is None:
+        return current_app.config['AUTOFILL_PRICES']
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class DocumentRecords:
+    """The stores issued documents are recorded in (see invoice_core.verification, .search, .clients, .ledger,
+    .analytics and .archive)"""
+
+    def __init__(self):
+        self.registry = DocumentRegistry()
+        self.search_index = SearchIndex()
+        self.clients = ClientDirectory()
+        self.ledger = Ledger()
+        self.analytics = Analytics()
+        self.archive = DocumentArchive()
+
+    def record(self, document):
+        """Register a rendered document for QR verification and add it to the search index, client directory,
+        ledger, analytics and archive; raises DuplicateNumber when its number was issued meanwhile"""
+        self.registry.issue(document, verification_base_url())
+        try:
+            self.search_index.add(document)
+            self.clients.add(document.client.name, document.client.address, document.client.contact)
+            self.ledger.add(document)
+            self.analytics.add(document)
+            self.archive.add(document)
+        except Exception as e:
+            print(f"Error indexing document {document.number}: {e}")
+
+
+def analytics_range():
+    """(from, to) of an analytics request (?year= or from..to as YYYY-MM-DD, default: this year); ValueError"""
+    year = request.args.get('year', '').strip()
+    if year:
+        if not year.isdigit() or not 1 <= int(year) <= 9999:
+            raise ValueError(f"year must be a year such as 2025, got '{year}'")
+        return year_range(int(year))
+    start, end = year_range(datetime.now().year)
+    start = request.args.get('from', '').strip() or start
+    end = request.args.get('to', '').strip() or end
+    for value in (start, end):
+        if iso_date(value) != value:
+            raise ValueError(f"Dates must be given as YYYY-MM-DD, got '{value}'")
+    if start > end:
+        raise ValueError("from must not be after to")
+    return start, end
+
+
+def analytics_limit(default=0):
+    try:
+        return max(0, int(request.args.get('limit', default)))
+    except ValueError:
+        return default
+
+
+def init_document_api(app, records, thumbnails):
+    """Register the price, client, search, verification, ledger, analytics and thumbnail endpoints on app"""
+
+    def suggest_prices():
+        """Suggested prices from the route price book for a list of trips.
+
+        Body: {"trip_type": "Round Trip", "trips": [{"pickup": ..., "destination" or "dropoff": ...}, ...]}
+        """
+        data = request.get_json(silent=True) or {}
+        trips = data.get('trips')
+        if not isinstance(trips, list) or not all(isinstance(trip, dict) for trip in trips):
+            return jsonify({'error': 'trips must be a list of objects'}), 400
+        try:
+            price_book = get_price_book()
+            suggestions = price_book.suggest_many(trips, data.get('trip_type') or 'One Way')
+        except Exception as e:
+            print(f"Error suggesting prices: {e}")
+            return jsonify({'error': str(e)}), 500
+        return jsonify({'currency': price_book.currency, 'suggestions': suggestions})
+
+    def suggest_clients():
+        """Clients whose name, phone or email starts with q, for the client form autocomplete"""
+        query = request.args.get('q', '')
+        try:
+            limit = min(int(request.args.get('limit', 10)), 50)
+        except ValueError:
+            limit = 10
+        clients = records.clients.suggest(query, limit=limit)
+        return jsonify({'query': query, 'clients': [
+            {'id': client['id'], 'name': client['name'], 'address': client['address'], 'contact': client['contact']}
+            for client in clients]})
+
+    def search_documents():
+        """Ranked full-text search over issued invoices and receipts"""
+        query = request.args.get('q', '').strip()
+        kind = request.args.get('kind') or None
+        try:
+            limit = min(int(request.args.get('limit', 20)), 100)
+        except ValueError:
+            limit = 20
+        if not query:
+            return jsonify({'error': 'Query parameter q is required'}), 400
+        try:
+            start = time.perf_counter()
+            results = records.search_index.search(query, limit=limit, kind=kind)
+            took_ms = round((time.perf_counter() - start) * 1000, 2)
+        except Exception as e:
+            print(f"Error searching documents: {e}")
+            return jsonify({'error': str(e)}), 500
+        return jsonify({'query': query, 'results': results, 'took_ms': took_ms})
+
+    def verify_document(number):
+        """Check a document number against the code printed in its QR code"""
+        code = request.args.get('code', '').strip()
+        if not code:
+            return jsonify({'valid': False, 'message': 'Verification code is required'}), 400
+        try:
+            row = records.registry.verify(number, code)
+        except Exception as e:
+            print(f"Error verifying document {number}: {e}")
+            return jsonify({'valid': False, 'message': str(e)}), 500
+
+        if row is None:
+            return jsonify({'valid': False, 'number': number,
+                            'message': 'No document with this number and code was issued'}), 404
+        return jsonify({
+            'valid': True,
+            'number': row['number'],
+            'kind': row['kind'],
+            'date': row['date'],
+            'client': row['client'],
+            'total': row['total'],
+            'issued_at': row['issued_at']
+        })
+
+    def export_ledger():
+        """Stream the invoices and receipts dated from..to (YYYY-MM-DD) as csv or jsonl"""
+        start, end = request.args.get('from', '').strip(), request.args.get('to', '').strip()
+        export_format = request.args.get('format', 'csv').strip().lower()
+        kind = request.args.get('kind') or None
+        if export_format not in LEDGER_FORMATS:
+            return jsonify({'error': f"format must be one of: {', '.join(LEDGER_FORMATS)}"}), 400
+        for value in (start, end):
+            if value and iso_date(value) != value:
+                return jsonify({'error': f"Dates must be given as YYYY-MM-DD, got '{value}'"}), 400
+
+        filename = f"ledger_{start or 'start'}_{end or 'end'}.{export_format}"
+        return Response(export_chunks(records.ledger.rows(start, end, kind), export_format),
+                        mimetype=LEDGER_FORMATS[export_format],
+                        headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+    def revenue_analytics():
+        """Amounts invoiced and received in a year or from..to (default: this year) by month, client, route or
+        trip_type"""
+        by = request.args.get('by', 'month').strip().lower()
+        try:
+            start, end = analytics_range()
+            rows = records.analytics.revenue(by, start, end, analytics_limit() or None)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'by': by, 'from': start, 'to': end, 'rows': rows})
+
+    def analytics_dashboard():
+        """Revenue by month and the top limit (default 10) clients, routes and trip types of a year or from..to"""
+        try:
+            start, end = analytics_range()
+            breakdowns = records.analytics.dashboard(start, end, analytics_limit(10) or None)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'from': start, 'to': end, **breakdowns})
+
+    def document_thumbnail(number):
+        """PNG of the first page of an issued document (?code= its verification code), for listings and previews"""
+        if records.registry.verify(number, request.args.get('code', '')) is None:
+            return jsonify({'error': f"No document {number} with this verification code"}), 404
+        try:
+            found = thumbnails.thumbnail(number)
+        except ThumbnailUnavailable as e:
+            return jsonify({'error': str(e)}), 501
+        except Exception as e:
+            print(f"Error rendering the thumbnail of {number}: {e}")
+            return jsonify({'error': str(e)}), 500
+        if found is None:
+            return jsonify({'error': f"No PDF of document {number} is stored"}), 404
+        digest, png = found
+        # The hash of the PDF is the ETag: a listing reloaded unchanged is answered with 304s
+        response = send_file(io.BytesIO(png), mimetype='image/png', etag=digest, max_age=300)
+        response.cache_control.public = False
+        response.cache_control.private = True
+        return response
+
+    app.add_url_rule('/prices/suggest', 'suggest_prices', suggest_prices, methods=['POST'])
+    app.add_url_rule('/clients/suggest', 'suggest_clients', suggest_clients, methods=['GET'])
+    app.add_url_rule('/search', 'search_documents', search_documents, methods=['GET'])
+    app.add_url_rule('/verify/<number>', 'verify_document', verify_document, methods=['GET'])
+    app.add_url_rule('/export/ledger', 'export_ledger', export_ledger, methods=['GET'])
+    app.add_url_rule('/analytics/revenue', 'revenue_analytics', revenue_analytics, methods=['GET'])
+    app.add_url_rule('/analytics/dashboard', 'analytics_dashboard', analytics_dashboard, methods=['GET'])
+    app.add_url_rule('/thumbnail/<number>', 'document_thumbnail', document_thumbnail, methods=['GET'])
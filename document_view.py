@@ -0,0 +1,96 @@
+"""HTML view of issued invoices and receipts
+
+Most clients only look at their document on a phone. init_document_view()
+serves it as a small HTML page built from the archived Document (see
+invoice_core.archive), so read traffic does no ReportLab work:
+
+- /view/<number>?code=... renders templates/document.html, compiled once at
+  startup, and keeps the page in an LRU keyed by the snapshot hash, which is
+  also its ETag;
+- /view/<number>/pdf?code=... builds the PDF with download(number, document)
+  only when the client asks for it.
+
+Both need the verification code printed in the document's QR code.
+
+    init_document_view(app, document_archive, document_registry, download_pdf)
+"""
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+
+from flask import Response, jsonify, render_template, request, send_file
+
+from invoice_core.fonts import NAIRA
+from invoice_core.limits import RenderBudgetExceeded
+from invoice_core.text import parse_service_scope
+
+VIEW_TEMPLATE = 'document.html'
+# Rendered pages kept in memory
+VIEW_CACHE_SIZE = 256
+
+
+def money(value):
+    return f"{NAIRA}{value:,.2f}"
+
+
+def init_document_view(app, archive, registry, download):
+    """Register /view/<number> and /view/<number>/pdf on app"""
+    # Compile the template before the first request; Flask keeps the compiled template
+    app.jinja_env.get_template(VIEW_TEMPLATE)
+    pages = OrderedDict()
+    lock = threading.Lock()
+
+    def verified(number):
+        return registry.verify(number, request.args.get('code', '')) is not None
+
+    def not_found(number):
+        return jsonify({'error': f"No document {number} with this verification code"}), 404
+
+    def view_document(number):
+        """The document as an HTML page"""
+        if not verified(number):
+            return not_found(number)
+        digest = archive.digest(number)
+        if digest is None:
+            return not_found(number)
+        with lock:
+            page = pages.get(digest)
+            if page is not None:
+                pages.move_to_end(digest)
+        if page is None:
+            digest, document = archive.get(number)
+            download_url = f"/view/{quote(number, safe='')}/pdf?code={quote(request.args.get('code', ''))}"
+            page = render_template(VIEW_TEMPLATE, document=document, money=money,
+                                   service_scope=parse_service_scope, download_url=download_url).encode('utf-8')
+            with lock:
+                pages[digest] = page
+                while len(pages) > VIEW_CACHE_SIZE:
+                    pages.popitem(last=False)
+        response = Response(page, mimetype='text/html')
+        response.set_etag(digest)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
+
+    def download_document(number):
+        """The document's PDF, built on demand"""
+        if not verified(number):
+            return not_found(number)
+        found = archive.get(number)
+        if found is None:
+            return not_found(number)
+        digest, document = found
+        try:
+            pdf = download(number, document)
+        except RenderBudgetExceeded as e:
+            print(f"WARNING: {e}")
+            return jsonify({'error': str(e)}), 413
+        except Exception as e:
+            print(f"Error rendering {document.kind} {number}: {e}")
+            return jsonify({'error': f"Failed to render {document.kind}: {e}"}), 500
+        response = send_file(pdf, mimetype='application/pdf', as_attachment=True,
+                             download_name=f"{document.kind.capitalize()}_{number}.pdf", etag=digest)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    app.add_url_rule('/view/<number>', 'view_document', view_document)
+    app.add_url_rule('/view/<number>/pdf', 'download_document', download_document)
@@ -0,0 +1,42 @@
+"""Shared rendering core for NextRide invoices and receipts
+
+The Flask apps (app.py, nextride_app.py) and HeadlessPDFGenerator build a
+Document from their inputs and hand it to render_document() with the theme
+matching their layout; long trip manifests go through render_chunked(), which
+lays out page-aligned chunks on several processes, and render_bundle() puts
+several documents in one PDF sharing their fonts and images. Each theme's
+styles, widths and section order are read from a declarative layout file in
+invoice_core/layouts (see invoice_core.layout).
+
+Issued documents are recorded in data/documents.db by DocumentRegistry (QR
+verification), SearchIndex (full-text search), ClientDirectory (client
+autocomplete), Ledger (accounting exports and client statements, see
+invoice_core.statements), Analytics (revenue by client, route, trip type and
+month) and DocumentArchive (snapshots for the HTML view); route prices come
+from the PriceBook in pricebook.json, Thumbnails caches first-page PNGs of
+issued documents, PreviewCache the built sections of drafts being previewed
+and SpeculativeRenders the PDFs of drafts rendered before Generate is
+pressed.
+"""
+from .analytics import Analytics
+from .archive import DocumentArchive
+from .bundle import render_bundle
+from .clients import ClientDirectory
+from .model import Branding, Client, Document, LineItem, Payment, StatementEntry, Trip
+from .layout import LayoutError
+from .ledger import Ledger
+from .parallel import render_chunked
+from .preview import PreviewCache
+from .pricing import PriceBook, get_price_book
+from .render import render_document
+from .themes import THEMES, Theme, get_theme, load_layouts, register_theme
+from .search import SearchIndex
+from .speculative import SpeculativeRenders
+from .thumbnails import Thumbnails
+from .verification import DocumentRegistry
+
+__all__ = ['Branding', 'Client', 'Document', 'LineItem', 'Payment', 'StatementEntry', 'Trip', 'render_document',
+           'render_chunked', 'render_bundle', 'LayoutError', 'THEMES', 'Theme', 'get_theme', 'load_layouts',
+           'register_theme',
+           'Analytics', 'ClientDirectory', 'DocumentArchive', 'DocumentRegistry', 'Ledger', 'PreviewCache', 'PriceBook',
+           'SearchIndex', 'SpeculativeRenders', 'Thumbnails', 'get_price_book']
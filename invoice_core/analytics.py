@@ -0,0 +1,296 @@
+"""Revenue analytics kept up to date as documents are generated
+
+Every generated document is split into facts: its amount by client, by
+route and by trip type (trips and line items carry their own share), plus an
+overall 'all' fact. add() upserts those facts into daily and monthly
+aggregate tables in the same transaction, first taking back the facts of any
+document counted under the same number, so counting a document again never
+adds it twice (the registry refuses numbers already issued, see
+invoice_core.verification). Invoices count as invoiced revenue and receipts
+as received payments.
+
+A query for a date range reads the monthly aggregates of the months it
+covers in full and the daily aggregates of the partial months at its ends,
+and rollup() sums those rows per key with NumPy (a plain loop when NumPy is
+not installed), so a year-long breakdown reads a few hundred rows whatever
+the number of documents:
+
+    analytics.revenue('client', '2025-01-01', '2025-12-31', limit=10)
+"""
+from datetime import date, datetime, timedelta
+
+from .ledger import iso_date
+from .storage import DEFAULT_DB_PATH, connect, prepare
+from .text import filled
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Breakdowns offered by revenue(); 'month' is the 'all' dimension by month
+DIMENSIONS = ('client', 'route', 'trip_type', 'month')
+# Columns summed by the aggregates, in order
+MEASURES = ('invoiced', 'received', 'documents')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS revenue_keys (
+    id INTEGER PRIMARY KEY,
+    dimension TEXT NOT NULL,
+    key TEXT NOT NULL,
+    UNIQUE (dimension, key)
+);
+CREATE TABLE IF NOT EXISTS revenue_facts (
+    number TEXT NOT NULL,
+    key_id INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    invoiced REAL NOT NULL,
+    received REAL NOT NULL,
+    PRIMARY KEY (number, key_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS revenue_daily (
+    dimension TEXT NOT NULL,
+    day TEXT NOT NULL,
+    key_id INTEGER NOT NULL,
+    invoiced REAL NOT NULL,
+    received REAL NOT NULL,
+    documents INTEGER NOT NULL,
+    PRIMARY KEY (dimension, day, key_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS revenue_monthly (
+    dimension TEXT NOT NULL,
+    month TEXT NOT NULL,
+    key_id INTEGER NOT NULL,
+    invoiced REAL NOT NULL,
+    received REAL NOT NULL,
+    documents INTEGER NOT NULL,
+    PRIMARY KEY (dimension, month, key_id)
+) WITHOUT ROWID;
+"""
+
+UPSERT = """
+INSERT INTO revenue_{period} (dimension, {column}, key_id, invoiced, received, documents) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (dimension, {column}, key_id) DO UPDATE SET invoiced = invoiced + excluded.invoiced,
+    received = received + excluded.received, documents = documents + excluded.documents
+"""
+# Month of a day or month column as an integer (year * 12 + month - 1), the group of a by-month rollup
+MONTH_GROUP = "CAST(substr({0}, 1, 4) AS INTEGER) * 12 + CAST(substr({0}, 6, 2) AS INTEGER) - 1"
+
+
+def _clean(value):
+    return ' '.join(str(value or '').split())
+
+
+def route_name(pickup, destination):
+    """Route key of a trip ("Gbagada -> Ikeja"), or '' when either end is missing or a placeholder ('N/A')"""
+    pickup, destination = _clean(filled(pickup)), _clean(filled(destination))
+    if not pickup or not destination:
+        return ''
+    return f"{pickup} -> {destination}"
+
+
+def document_facts(document, day=None):
+    """(dimension, key, day, invoiced, received) facts of a document, summed per key"""
+    day = day or iso_date(document.date, datetime.now().strftime('%Y-%m-%d'))
+    invoiced, received = (0.0, document.total) if document.kind == 'receipt' else (document.total, 0.0)
+    shares = [('all', '', invoiced, received), ('client', _clean(document.client.name), invoiced, received)]
+
+    if document.kind != 'receipt':
+        if document.trips:
+            # Each trip of a multi-trip invoice carries its own price
+            for trip in document.trips:
+                shares.append(('route', route_name(trip.pickup, trip.destination or trip.dropoff), trip.price, 0.0))
+                shares.append(('trip_type', _clean(trip.trip_type), trip.price, 0.0))
+        else:
+            trip = document.trip
+            trip_route = route_name(trip.pickup, trip.destination or trip.dropoff) if trip else ''
+            for item in document.items:
+                shares.append(('route', _clean(item.route) or trip_route, item.amount, 0.0))
+            if trip is not None:
+                shares.append(('trip_type', _clean(trip.trip_type), invoiced, 0.0))
+
+    facts = {}
+    for dimension, key, invoiced_share, received_share in shares:
+        if dimension != 'all' and not key:
+            continue
+        total = facts.get((dimension, key), (0.0, 0.0))
+        facts[(dimension, key)] = (total[0] + invoiced_share, total[1] + received_share)
+    return [(dimension, key, day, values[0], values[1]) for (dimension, key), values in facts.items()]
+
+
+def rollup(rows):
+    """Sum (group, invoiced, received, documents) rows per integer group.
+
+    Returns (groups, sums): the distinct groups in increasing order and an
+    array (a list of lists without NumPy) of their summed measures.
+    """
+    if np is None:
+        sums = {}
+        for group, invoiced, received, documents in rows:
+            total = sums.setdefault(group, [0.0, 0.0, 0])
+            total[0] += invoiced
+            total[1] += received
+            total[2] += documents
+        groups = sorted(sums)
+        return groups, [sums[group] for group in groups]
+    matrix = np.array(rows, dtype=float).reshape(-1, 1 + len(MEASURES))
+    groups, inverse = np.unique(matrix[:, 0].astype(np.int64), return_inverse=True)
+    sums = np.column_stack([np.bincount(inverse, weights=matrix[:, 1 + index], minlength=len(groups))
+                            for index in range(len(MEASURES))])
+    return groups.tolist(), sums
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def split_range(start, end):
+    """(daily ranges, monthly range) covering start..end: whole months come from the monthly aggregates"""
+    first = datetime.strptime(start, '%Y-%m-%d').date()
+    last = datetime.strptime(end, '%Y-%m-%d').date()
+    full_start = first if first.day == 1 else _next_month(first)
+    full_end = _month_start(last + timedelta(days=1)) - timedelta(days=1)
+    if full_start > full_end:
+        return [(start, end)], None
+    daily = []
+    if first < full_start:
+        daily.append((start, (full_start - timedelta(days=1)).isoformat()))
+    if full_end < last:
+        daily.append(((full_end + timedelta(days=1)).isoformat(), end))
+    return daily, (full_start.strftime('%Y-%m'), full_end.strftime('%Y-%m'))
+
+
+class Analytics:
+    """Revenue aggregates by client, route, trip type and month"""
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        prepare(path)
+        with connect(path) as conn:
+            conn.executescript(SCHEMA)
+            empty = conn.execute("SELECT 1 FROM revenue_facts LIMIT 1").fetchone() is None
+        if empty:
+            self.backfill()
+
+    def _key_id(self, conn, dimension, key):
+        conn.execute("INSERT OR IGNORE INTO revenue_keys (dimension, key) VALUES (?, ?)", (dimension, key))
+        row = conn.execute("SELECT id FROM revenue_keys WHERE dimension = ? AND key = ?", (dimension, key)).fetchone()
+        return row[0]
+
+    def _apply(self, conn, facts, sign):
+        for dimension, key_id, day, invoiced, received in facts:
+            values = (key_id, sign * invoiced, sign * received, sign)
+            conn.execute(UPSERT.format(period='daily', column='day'), (dimension, day) + values)
+            conn.execute(UPSERT.format(period='monthly', column='month'), (dimension, day[:7]) + values)
+        if sign < 0:
+            conn.execute("DELETE FROM revenue_daily WHERE documents <= 0")
+            conn.execute("DELETE FROM revenue_monthly WHERE documents <= 0")
+
+    def _record(self, conn, number, facts):
+        previous = conn.execute("SELECT k.dimension, f.key_id, f.day, f.invoiced, f.received FROM revenue_facts f "
+                                "JOIN revenue_keys k ON k.id = f.key_id WHERE f.number = ?", (number,)).fetchall()
+        if previous:
+            self._apply(conn, [tuple(row) for row in previous], -1)
+            conn.execute("DELETE FROM revenue_facts WHERE number = ?", (number,))
+        facts = [(dimension, self._key_id(conn, dimension, key), day, invoiced, received)
+                 for dimension, key, day, invoiced, received in facts]
+        conn.executemany("INSERT INTO revenue_facts (number, key_id, day, invoiced, received) VALUES (?, ?, ?, ?, ?)",
+                         [(number,) + fact[1:] for fact in facts])
+        self._apply(conn, facts, 1)
+
+    def add(self, document):
+        """Count a generated document, replacing the facts of one already counted under its number"""
+        with connect(self.path) as conn:
+            self._record(conn, document.number, document_facts(document))
+
+    def backfill(self):
+        """Count the ledger's documents not counted yet (by client and month only); returns how many"""
+        added = 0
+        with connect(self.path) as conn:
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'ledger'").fetchone() is None:
+                return 0
+            rows = conn.execute("SELECT number, kind, date, client, total FROM ledger WHERE date != '' AND number "
+                                "NOT IN (SELECT number FROM revenue_facts)").fetchall()
+            for row in rows:
+                invoiced, received = (0.0, row['total']) if row['kind'] == 'receipt' else (row['total'], 0.0)
+                facts = [('all', '', row['date'], invoiced, received)]
+                if _clean(row['client']):
+                    facts.append(('client', _clean(row['client']), row['date'], invoiced, received))
+                self._record(conn, row['number'], facts)
+                added += 1
+        if added:
+            print(f"Backfilled revenue analytics with {added} ledger documents")
+        return added
+
+    def rebuild(self):
+        """Recompute the daily and monthly aggregates from the stored facts; returns the documents counted"""
+        with connect(self.path) as conn:
+            conn.execute("DELETE FROM revenue_daily")
+            conn.execute("DELETE FROM revenue_monthly")
+            for period, column, expression in (('daily', 'day', 'f.day'), ('monthly', 'month', 'substr(f.day, 1, 7)')):
+                conn.execute(f"INSERT INTO revenue_{period} (dimension, {column}, key_id, invoiced, received, "
+                             f"documents) SELECT k.dimension, {expression}, f.key_id, SUM(f.invoiced), "
+                             f"SUM(f.received), COUNT(*) FROM revenue_facts f JOIN revenue_keys k ON k.id = f.key_id "
+                             f"GROUP BY k.dimension, {expression}, f.key_id")
+            return conn.execute("SELECT COUNT(DISTINCT number) FROM revenue_facts").fetchone()[0]
+
+    def revenue(self, by, start, end, limit=None):
+        """Revenue from start to end (YYYY-MM-DD) by client, route, trip_type or month.
+
+        Returns a list of {'key', 'invoiced', 'received', 'documents'} dicts,
+        by month in order or by decreasing invoiced revenue.
+        """
+        if by not in DIMENSIONS:
+            raise ValueError(f"by must be one of: {', '.join(DIMENSIONS)}")
+        dimension = 'all' if by == 'month' else by
+        daily, monthly = split_range(start, end)
+        rows = []
+        with connect(self.path) as conn:
+            # Plain tuples rather than sqlite3.Row, straight into the rollup
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            group = MONTH_GROUP.format('day') if by == 'month' else 'key_id'
+            for first, last in daily:
+                rows.extend(cursor.execute(f"SELECT {group}, invoiced, received, documents FROM revenue_daily "
+                                           "WHERE dimension = ? AND day BETWEEN ? AND ?", (dimension, first, last)))
+            if monthly:
+                group = MONTH_GROUP.format('month') if by == 'month' else 'key_id'
+                rows.extend(cursor.execute(f"SELECT {group}, invoiced, received, documents FROM revenue_monthly "
+                                           "WHERE dimension = ? AND month BETWEEN ? AND ?", (dimension,) + monthly))
+            if not rows:
+                return []
+
+            groups, sums = rollup(rows)
+            if by == 'month':
+                order = range(len(groups))
+            elif np is None:
+                order = sorted(range(len(groups)), key=lambda i: (-sums[i][0], -sums[i][1], groups[i]))
+            else:
+                order = np.lexsort((groups, -sums[:, 1], -sums[:, 0])).tolist()
+            order = order[:limit] if limit else order
+
+            # Only the keys returned are looked up by name
+            if by == 'month':
+                names = {value: f"{value // 12:04d}-{value % 12 + 1:02d}" for value in groups}
+            else:
+                ids = [groups[i] for i in order]
+                names = {}
+                for offset in range(0, len(ids), 500):
+                    chunk = ids[offset:offset + 500]
+                    names.update(cursor.execute(f"SELECT id, key FROM revenue_keys WHERE id IN "
+                                                f"({', '.join('?' * len(chunk))})", chunk))
+        return [{'key': names[groups[i]], 'invoiced': round(float(sums[i][0]), 2),
+                 'received': round(float(sums[i][1]), 2), 'documents': int(round(sums[i][2]))} for i in order]
+
+    def dashboard(self, start, end, limit=10):
+        """Revenue by month and the top limit clients, routes and trip types from start to end"""
+        return {by: self.revenue(by, start, end, None if by == 'month' else limit) for by in DIMENSIONS}
+
+
+def year_range(year):
+    """First and last day (YYYY-MM-DD) of year"""
+    return date(year, 1, 1).isoformat(), date(year, 12, 31).isoformat()
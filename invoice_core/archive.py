@@ -0,0 +1,83 @@
+"""Snapshots of issued documents for the HTML view and later downloads
+
+DocumentArchive keeps the Document model of every issued invoice and receipt
+as compressed JSON keyed by its number, with a short hash of the snapshot.
+/view/<number> shows it as HTML and only builds the PDF when it is
+downloaded; the hash is the ETag of both, and a cached page is checked by
+reading the hash alone.
+
+Branding images are not kept: uploaded logos and signatures are deleted once
+the document is rendered, so a copy rendered later uses the app's defaults.
+"""
+import hashlib
+import json
+import zlib
+from dataclasses import asdict
+
+from .model import Branding, Client, Document, LineItem, Payment, StatementEntry, Trip
+from .storage import DEFAULT_DB_PATH, connect, prepare
+
+# Hex digits of the snapshot hash
+DIGEST_LENGTH = 16
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    number TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    body BLOB NOT NULL
+)
+"""
+
+
+def snapshot(document):
+    """Compact JSON of document, without its branding image paths"""
+    data = asdict(document)
+    data['branding'].update(logo_path=None, signature_path=None)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def from_snapshot(body):
+    """Document of a snapshot() body"""
+    data = json.loads(body)
+    data['client'] = Client(**data['client'])
+    data['branding'] = Branding(**data['branding'])
+    data['trip'] = Trip(**data['trip']) if data['trip'] is not None else None
+    data['trips'] = [Trip(**trip) for trip in data['trips']]
+    data['items'] = [LineItem(**item) for item in data['items']]
+    data['payment'] = Payment(**data['payment']) if data['payment'] is not None else None
+    data['entries'] = [StatementEntry(**entry) for entry in data['entries']]
+    return Document(**data)
+
+
+class DocumentArchive:
+    """Issued documents by number, as they were rendered"""
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        prepare(path)
+        with connect(path) as conn:
+            conn.execute(SCHEMA)
+
+    def add(self, document):
+        """Keep a snapshot of document, whose number must not be archived yet; returns its hash"""
+        body = snapshot(document)
+        digest = hashlib.sha256(body).hexdigest()[:DIGEST_LENGTH]
+        with connect(self.path) as conn:
+            conn.execute("INSERT INTO snapshots (number, kind, digest, body) VALUES (?, ?, ?, ?)",
+                         (document.number, document.kind, digest, zlib.compress(body)))
+        return digest
+
+    def digest(self, number):
+        """Hash of the snapshot of number, or None"""
+        with connect(self.path) as conn:
+            row = conn.execute("SELECT digest FROM snapshots WHERE number = ?", (number,)).fetchone()
+        return row['digest'] if row is not None else None
+
+    def get(self, number):
+        """(hash, Document) of number, or None"""
+        with connect(self.path) as conn:
+            row = conn.execute("SELECT digest, body FROM snapshots WHERE number = ?", (number,)).fetchone()
+        if row is None:
+            return None
+        return row['digest'], from_snapshot(zlib.decompress(row['body']))
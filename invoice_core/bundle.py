@@ -0,0 +1,175 @@
+"""Bundles of invoices and receipts rendered into one PDF
+
+render_bundle() lays every document out on a single canvas, each starting on
+a new page after a table of contents:
+
+- logos, signatures, fonts and watermark forms are embedded once for the
+  whole bundle (CachedImage, EmbeddedFont and draw_watermark reuse what the
+  canvas already holds), so each further document adds little more than its
+  own page content;
+- every document has a page template of its own, so its watermark, footer
+  and page numbers are the ones it has when rendered alone;
+- the contents link to the first page of every document, whose number is
+  drawn from a form XObject filled in once the layout is done, so the bundle
+  is laid out in a single pass;
+- the PDF outline has a bookmark per document.
+"""
+import functools
+import io
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_RIGHT
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import BaseDocTemplate, Frame, LongTable, NextPageTemplate, PageBreak, PageTemplate, Paragraph
+from reportlab.platypus.flowables import Flowable
+
+from .themes import get_theme
+
+# Font size of the table of contents
+CONTENTS_FONT_SIZE = 9
+# Width of the page number column of the contents
+PAGE_COLUMN_WIDTH = 36
+
+
+def _bookmark(index):
+    return f"bundle_document_{index}"
+
+
+def _page_form(index):
+    return f"BundlePage{index}"
+
+
+class _DocumentStart(Flowable):
+    """Zero-size flowable bookmarking the page a bundled document starts on"""
+
+    def __init__(self, pages, index, title):
+        Flowable.__init__(self)
+        self.pages = pages
+        self.index = index
+        self.title = title
+
+    def wrap(self, availWidth, availHeight):
+        return 0, 0
+
+    def draw(self):
+        key = _bookmark(self.index)
+        self.canv.bookmarkPage(key)
+        self.canv.addOutlineEntry(self.title, key, level=0)
+        self.pages[self.index] = self.canv.getPageNumber()
+
+
+class _PageNumber(Flowable):
+    """Page number of a bundled document in the contents, drawn from a form defined after layout"""
+
+    def __init__(self, index, width, height):
+        Flowable.__init__(self)
+        self.index = index
+        self.width = width
+        self.height = height
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        self.canv.doForm(_page_form(self.index))
+
+
+class _BundleCanvas(Canvas):
+    """Canvas defining the contents' page number forms before it is saved"""
+
+    def __init__(self, *args, pages=None, font=None, **kwargs):
+        Canvas.__init__(self, *args, **kwargs)
+        self.bundle_pages = pages
+        self.bundle_font = font
+
+    def save(self):
+        for index, page in enumerate(self.bundle_pages):
+            self.beginForm(_page_form(index))
+            self.setFont(self.bundle_font, CONTENTS_FONT_SIZE)
+            self.drawRightString(PAGE_COLUMN_WIDTH, 0, str(page or ''))
+            self.endForm()
+        self.showOutline()
+        Canvas.save(self)
+
+
+class _DocumentPages:
+    """onPage callback of a bundled document, numbering its pages from 1"""
+
+    def __init__(self, document_layout, document):
+        self.document_layout = document_layout
+        self.document = document
+        self.callback = None
+        self.first_page = None
+
+    def __call__(self, canvas_obj, doc):
+        if self.first_page is None:
+            self.first_page = canvas_obj.getPageNumber()
+            self.callback = self.document_layout.page_callback(self.document, 1 - self.first_page)
+        if self.callback:
+            self.callback(canvas_obj, doc)
+
+
+def document_title(document):
+    return f"{document.kind.capitalize()} {document.number} - {document.client.name}"
+
+
+def _contents(theme, documents, title, width):
+    layout = theme.layout
+    font, bold_font = theme.fonts()['font'], theme.fonts()['bold_font']
+    cell = ParagraphStyle('BundleCell', fontName=font, fontSize=CONTENTS_FONT_SIZE,
+                          leading=CONTENTS_FONT_SIZE * 1.25)
+    header = ParagraphStyle('BundleHeader', parent=cell, fontName=bold_font)
+    amount = ParagraphStyle('BundleAmount', parent=cell, alignment=TA_RIGHT)
+    heading = ParagraphStyle('BundleTitle', fontName=bold_font, fontSize=CONTENTS_FONT_SIZE * 2,
+                             leading=CONTENTS_FONT_SIZE * 2.5, spaceAfter=CONTENTS_FONT_SIZE * 1.5)
+
+    rows = [[Paragraph(text, header) for text in ('Document', 'Date', 'Client', 'Amount')]
+            + [Paragraph('Page', ParagraphStyle('BundlePageHeader', parent=header, alignment=TA_RIGHT))]]
+    for index, document in enumerate(documents):
+        name = f"{document.kind.capitalize()} {document.number}"
+        link = f'<link destination="{_bookmark(index)}" color="blue">{name}</link>'
+        rows.append([Paragraph(link, cell), Paragraph(document.date, cell), Paragraph(document.client.name, cell),
+                     Paragraph(layout.money(document.total), amount),
+                     _PageNumber(index, PAGE_COLUMN_WIDTH, CONTENTS_FONT_SIZE)])
+
+    # The client column takes what the others leave
+    widths = [width * 0.3, width * 0.15, None, width * 0.17, PAGE_COLUMN_WIDTH + 12]
+    widths[2] = width - sum(value for value in widths if value)
+    table = LongTable(rows, colWidths=widths, repeatRows=1)
+    table.setStyle([('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),
+                    ('LINEBELOW', (0, 1), (-1, -1), 0.25, colors.lightgrey),
+                    ('VALIGN', (0, 0), (-1, -1), 'TOP')])
+    return [Paragraph(title, heading), table]
+
+
+def render_bundle(documents, output=None, theme='latex', title='Documents'):
+    """Render documents into one PDF with a table of contents and bookmarks.
+
+    output may be a file path or a file-like object; when omitted an
+    in-memory BytesIO is used. Returns output, like render_document().
+    """
+    if not documents:
+        raise ValueError("A bundle needs at least one document")
+    theme_obj = get_theme(theme)
+    layout = theme_obj.layout
+    document_layouts = [theme_obj.document_layout(document) for document in documents]
+    if output is None:
+        output = io.BytesIO()
+
+    doc = BaseDocTemplate(output, pagesize=layout.pagesize, title=title, **layout.margins)
+    frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id='normal')
+    templates = [PageTemplate('contents', [frame])]
+    pages = [None] * len(documents)
+    story = _contents(theme_obj, documents, title, doc.width)
+    for index, (document, document_layout) in enumerate(zip(documents, document_layouts)):
+        templates.append(PageTemplate(f'document{index}', [frame],
+                                      onPage=_DocumentPages(document_layout, document)))
+        story.extend([NextPageTemplate(f'document{index}'), PageBreak(),
+                      _DocumentStart(pages, index, document_title(document))])
+        story.extend(document_layout.flowables(document))
+    doc.addPageTemplates(templates)
+
+    canvasmaker = functools.partial(_BundleCanvas, pages=pages, font=theme_obj.fonts()['font'])
+    doc.build(story, canvasmaker=canvasmaker)
+    return output
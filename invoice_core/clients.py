@@ -0,0 +1,264 @@
+"""Client directory built from issued documents
+
+Every generated invoice or receipt adds its client to the directory.
+Clients are deduplicated by normalized phone number and email address
+found in the contact field (by name when neither is given: every client is
+also found under its name), and the latest name, address and contact win;
+blank fields and the forms' placeholders ('Not Provided', 'N/A') never
+replace details on record. The directory is stored in SQLite, where add()
+looks the identities up so that the worker processes sharing the database
+never create the same client twice, and kept in memory for
+autocomplete:
+
+- a sorted list of (key, client id) pairs, where keys are the normalized
+  name, each of its words, phone numbers and emails; a prefix lookup is a
+  bisect followed by a scan of the matching keys;
+- a table of the best clients for every prefix of up to HOT_PREFIX
+  characters, which the scan would otherwise walk for the shortest and most
+  common queries.
+
+Clients are ranked by the number of documents issued to them, then by the
+most recent one. Both structures are updated incrementally on every add,
+and at most every REFRESH_INTERVAL seconds suggest() first indexes the
+clients other worker processes recorded or updated since (by last_seen).
+"""
+import bisect
+import heapq
+import re
+import threading
+import time
+
+from .storage import DEFAULT_DB_PATH, connect, prepare
+from .text import filled, normalize_text
+
+# Prefixes up to this length answer from the precomputed best-clients table
+HOT_PREFIX = 3
+# Clients kept per precomputed prefix
+TOP_CLIENTS = 20
+# Keys scanned at most for longer prefixes
+SCAN_LIMIT = 2000
+# Seconds between reads of the clients other worker processes recorded or updated
+REFRESH_INTERVAL = 1.0
+# Seconds re-read before the latest change seen, for rows another worker committed late
+REFRESH_OVERLAP = 10.0
+
+EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+PHONE_PATTERN = re.compile(r'\+?\d[\d\s().-]{5,}\d')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clients (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    address TEXT NOT NULL,
+    contact TEXT NOT NULL,
+    uses INTEGER NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clients_last_seen ON clients (last_seen);
+CREATE TABLE IF NOT EXISTS client_keys (
+    key TEXT PRIMARY KEY,
+    client_id INTEGER NOT NULL
+);
+"""
+
+
+def normalize_phone(value):
+    """Digits of a phone number, with +234 / 234 written as a leading 0"""
+    digits = re.sub(r'\D', '', value or '')
+    if digits.startswith('234') and len(digits) > 10:
+        digits = '0' + digits[3:]
+    return digits
+
+
+def identity_keys(name, contact):
+    """Deduplication keys of a client: phone:, email: or, without either, name:"""
+    name, contact = filled(name), filled(contact)
+    emails = [email.lower() for email in EMAIL_PATTERN.findall(contact)]
+    phones = [normalize_phone(phone) for phone in PHONE_PATTERN.findall(EMAIL_PATTERN.sub(' ', contact))]
+    keys = [f"phone:{phone}" for phone in phones if len(phone) >= 7] + [f"email:{email}" for email in emails]
+    if not keys and name_key(name):
+        keys.append(name_key(name))
+    return keys
+
+
+def name_key(name):
+    """name: key of a client, under which documents without a phone or email find it; '' without a name"""
+    name = normalize_text(filled(name))
+    return f"name:{name}" if name else ''
+
+
+def search_keys(client):
+    """Keys a client is found under in the autocomplete index"""
+    name = normalize_text(client['name'])
+    keys = {name} if name else set()
+    keys.update(name.split())
+    contact = client['contact']
+    keys.update(email.lower() for email in EMAIL_PATTERN.findall(contact))
+    keys.update(normalize_phone(phone) for phone in PHONE_PATTERN.findall(EMAIL_PATTERN.sub(' ', contact)))
+    keys.discard('')
+    return keys
+
+
+def normalize_query(text):
+    """Query in the form of the index keys (phone numbers as digits)"""
+    text = (text or '').strip()
+    if re.fullmatch(r'\+?[\d\s().-]+', text):
+        digits = re.sub(r'\D', '', text)
+        if text.startswith('+234') or (digits.startswith('234') and len(digits) > 3):
+            digits = '0' + digits[3:]
+        return digits
+    if '@' in text:
+        return text.lower()
+    return normalize_text(text)
+
+
+class ClientDirectory:
+    """Deduplicated clients with in-memory prefix suggestions"""
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._keys = []
+        self._top = {}
+        self._latest = 0.0
+        self._refreshed = time.monotonic()
+        prepare(path)
+        with connect(path) as conn:
+            conn.executescript(SCHEMA)
+            for row in conn.execute("SELECT * FROM clients"):
+                self._clients[row['id']] = dict(row)
+            # Clients recorded with a phone or email before their name was a key too
+            conn.executemany("INSERT OR IGNORE INTO client_keys (key, client_id) VALUES (?, ?)",
+                             [(name_key(client['name']), client_id) for client_id, client in self._clients.items()
+                              if name_key(client['name'])])
+        for client_id, client in self._clients.items():
+            for key in search_keys(client):
+                self._keys.append((key, client_id))
+        self._keys.sort()
+        candidates = {}
+        for key, client_id in self._keys:
+            for length in range(1, min(HOT_PREFIX, len(key)) + 1):
+                candidates.setdefault(key[:length], set()).add(client_id)
+        self._top = {prefix: heapq.nsmallest(TOP_CLIENTS, ids, key=self._rank) for prefix, ids in candidates.items()}
+        self._latest = max((client['last_seen'] for client in self._clients.values()), default=0.0)
+
+    def __len__(self):
+        return len(self._clients)
+
+    def _rank(self, client_id):
+        client = self._clients[client_id]
+        return -client['uses'], -client['last_seen']
+
+    def _promote(self, client_id, keys):
+        """Place client_id in the best-clients table of every short prefix of keys"""
+        for prefix in {key[:length] for key in keys for length in range(1, HOT_PREFIX + 1) if len(key) >= length}:
+            best = self._top.setdefault(prefix, [])
+            if client_id in best:
+                best.remove(client_id)
+            best.append(client_id)
+            best.sort(key=self._rank)
+            del best[TOP_CLIENTS:]
+
+    def _demote(self, client_id, keys):
+        """Drop client_id from the index under keys, refilling the short prefixes it held"""
+        for key in keys:
+            index = bisect.bisect_left(self._keys, (key, client_id))
+            if index < len(self._keys) and self._keys[index] == (key, client_id):
+                del self._keys[index]
+        for prefix in {key[:length] for key in keys for length in range(1, HOT_PREFIX + 1)}:
+            best = self._top.get(prefix)
+            if best and client_id in best:
+                self._top[prefix] = self._scan(prefix, TOP_CLIENTS, limit=None)
+
+    def _scan(self, prefix, count, limit=SCAN_LIMIT):
+        """Best count clients having a key starting with prefix"""
+        found = set()
+        keys = self._keys
+        start = index = bisect.bisect_left(keys, (prefix,))
+        while index < len(keys) and keys[index][0].startswith(prefix):
+            found.add(keys[index][1])
+            index += 1
+            if limit is not None and index - start >= limit:
+                break
+        return heapq.nsmallest(count, found, key=self._rank)
+
+    def add(self, name, address='', contact=''):
+        """Record a client seen on a document; returns the client's id"""
+        # Placeholders the forms fill in ('Not Provided') count as blank
+        name, address, contact = filled(name), filled(address), filled(contact)
+        identities = identity_keys(name, contact)
+        if not identities:
+            return None
+        now = time.time()
+        with self._lock:
+            with connect(self.path) as conn:
+                # Other worker processes add clients to the same database: look the identities up there, holding
+                # the write lock until the client is stored
+                conn.execute("BEGIN IMMEDIATE")
+                placeholders = ', '.join('?' * len(identities))
+                row = conn.execute(f"SELECT c.* FROM client_keys k JOIN clients c ON c.id = k.client_id "
+                                   f"WHERE k.key IN ({placeholders}) ORDER BY c.id LIMIT 1", identities).fetchone()
+                if row is None:
+                    client_id = conn.execute("INSERT INTO clients (name, address, contact, uses, last_seen) "
+                                             "VALUES (?, ?, ?, 1, ?)", (name, address, contact, now)).lastrowid
+                    client = {'id': client_id, 'name': name, 'address': address, 'contact': contact,
+                              'uses': 1, 'last_seen': now}
+                else:
+                    client = dict(row)
+                    client_id = client['id']
+                    # Keep earlier details the new document left blank
+                    client.update(name=name or client['name'], address=address or client['address'],
+                                  contact=contact or client['contact'], uses=client['uses'] + 1, last_seen=now)
+                    conn.execute("UPDATE clients SET name = ?, address = ?, contact = ?, uses = ?, last_seen = ? "
+                                 "WHERE id = ?", (client['name'], client['address'], client['contact'],
+                                                  client['uses'], now, client_id))
+                # The name is a key too, for later documents giving no phone or email
+                keys = set(identities) | ({name_key(client['name'])} - {''})
+                conn.executemany("INSERT OR REPLACE INTO client_keys (key, client_id) VALUES (?, ?)",
+                                 [(key, client_id) for key in keys])
+
+            # The stored row may also have been added or updated by another worker
+            self._apply(client)
+        return client_id
+
+    def _apply(self, client):
+        """Index the stored row of a client (called with the lock held)"""
+        client_id = client['id']
+        previous = self._clients.get(client_id)
+        if previous == client:
+            return
+        old_keys = search_keys(previous) if previous is not None else set()
+        self._clients[client_id] = client
+        self._latest = max(self._latest, client['last_seen'])
+        new_keys = search_keys(client)
+        if old_keys - new_keys:
+            self._demote(client_id, old_keys - new_keys)
+        for key in new_keys - old_keys:
+            bisect.insort(self._keys, (key, client_id))
+        self._promote(client_id, new_keys)
+
+    def _refresh(self):
+        """Index the clients other worker processes recorded or updated (called with the lock held)"""
+        now = time.monotonic()
+        if now - self._refreshed < REFRESH_INTERVAL:
+            return
+        self._refreshed = now
+        with connect(self.path) as conn:
+            rows = conn.execute("SELECT * FROM clients WHERE last_seen >= ? ORDER BY last_seen",
+                                (self._latest - REFRESH_OVERLAP,)).fetchall()
+        for row in rows:
+            self._apply(dict(row))
+
+    def suggest(self, text, limit=10):
+        """Clients whose name, name words, phone or email start with text, best first"""
+        query = normalize_query(text)
+        if not query:
+            return []
+        with self._lock:
+            self._refresh()
+            if len(query) <= HOT_PREFIX:
+                ids = self._top.get(query, [])[:limit]
+            else:
+                ids = self._scan(query, limit)
+            return [dict(self._clients[client_id]) for client_id in ids]
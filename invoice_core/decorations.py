@@ -0,0 +1,90 @@
+"""Per-page watermark and footer drawing
+
+Each watermark grid is drawn once per PDF as a form XObject and then placed on
+every page, so long documents do not repeat hundreds of text operations.
+"""
+import hashlib
+from dataclasses import dataclass
+from typing import Tuple
+
+from reportlab.lib import colors
+from reportlab.lib.colors import Color
+
+
+@dataclass(frozen=True)
+class WatermarkLayer:
+    """One grid of rotated text repeated across the page"""
+    font: str
+    size: int
+    color: object
+    x_range: Tuple[int, int, int]  # start, padding past the page edge, step
+    y_range: Tuple[int, int, int]
+    angle: float
+    alpha: float = None  # defaults to the alpha of color
+    centred: bool = True
+    text: str = None  # None means the document-specific watermark text
+
+
+def _form_name(layer, text, pagesize):
+    digest = hashlib.md5(repr((layer, text, tuple(pagesize))).encode('utf-8')).hexdigest()[:16]
+    return f"NRWatermark{digest}"
+
+
+def _draw_layer(canvas_obj, pagesize, layer, text):
+    # Forms cannot carry their own transparency, so the layer is drawn opaque
+    # here and the alpha is applied where the form is placed.
+    color = Color(layer.color.red, layer.color.green, layer.color.blue)
+    canvas_obj.setFillColor(color)
+    canvas_obj.setStrokeColor(color)
+    canvas_obj.setFont(layer.font, layer.size)
+    x_start, x_pad, x_step = layer.x_range
+    y_start, y_pad, y_step = layer.y_range
+    for x in range(x_start, int(pagesize[0]) + x_pad, x_step):
+        for y in range(y_start, int(pagesize[1]) + y_pad, y_step):
+            canvas_obj.saveState()
+            canvas_obj.translate(x, y)
+            canvas_obj.rotate(layer.angle)
+            if layer.centred:
+                canvas_obj.drawCentredString(0, 0, text)
+            else:
+                canvas_obj.drawString(0, 0, text)
+            canvas_obj.restoreState()
+
+
+def draw_watermark(canvas_obj, pagesize, layers, text=''):
+    """Place the watermark on the current page, building its forms on first use"""
+    try:
+        built = canvas_obj.__dict__.setdefault('_nextride_forms', set())
+        for layer in layers:
+            layer_text = layer.text if layer.text is not None else text
+            name = _form_name(layer, layer_text, pagesize)
+            if name not in built:
+                canvas_obj.beginForm(name)
+                _draw_layer(canvas_obj, pagesize, layer, layer_text)
+                canvas_obj.endForm()
+                built.add(name)
+            canvas_obj.saveState()
+            alpha = layer.alpha if layer.alpha is not None else layer.color.alpha
+            canvas_obj.setFillAlpha(alpha)
+            canvas_obj.setStrokeAlpha(alpha)
+            canvas_obj.doForm(name)
+            canvas_obj.restoreState()
+    except Exception as e:
+        print(f"Warning: Could not add watermark: {e}")
+
+
+def draw_footer(canvas_obj, text, font, size, x, y=12, centred=True, color=colors.grey, align='left'):
+    """Draw the footer line at the bottom of the current page"""
+    try:
+        canvas_obj.saveState()
+        canvas_obj.setFont(font, size)
+        canvas_obj.setFillColor(color)
+        if centred:
+            canvas_obj.drawCentredString(x, y, text)
+        elif align == 'right':
+            canvas_obj.drawRightString(x, y, text)
+        else:
+            canvas_obj.drawString(x, y, text)
+        canvas_obj.restoreState()
+    except Exception as e:
+        print(f"Warning: Could not add footer: {e}")
@@ -0,0 +1,155 @@
+"""Font registration shared by the themes
+
+TrueType fonts are registered once per process. Base-14 fonts have no Naira
+sign: the monospaced layout uses a TrueType family having one when Courier
+New is not provided, and layouts naming a "naira_font" draw the ₦ of their
+amounts with an embedded family that has one when their own fonts do not.
+Families are looked up in FONT_DIRS; without one (or with EMBED_FONTS=0)
+layouts keep base-14 fonts and their plain-text currency ("N", "NGN").
+
+ReportLab builds the subset font program of every embedded font for every
+document; EmbeddedFont keeps the programs it built, so documents using the
+same characters of a font pay for subsetting once.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+# Directory searched for optional TrueType files (the repository root)
+FONT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Directories searched for Naira fonts, in order; FONT_PATH adds directories ahead of the system ones
+FONT_DIRS = ([FONT_DIR, os.path.join(FONT_DIR, 'fonts')]
+             + [path for path in os.environ.get('FONT_PATH', '').split(os.pathsep) if path]
+             + ['/usr/share/fonts/truetype/msttcorefonts', '/usr/share/fonts/truetype/liberation',
+                '/usr/share/fonts/truetype/liberation2', '/usr/share/fonts/truetype/dejavu',
+                '/usr/share/fonts/TTF', '/Library/Fonts', 'C:/Windows/Fonts'])
+EMBED_FONTS = os.environ.get('EMBED_FONTS', '1').lower() not in ('0', 'false', 'no')
+
+NAIRA = '\u20a6'
+# (regular, bold) files of the families drawing the Naira sign, first found wins;
+# the sans ones match Helvetica's metrics closest first, the mono ones Courier's
+NAIRA_FAMILIES = {
+    'sans': (('arial.ttf', 'arialbd.ttf'), ('LiberationSans-Regular.ttf', 'LiberationSans-Bold.ttf'),
+             ('DejaVuSans.ttf', 'DejaVuSans-Bold.ttf')),
+    'mono': (('cour.ttf', 'courbd.ttf'), ('LiberationMono-Regular.ttf', 'LiberationMono-Bold.ttf'),
+             ('DejaVuSansMono.ttf', 'DejaVuSansMono-Bold.ttf')),
+}
+# Subset font programs kept per embedded font
+SUBSET_CACHE_SIZE = 32
+
+_monospace_fonts = None
+_naira_fonts = {}
+_register_lock = threading.Lock()
+
+
+class EmbeddedFont(TTFont):
+    """TTFont whose subset font programs are built once per distinct subset"""
+
+    def __init__(self, name, filename, asciiReadable=None):
+        TTFont.__init__(self, name, filename, asciiReadable=asciiReadable)
+        self._subsets = OrderedDict()
+        self._subset_lock = threading.Lock()
+        self._build_subset = self.face.makeSubset
+        self.face.makeSubset = self._make_subset
+
+    def _make_subset(self, subset):
+        key = tuple(subset)
+        with self._subset_lock:
+            program = self._subsets.get(key)
+            if program is not None:
+                self._subsets.move_to_end(key)
+                return program
+        program = self._build_subset(subset)
+        with self._subset_lock:
+            self._subsets[key] = program
+            while len(self._subsets) > SUBSET_CACHE_SIZE:
+                self._subsets.popitem(last=False)
+        return program
+
+
+def find_font(filename):
+    """Path of filename in the first of FONT_DIRS having it, or None"""
+    for directory in FONT_DIRS:
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _register_ttf(name, filename, fallback):
+    path = os.path.join(FONT_DIR, filename)
+    if not os.path.exists(path):
+        print(f"WARNING: {filename} not found. Using standard {fallback}.")
+        return fallback
+    try:
+        pdfmetrics.registerFont(EmbeddedFont(name, path))
+        print(f"INFO: Successfully registered {name} font")
+        return name
+    except Exception as e:
+        print(f"ERROR: Could not register {name} font ({e}). Using standard {fallback}.")
+        return fallback
+
+
+def has_glyph(font_name, char=NAIRA):
+    """Whether the registered font font_name draws char (base-14 fonts only cover Latin-1)"""
+    face = getattr(pdfmetrics.getFont(font_name), 'face', None)
+    return ord(char) in getattr(face, 'charToGlyph', ())
+
+
+def _register_family(prefix, families, asciiReadable=None):
+    """Register the first of families ((regular, bold) files) drawing ₦ as prefix and prefix-Bold"""
+    for regular, bold in families:
+        paths = [find_font(regular), find_font(bold)]
+        if None in paths:
+            continue
+        try:
+            fonts = [EmbeddedFont(name, path, asciiReadable=asciiReadable)
+                     for name, path in zip((prefix, f"{prefix}-Bold"), paths)]
+            if not all(ord(NAIRA) in font.face.charToGlyph for font in fonts):
+                print(f"WARNING: {regular} has no Naira sign")
+                continue
+            for font in fonts:
+                pdfmetrics.registerFont(font)
+        except Exception as e:
+            print(f"ERROR: Could not register {regular} ({e})")
+            continue
+        print(f"INFO: Registered {regular} and {bold} as {prefix}")
+        return prefix, f"{prefix}-Bold"
+    return None
+
+
+def monospace_fonts():
+    """Return (normal, bold) font names for the monospaced layout, registering them once.
+
+    Courier New when cour.ttf and courbd.ttf are provided, else a monospaced
+    family drawing ₦, else Courier.
+    """
+    global _monospace_fonts
+    if _monospace_fonts is None:
+        # Threads rendering their first document together register the fonts once
+        with _register_lock:
+            if _monospace_fonts is None:
+                fonts = (_register_ttf('CourierNew', 'cour.ttf', 'Courier'),
+                         _register_ttf('CourierNew-Bold', 'courbd.ttf', 'Courier-Bold'))
+                if fonts == ('Courier', 'Courier-Bold') and EMBED_FONTS:
+                    fonts = _register_family('Monospace', NAIRA_FAMILIES['mono']) or fonts
+                _monospace_fonts = fonts
+    return _monospace_fonts
+
+
+def naira_fonts(style='sans'):
+    """Return registered (normal, bold) font names drawing ₦ in style ('sans' or 'mono'), or None"""
+    if not EMBED_FONTS:
+        return None
+    if style not in _naira_fonts:
+        with _register_lock:
+            if style not in _naira_fonts:
+                # Only the Naira sign is drawn with these fonts: keep their subsets down to that glyph
+                fonts = _register_family(f"Naira{style.capitalize()}", NAIRA_FAMILIES[style], asciiReadable=0)
+                if fonts is None:
+                    print(f"WARNING: No {style} font with the Naira sign found. Using the plain-text currency.")
+                _naira_fonts[style] = fonts
+    return _naira_fonts[style]
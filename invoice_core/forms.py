@@ -0,0 +1,226 @@
+"""Invoice form submissions parsed and validated in one pass
+
+InvoiceForm.parse() reads the nextride_app invoice form once into a small
+typed model (slotted dataclasses, so a 10,000-trip form stays compact):
+prices are converted when they are read, the trips list is decoded and
+validated in the same loop, and every error found is collected and raised
+together as a FormError instead of stopping at the first one:
+
+    try:
+        form = InvoiceForm.parse(request.form, price_book)
+    except FormError as e:
+        return jsonify(e.as_dict()), 400
+    document = form.document(branding)
+"""
+import json
+from dataclasses import dataclass
+from typing import List, Optional
+
+from .model import Client, Document, LineItem, Trip
+from .trip_import import MAX_REPORTED_ERRORS
+
+# Trip type whose trips come from the multiple_trips list (or a spreadsheet)
+MULTIPLE_TRIPS = "Multiple Round Trips"
+# Form fields that must not be blank
+REQUIRED_FIELDS = ('client_name', 'client_address', 'invoice_number', 'invoice_date')
+# Errors quoted in the 'error' message; all of them are in 'errors'
+SUMMARY_ERRORS = 3
+
+
+class FormError(ValueError):
+    """The submitted form is invalid; carries every error found"""
+
+    def __init__(self, errors, trip_errors=(), invalid_trips=0):
+        self.errors = list(errors)
+        self.trip_errors = list(trip_errors)
+        self.invalid_trips = invalid_trips
+        messages = self.errors + [f"Trip {entry['trip']}: {', '.join(entry['errors'])}" for entry in self.trip_errors]
+        summary = '; '.join(messages[:SUMMARY_ERRORS])
+        hidden = len(self.errors) + invalid_trips - SUMMARY_ERRORS
+        ValueError.__init__(self, summary + (f" (and {hidden} more)" if hidden > 0 else ''))
+
+    def as_dict(self):
+        """JSON body of the 400 response"""
+        return {'error': str(self), 'errors': self.errors, 'trip_errors': self.trip_errors,
+                'invalid_trips': self.invalid_trips}
+
+
+@dataclass
+class ClientForm:
+    """Client fields of the form"""
+    __slots__ = ('name', 'address', 'contact')
+    name: str
+    address: str
+    contact: str
+
+
+@dataclass
+class TripForm:
+    """A trip of the form: the single trip, or one entry of the multiple_trips list"""
+    __slots__ = ('pickup', 'destination', 'dropoff', 'trip_date', 'trip_time', 'return_date', 'return_time', 'price')
+    pickup: str
+    destination: str
+    dropoff: str
+    trip_date: str
+    trip_time: str
+    return_date: str
+    return_time: str
+    price: float
+
+    def trip(self, trip_type):
+        """The Trip record printed on the invoice"""
+        return Trip(trip_type=trip_type, pickup=self.pickup, destination=self.destination, dropoff=self.dropoff,
+                    trip_date=self.trip_date, trip_time=self.trip_time, return_date=self.return_date,
+                    return_time=self.return_time, price=self.price)
+
+
+@dataclass
+class InvoiceForm:
+    """A validated invoice form, turned into a Document by document()"""
+    __slots__ = ('number', 'date', 'client', 'trip_type', 'trip', 'trips', 'description', 'quantity', 'price', 'notes')
+    number: str
+    date: str
+    client: ClientForm
+    trip_type: str
+    trip: Optional[TripForm]
+    trips: List[TripForm]
+    description: str
+    quantity: int
+    price: float
+    notes: str
+
+    @classmethod
+    def parse(cls, form, price_book=None, with_trips=True):
+        """Parse and validate an invoice form (a dict or request.form); raises FormError with every error.
+
+        price_book fills the prices left blank; with_trips=False skips the
+        multiple_trips list when the trips come from an uploaded spreadsheet.
+        """
+        def text(name, default=''):
+            return str(form.get(name, default) or '').strip()
+
+        errors = []
+        missing = [name for name in REQUIRED_FIELDS if not text(name)]
+        if missing:
+            errors.append(f"Missing required fields: {', '.join(missing)}")
+
+        trip_type = text('trip_type', 'Single Trip') or 'Single Trip'
+        try:
+            quantity = int(form.get('quantity') or 1)
+            if quantity < 1:
+                errors.append("Quantity must be at least 1")
+        except (ValueError, TypeError):
+            quantity = 1
+            errors.append(f"Quantity '{form.get('quantity')}' is not a whole number")
+        try:
+            price = float(form.get('price') or 0)
+        except (ValueError, TypeError):
+            price = 0.0
+            errors.append(f"Price '{form.get('price')}' is not a number")
+
+        trip, trips, trip_errors, invalid = None, [], [], 0
+        if trip_type == MULTIPLE_TRIPS:
+            if with_trips:
+                trips, trip_errors, invalid = parse_trips(form.get('multiple_trips') or '[]', trip_type, price_book,
+                                                          errors)
+        else:
+            trip = TripForm(pickup=text('pickup_point'), destination='', dropoff=text('dropoff_point'),
+                            trip_date=text('trip_date'), trip_time=text('trip_time'),
+                            return_date=text('return_date'), return_time=text('return_time'), price=price)
+            if not trip.pickup or not trip.dropoff or not trip.trip_date:
+                errors.append("Please fill in all required trip details")
+            if trip_type == "Round Trip" and not trip.return_date:
+                errors.append("Return Date is required for Round Trips")
+            if not price and price_book is not None and trip.pickup and trip.dropoff:
+                # Round trips are doubled when the amount is computed, so price them one way
+                suggested = price_book.suggest(trip.pickup, trip.dropoff, 'Single Trip')['price']
+                if suggested is not None:
+                    price = trip.price = suggested
+
+        if errors or invalid:
+            raise FormError(errors, trip_errors, invalid)
+        return cls(number=text('invoice_number'), date=text('invoice_date'),
+                   client=ClientForm(text('client_name'), text('client_address'), text('client_contact')),
+                   trip_type=trip_type, trip=trip, trips=trips, description=text('description'), quantity=quantity,
+                   price=price, notes=text('notes'))
+
+    def document(self, branding, trips=None):
+        """The invoice Document; trips (Trip records, e.g. from a spreadsheet) replace the form's trips"""
+        if trips is None and self.trip_type == MULTIPLE_TRIPS:
+            trips = [trip.trip(self.trip_type) for trip in self.trips]
+        if trips:
+            total = sum(trip.price for trip in trips)
+            items = [LineItem(description=self.description, quantity=len(trips), price=total / len(trips),
+                              amount=total)]
+            single_trip = None
+        else:
+            trips = []
+            amount = self.quantity * self.price
+            if self.trip_type == "Round Trip":
+                amount = amount * 2
+            items = [LineItem(description=self.description, quantity=self.quantity, price=self.price, amount=amount)]
+            single_trip = Trip(trip_type=self.trip_type, pickup=self.trip.pickup, dropoff=self.trip.dropoff,
+                               trip_date=self.trip.trip_date, trip_time=self.trip.trip_time,
+                               return_date=self.trip.return_date, return_time=self.trip.return_time)
+        return Document(kind='invoice', number=self.number, date=self.date,
+                        client=Client(self.client.name, self.client.address, self.client.contact), branding=branding,
+                        trip=single_trip, trips=trips, items=items, notes=self.notes)
+
+
+def _field(trip, key):
+    # Fields left out of a trip print as N/A
+    value = trip.get(key)
+    return 'N/A' if value is None else str(value)
+
+
+def parse_trips(raw, trip_type, price_book=None, errors=None):
+    """Decode and validate the multiple_trips JSON list in one pass.
+
+    Returns (trips, trip_errors, invalid): the valid TripForms, the errors of
+    the first MAX_REPORTED_ERRORS invalid trips as [{'trip': n, 'errors':
+    [...]}] and the number of invalid trips. List-level errors are appended to
+    errors.
+    """
+    errors = [] if errors is None else errors
+    try:
+        rows = json.loads(raw) if isinstance(raw, str) else raw
+    except ValueError as e:
+        errors.append(f"The trips list is not valid JSON: {e}")
+        return [], [], 0
+    if not isinstance(rows, list):
+        errors.append("The trips list must be a JSON array")
+        return [], [], 0
+    if not rows:
+        errors.append("Please add at least one trip for Multiple Round Trips")
+        return [], [], 0
+
+    trips, trip_errors, invalid = [], [], 0
+    for number, row in enumerate(rows, 1):
+        if not isinstance(row, dict):
+            row_errors, row = ["Trip must be an object"], {}
+        else:
+            row_errors = []
+            if not row.get('pickup') or not row.get('destination') or not row.get('tripDate'):
+                row_errors.append("Missing required fields (Pickup, Destination, or Trip Date)")
+        price = row.get('price')
+        try:
+            price = float(price or 0)
+        except (ValueError, TypeError):
+            row_errors.append(f"Invalid price format '{price}'")
+        else:
+            if price <= 0 and price_book is not None and row.get('pickup'):
+                price = price_book.suggest(row['pickup'], row.get('destination') or row.get('dropoff', ''),
+                                           trip_type)['price'] or 0.0
+            if price <= 0:
+                row_errors.append("Price must be greater than 0")
+
+        if row_errors:
+            invalid += 1
+            if len(trip_errors) < MAX_REPORTED_ERRORS:
+                trip_errors.append({'trip': number, 'errors': row_errors})
+            continue
+        trips.append(TripForm(pickup=_field(row, 'pickup'), destination=_field(row, 'destination'),
+                              dropoff=_field(row, 'dropoff'), trip_date=_field(row, 'tripDate'),
+                              trip_time=_field(row, 'tripTime'), return_date=_field(row, 'returnDate'),
+                              return_time=_field(row, 'returnTime'), price=price))
+    return trips, trip_errors, invalid
@@ -0,0 +1,158 @@
+"""Cached logo and signature images
+
+Branding images are decoded, downsampled to print resolution and encoded into
+PDF image streams once per process instead of once per document. The caches
+are shared by every render thread and only touched under _cache_lock; cached
+readers and streams are never modified once stored.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfdoc
+from reportlab.platypus.flowables import Flowable
+
+# Highest resolution kept for an image at its printed size
+MAX_IMAGE_DPI = 300
+# Number of prepared images / encoded streams kept in memory
+IMAGE_CACHE_SIZE = 32
+
+_readers = OrderedDict()
+_encoded_streams = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _recall(cache, key):
+    with _cache_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def _remember(cache, key, value):
+    with _cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > IMAGE_CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+class _PreparedImage(ImageReader):
+    """ImageReader whose encoded PDF stream may be reused across documents"""
+    reuse_stream = True
+
+
+class CachedImage(Flowable):
+    """Draw a prepared image; the PDF keeps a single copy however often it is drawn"""
+
+    def __init__(self, reader, width, height, hAlign='CENTER'):
+        Flowable.__init__(self)
+        self.reader = reader
+        self.drawWidth = width
+        self.drawHeight = height
+        self.hAlign = hAlign
+
+    def wrap(self, availWidth, availHeight):
+        return self.drawWidth, self.drawHeight
+
+    def draw(self):
+        self.canv.drawImage(self.reader, 0, 0, self.drawWidth, self.drawHeight, mask='auto')
+
+
+def _prepared_reader(image_path, width, height):
+    """Return a reader for image_path scaled down to MAX_IMAGE_DPI at the given size"""
+    stat = os.stat(image_path)
+    key = (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size, round(width), round(height))
+    reader = _recall(_readers, key)
+    if reader is not None:
+        return reader
+
+    from PIL import Image as PILImage
+    with PILImage.open(image_path) as source:
+        source.load()
+        image = source
+        max_size = (max(1, int(width * MAX_IMAGE_DPI / 72.0)), max(1, int(height * MAX_IMAGE_DPI / 72.0)))
+        if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
+            image = image.copy()
+            image.thumbnail(max_size, PILImage.LANCZOS)
+        if image.mode not in ('RGB', 'RGBA', 'L'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        elif image is source:
+            image = source.copy()
+
+    reader = _PreparedImage(image)
+    _remember(_readers, key, reader)
+    return reader
+
+
+def image_size(image_path):
+    """Pixel size of an image file"""
+    return ImageReader(image_path).getSize()
+
+
+def load_image(image_path, width=None, height=None, keep_aspect=True):
+    """Load an image flowable fitted inside width x height, keeping its aspect ratio
+    unless keep_aspect is False, in which case it is stretched to the box.
+
+    Returns None when the file is missing or unreadable.
+    """
+    try:
+        if not image_path:
+            return None
+        if not os.path.exists(image_path):
+            print(f"Image path does not exist: {image_path}")
+            return None
+
+        if not keep_aspect and width and height:
+            return CachedImage(_prepared_reader(image_path, width, height), width, height)
+
+        img_width, img_height = image_size(image_path)
+        aspect = img_height / float(img_width)
+
+        if width is None:
+            width = min(img_width, 200)  # Max 200 points width
+
+        if height is None:
+            height = width * aspect
+        else:
+            new_height = width * aspect
+            if new_height > height:
+                width = height / aspect
+            else:
+                height = new_height
+
+        return CachedImage(_prepared_reader(image_path, width, height), width, height)
+    except Exception as e:
+        print(f"Error loading image {image_path}: {e}")
+        return None
+
+
+# Fast path: keep the encoded image stream of prepared images so later documents
+# skip the zlib/ASCII85 encoding of the same pixels.
+_load_image_from_src = pdfdoc.PDFImageXObject.loadImageFromSRC
+
+
+def _load_image_from_src_cached(self, im):
+    if not getattr(im, 'reuse_stream', False):
+        return _load_image_from_src(self, im)
+
+    cached = _recall(_encoded_streams, self.name)
+    if cached is None:
+        _load_image_from_src(self, im)
+        state = dict(self.__dict__)
+        smask = state.pop('_smask', None)
+        cached = (state, dict(smask.__dict__) if smask is not None else None)
+        _remember(_encoded_streams, self.name, cached)
+        return
+
+    state, smask_state = cached
+    self.__dict__.update(state)
+    if smask_state is not None:
+        smask = pdfdoc.PDFImageXObject.__new__(pdfdoc.PDFImageXObject)
+        smask.__dict__.update(smask_state)
+        self._smask = smask
+
+
+pdfdoc.PDFImageXObject.loadImageFromSRC = _load_image_from_src_cached
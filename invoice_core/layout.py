@@ -0,0 +1,308 @@
+"""Declarative page layouts
+
+Page size, margins, colors, paragraph and table styles, column widths, page
+decorations and the section order of each document kind are described in
+invoice_core/layouts/<theme>.json. A layout file is compiled once into a
+CompiledLayout holding ReportLab style objects and section factories, and is
+recompiled when the file changes, so rendering a document only binds its data
+into the sections.
+
+Entries of a document's "sections" list are either the name of a
+``section_<name>`` method of the theme or one of the declarative blocks:
+
+    {"section": "services", "space_before": 5, "space_after": 25}
+    {"text": "OFFICIAL RECEIPT", "style": "receipt_title"}
+    {"rule": {"width": "100%", "thickness": 1, "color": "$brand_blue"}}
+    {"spacer": 8}
+    {"keep_together": ["signature", "footer"]}
+
+Text blocks and decoration texts are str.format templates receiving the
+document as ``doc`` (e.g. "{doc.branding.name}"). Strings starting with "$"
+refer to the layout's colors or to the theme's fonts ("$font", "$bold_font").
+
+"currency" is the plain-text currency of amounts. Amounts print ₦ instead
+when the theme's fonts draw it or, with "naira_font" ("sans" or "mono"), in
+an embedded font of that style when one is found.
+"""
+import json
+import os
+import threading
+import time
+
+from reportlab.lib import colors, pagesizes
+from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT, TA_JUSTIFY
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch, mm, cm
+from reportlab.platypus import KeepTogether, Paragraph, Spacer, TableStyle
+from reportlab.platypus.flowables import HRFlowable
+
+from .decorations import WatermarkLayer, draw_watermark, draw_footer
+from .fonts import NAIRA, has_glyph, naira_fonts
+
+LAYOUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'layouts')
+# Seconds between checks of a layout file for changes
+LAYOUT_CHECK_INTERVAL = 1.0
+
+UNITS = {'in': inch, 'mm': mm, 'cm': cm, 'pt': 1}
+ALIGNMENTS = {'left': TA_LEFT, 'center': TA_CENTER, 'right': TA_RIGHT, 'justify': TA_JUSTIFY}
+
+_layouts = {}
+_compile_lock = threading.Lock()
+
+
+class LayoutError(ValueError):
+    """Raised when a layout file cannot be compiled"""
+
+
+def length(value):
+    """Convert 12, "1.5in", "15mm" or "2cm" to points; percentages are returned unchanged"""
+    if isinstance(value, (int, float)):
+        return value
+    value = str(value).strip()
+    if value.endswith('%'):
+        return value
+    for suffix, factor in UNITS.items():
+        if value.endswith(suffix):
+            return float(value[:-len(suffix)]) * factor
+    return float(value)
+
+
+def _color(value):
+    if isinstance(value, (list, tuple)):
+        return colors.Color(*value)
+    color = colors.toColor(value)
+    if color is None:
+        raise LayoutError(f"Unknown color: {value}")
+    return color
+
+
+class DocumentLayout:
+    """Compiled layout of one document kind"""
+
+    def __init__(self, sections, watermark=(), watermark_text='', watermark_fallback='', footer=None, strings=None):
+        self.sections = sections
+        self.watermark = watermark
+        self.watermark_text = watermark_text
+        self.watermark_fallback = watermark_fallback
+        self.footer = footer
+        self.strings = strings or {}
+
+    def flowables(self, document):
+        """Bind document into every section"""
+        elements = []
+        for build in self.sections:
+            elements.extend(build(document))
+        return elements
+
+    def page_callback(self, document, page_offset=0):
+        """Return the onPage callback drawing watermark and footer, or None.
+
+        page_offset is added to the page numbers of documents rendered in parts.
+        """
+        if not self.watermark and not self.footer:
+            return None
+        watermark = self.watermark
+        watermark_text = self.watermark_text.format(doc=document) or self.watermark_fallback
+        footer = self.footer
+        footer_text = footer['text'].format(doc=document) if footer else ''
+
+        def add_page_elements(canvas_obj, doc):
+            """Add watermark and footer to each page"""
+            if watermark:
+                draw_watermark(canvas_obj, doc.pagesize, watermark, watermark_text)
+            if footer:
+                centred = footer['x'] == 'center'
+                x = doc.pagesize[0] / 2 if centred else doc.leftMargin
+                draw_footer(canvas_obj, footer_text, footer['font'], footer['size'], x,
+                            y=footer['y'], centred=centred, color=footer['color'])
+                if footer['page_label']:
+                    page_label = footer['page_label'].format(page=page_offset + canvas_obj.getPageNumber())
+                    draw_footer(canvas_obj, page_label, footer['font'], footer['size'],
+                                doc.pagesize[0] - doc.rightMargin, y=footer['y'], centred=False,
+                                color=footer['color'], align='right')
+
+        return add_page_elements
+
+
+class CompiledLayout:
+    """Styles, widths and section factories built from one layout file"""
+
+    def __init__(self, theme, spec):
+        self.spec = spec
+        self.variables = dict(theme.fonts())
+        self.colors = {name: _color(value) for name, value in spec.get('colors', {}).items()}
+        self.variables.update(self.colors)
+
+        self.pagesize = getattr(pagesizes, spec.get('pagesize', 'A4'))
+        self.margins = {f"{side}Margin": length(value) for side, value in spec.get('margins', {}).items()}
+        self.currency = self.currency_bold = self.currency_symbol = spec.get('currency', 'N')
+        self.naira_font = None
+        if has_glyph(self.variables['font']) and has_glyph(self.variables['bold_font']):
+            self.currency = self.currency_bold = self.currency_symbol = NAIRA
+            self.naira_font = self.variables['font']
+        elif spec.get('naira_font') and naira_fonts(spec['naira_font']):
+            fonts = naira_fonts(spec['naira_font'])
+            self.naira_font = fonts[0]
+            # Paragraph markup: the font tag replaces the bold of the text around it, hence two weights
+            self.currency, self.currency_bold = (f'<font name="{font}">{NAIRA}</font>' for font in fonts)
+            self.currency_symbol = NAIRA
+        self.money_format = spec.get('money', '{currency}{value:,.2f}')
+        self.widths = {name: [length(w) for w in value] if isinstance(value, list) else length(value)
+                       for name, value in spec.get('widths', {}).items()}
+        self.styles = self._paragraph_styles(spec.get('paragraph_styles', {}))
+        self.table_styles = {name: TableStyle([self._table_command(cmd) for cmd in commands])
+                             for name, commands in spec.get('table_styles', {}).items()}
+        decorations = spec.get('decorations', {})
+        self.documents = {kind: self._document(theme, kind, options, decorations)
+                          for kind, options in spec.get('documents', {}).items()}
+
+    def resolve(self, value):
+        """Replace "$name" references with fonts and colors"""
+        if isinstance(value, str) and value.startswith('$'):
+            try:
+                return self.variables[value[1:]]
+            except KeyError:
+                raise LayoutError(f"Unknown layout variable: {value}") from None
+        return value
+
+    def money(self, value, bold=False):
+        """Format an amount with the layout's currency (Paragraph markup); bold for bold text"""
+        return self.money_format.format(currency=self.currency_bold if bold else self.currency, value=value)
+
+    def _paragraph_styles(self, specs):
+        sample = getSampleStyleSheet()
+        styles = {}
+        for name, props in specs.items():
+            props = {key: self.resolve(value) for key, value in props.items()}
+            parent_name = props.pop('parent', 'Normal')
+            parent = styles.get(parent_name) or sample[parent_name]
+            if isinstance(props.get('alignment'), str):
+                props['alignment'] = ALIGNMENTS[props['alignment']]
+            styles[name] = ParagraphStyle(name, parent=parent, **props)
+        return styles
+
+    def _table_command(self, command):
+        op, start, stop, *args = command
+        return (op, tuple(start), tuple(stop), *[self.resolve(arg) for arg in args])
+
+    def _document(self, theme, kind, options, decorations):
+        sections = [self._section(theme, entry) for entry in options.get('sections', [])]
+        page = decorations.get(options['decorations']) if options.get('decorations') else {}
+
+        watermark_spec = page.get('watermark', {})
+        watermark = tuple(
+            WatermarkLayer(self.resolve(layer['font']), layer['size'], self.resolve(layer['color']),
+                           tuple(layer['x']), tuple(layer['y']), layer['angle'], alpha=layer.get('alpha'),
+                           centred=layer.get('centred', True), text=layer.get('text'))
+            for layer in watermark_spec.get('layers', []))
+
+        footer = page.get('footer')
+        if footer:
+            footer = {'text': footer['text'], 'font': self.resolve(footer.get('font', '$font')),
+                      'size': footer.get('size', 7), 'x': footer.get('x', 'center'), 'y': footer.get('y', 12),
+                      'page_label': footer.get('page_label', ''),
+                      'color': self.resolve(footer['color']) if 'color' in footer else colors.grey}
+
+        return DocumentLayout(sections, watermark, watermark_spec.get('text', ''), watermark_spec.get('fallback', ''),
+                              footer, options.get('strings'))
+
+    def _section(self, theme, entry):
+        if isinstance(entry, str):
+            entry = {'section': entry}
+
+        if 'section' in entry:
+            method = getattr(theme, f"section_{entry['section']}", None)
+            if method is None:
+                raise LayoutError(f"Theme '{theme.name}' has no section '{entry['section']}'")
+            build = method
+        elif 'text' in entry:
+            template = entry['text']
+            style = self.styles[entry.get('style', 'base')]
+
+            def build(document):
+                return [Paragraph(template.format(doc=document), style)]
+        elif 'rule' in entry:
+            rule = {key: self.resolve(value) for key, value in entry['rule'].items()}
+
+            def build(document):
+                return [HRFlowable(**rule)]
+        elif 'spacer' in entry:
+            height = length(entry['spacer'])
+
+            def build(document):
+                return [Spacer(1, height)]
+        elif 'keep_together' in entry:
+            parts = [self._section(theme, part) for part in entry['keep_together']]
+
+            def build(document):
+                elements = []
+                for part in parts:
+                    elements.extend(part(document))
+                return [KeepTogether(elements)] if elements else []
+        else:
+            raise LayoutError(f"Unknown layout block: {entry}")
+
+        before = length(entry.get('space_before', 0))
+        after = length(entry.get('space_after', 0))
+        if not before and not after:
+            return build
+
+        def spaced(document):
+            elements = build(document)
+            if not elements:
+                return elements
+            return ([Spacer(1, before)] if before else []) + list(elements) + ([Spacer(1, after)] if after else [])
+
+        return spaced
+
+
+def _compile(theme, path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            spec = json.load(f)
+    except (OSError, ValueError) as e:
+        raise LayoutError(f"Could not read layout {path}: {e}") from e
+    try:
+        return CompiledLayout(theme, spec)
+    except LayoutError:
+        raise
+    except Exception as e:
+        raise LayoutError(f"Could not compile layout {path}: {e}") from e
+
+
+def get_layout(theme):
+    """Return the compiled layout of theme, recompiling it when its file changed.
+
+    A layout that fails to recompile keeps the previously compiled version.
+    """
+    path = theme.layout_path
+    entry = _layouts.get(theme.name)
+    now = time.monotonic()
+    if entry is not None and now - entry['checked'] < LAYOUT_CHECK_INTERVAL:
+        return entry['layout']
+
+    # Compiled layouts are never modified; a recompile swaps in a new one, once, under the lock
+    with _compile_lock:
+        return _reload_layout(theme, path, _layouts.get(theme.name), now)
+
+
+def _reload_layout(theme, path, entry, now):
+    stat = os.stat(path)
+    signature = (path, stat.st_mtime_ns, stat.st_size)
+    if entry is not None and entry['signature'] == signature:
+        entry['checked'] = now
+        return entry['layout']
+
+    try:
+        layout = _compile(theme, path)
+    except LayoutError as e:
+        if entry is None:
+            raise
+        print(f"Error reloading layout for theme '{theme.name}': {e}")
+        entry['signature'], entry['checked'] = signature, now
+        return entry['layout']
+
+    if entry is not None:
+        print(f"Reloaded layout for theme '{theme.name}' from {path}")
+    _layouts[theme.name] = {'layout': layout, 'signature': signature, 'checked': now}
+    return layout
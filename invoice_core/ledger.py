@@ -0,0 +1,200 @@
+"""Ledger of issued invoices and receipts for accounting exports
+
+Every generated document adds a row keyed by its number, with its date
+normalized to YYYY-MM-DD so a date range is a range scan of the
+(date, number) index. Exports page through that index with keyset
+pagination: each page is one short query continuing after the last
+(date, number) seen, so a million-row export holds one page in memory and
+never keeps a read transaction open between pages.
+
+    for chunk in export_chunks(ledger.rows('2025-01-01', '2025-03-31'), 'csv'):
+        ...
+"""
+import csv
+import io
+import json
+from datetime import datetime
+
+from .storage import DEFAULT_DB_PATH, connect, prepare
+
+# Rows fetched per keyset page
+PAGE_SIZE = 1000
+# Characters sent per chunk of a streamed export
+EXPORT_CHUNK_SIZE = 64 * 1024
+# Exported columns, in order
+COLUMNS = ('number', 'kind', 'date', 'client', 'contact', 'description', 'total', 'payment_method',
+           'printed_date', 'issued_at')
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+# First characters that make a spreadsheet read a CSV cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+# Date formats printed by the apps or typed into trip spreadsheets, tried in order
+DATE_FORMATS = ('%Y-%m-%d', '%B %d, %Y', '%b %d, %Y', '%B %d %Y', '%b %d %Y', '%d/%m/%Y', '%d-%m-%Y', '%d %B %Y',
+                '%d %b %Y')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger (
+    number TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    date TEXT NOT NULL,
+    client TEXT NOT NULL,
+    contact TEXT NOT NULL,
+    description TEXT NOT NULL,
+    total REAL NOT NULL,
+    payment_method TEXT NOT NULL,
+    printed_date TEXT NOT NULL,
+    issued_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ledger_date ON ledger (date, number);
+CREATE INDEX IF NOT EXISTS ledger_client ON ledger (client, date, number);
+"""
+
+
+def iso_date(text, default=None):
+    """YYYY-MM-DD of a printed document date, or default when it cannot be read"""
+    text = (text or '').strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    return default
+
+
+class Ledger:
+    """Issued documents by date, exported page by page"""
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        prepare(path)
+        with connect(path) as conn:
+            conn.executescript(SCHEMA)
+            empty = conn.execute("SELECT 1 FROM ledger LIMIT 1").fetchone() is None
+        if empty:
+            self.backfill()
+
+    def add(self, document):
+        """Record a generated document; its number must not be in the ledger yet"""
+        issued_at = datetime.now()
+        payment = document.payment
+        description = '; '.join(item.description.splitlines()[0] for item in document.items
+                                if item.description.strip())
+        with connect(self.path) as conn:
+            conn.execute("INSERT INTO ledger (number, kind, date, client, contact, description, total, "
+                         "payment_method, printed_date, issued_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         (document.number, document.kind,
+                          iso_date(document.date, issued_at.strftime('%Y-%m-%d')),
+                          document.client.name, document.client.contact, description, document.total,
+                          payment.method if payment else '', document.date,
+                          issued_at.isoformat(timespec='seconds')))
+
+    def backfill(self):
+        """Add the documents indexed for search before the ledger existed; returns how many"""
+        added = 0
+        with connect(self.path) as conn:
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'search_sources'").fetchone() is None:
+                return 0
+            rows = conn.execute("SELECT number, kind, date, client, total FROM search_sources "
+                                "WHERE source = 'generated'")
+            for row in rows:
+                added += conn.execute("INSERT OR IGNORE INTO ledger (number, kind, date, client, contact, "
+                                      "description, total, payment_method, printed_date, issued_at) "
+                                      "VALUES (?, ?, ?, ?, '', '', ?, '', ?, '')",
+                                      (row['number'], row['kind'], iso_date(row['date'], ''), row['client'],
+                                       row['total'], row['date'])).rowcount
+        return added
+
+    def rows(self, start=None, end=None, kind=None, page_size=PAGE_SIZE):
+        """Generate ledger rows (dicts) dated start to end inclusive (YYYY-MM-DD), by date and number"""
+        conditions, params = [], []
+        if start:
+            conditions.append("date >= ?")
+            params.append(start)
+        if end:
+            conditions.append("date <= ?")
+            params.append(end)
+        if kind:
+            conditions.append("kind = ?")
+            params.append(kind)
+        columns = ', '.join(COLUMNS)
+        cursor = None
+        while True:
+            where = conditions + (["(date, number) > (?, ?)"] if cursor else [])
+            sql = (f"SELECT {columns} FROM ledger {'WHERE ' + ' AND '.join(where) if where else ''} "
+                   "ORDER BY date, number LIMIT ?")
+            with connect(self.path) as conn:
+                page = conn.execute(sql, params + list(cursor or ()) + [page_size]).fetchall()
+            for row in page:
+                yield dict(row)
+            if len(page) < page_size:
+                return
+            cursor = (page[-1]['date'], page[-1]['number'])
+
+    def client_history(self, client, end=None):
+        """Generate the rows (dicts) of client's documents dated up to end (YYYY-MM-DD), by date and number.
+
+        One query over the (client, date, number) index, read as it is consumed.
+        """
+        columns = ', '.join(COLUMNS)
+        sql = f"SELECT {columns} FROM ledger WHERE client = ?{' AND date <= ?' if end else ''} ORDER BY date, number"
+        with connect(self.path) as conn:
+            for row in conn.execute(sql, (client, end) if end else (client,)):
+                yield dict(row)
+
+    def active_clients(self, start=None, end=None):
+        """Names of the clients with documents dated start to end inclusive (YYYY-MM-DD)"""
+        conditions, params = [], []
+        if start:
+            conditions.append("date >= ?")
+            params.append(start)
+        if end:
+            conditions.append("date <= ?")
+            params.append(end)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        with connect(self.path) as conn:
+            return [row['client'] for row in
+                    conn.execute(f"SELECT DISTINCT client FROM ledger {where} ORDER BY client", params)]
+
+
+def csv_cell(value):
+    """value for a CSV cell; text a spreadsheet would run as a formula (client names, descriptions typed into the
+    forms) is prefixed with an apostrophe so it is shown as text"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def export_lines(rows, format='csv'):
+    """Generate the lines of an export of rows as csv (with a header) or jsonl"""
+    if format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        def take():
+            line = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            return line
+
+        writer.writerow(COLUMNS)
+        yield take()
+        for row in rows:
+            writer.writerow([csv_cell(row[column]) for column in COLUMNS])
+            yield take()
+    elif format == 'jsonl':
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False) + '\n'
+    else:
+        raise ValueError(f"Unknown export format: {format}")
+
+
+def export_chunks(rows, format='csv', chunk_size=EXPORT_CHUNK_SIZE):
+    """export_lines() joined into chunks of about chunk_size characters for a streamed response"""
+    lines, size = [], 0
+    for line in export_lines(rows, format):
+        lines.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield ''.join(lines)
+            lines, size = [], 0
+    if lines:
+        yield ''.join(lines)
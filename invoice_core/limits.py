@@ -0,0 +1,154 @@
+"""Guards against documents too large or too slow to render
+
+Text typed into the forms is laid out by ReportLab paragraph by paragraph,
+and most of it sits in table cells that cannot split across pages: a few
+thousand characters of notes or some sixty service scope lines already
+overflow a page. Before a document is recorded and rendered:
+
+- check_document() compares every text field with FIELD_LIMITS (characters
+  and lines) and the number of line items and trips with MAX_ITEMS and
+  MAX_TRIPS, raising DocumentTooLarge with every problem found;
+- estimate_seconds() predicts the render time from the same counts, and
+  render_document(..., budget=seconds) refuses a document whose estimate is
+  over the budget before starting.
+
+While rendering, a Deadline is checked after every flowable ReportLab lays
+out (through the doc template's progress callback): past the budget the
+build stops with RenderBudgetExceeded and the thread is free again.
+"""
+import time
+
+from reportlab.platypus.doctemplate import LayoutError as PageLayoutError
+
+# (characters, lines) allowed in each kind of text field
+FIELD_LIMITS = {
+    'short': (200, 2),
+    'address': (500, 8),
+    'description': (1500, 20),
+    'service_scope': (2000, 40),
+    'notes': (3000, 60),
+}
+# Line items of one document: itemized rentals run to several hundred lines, and 1,000 short items render in about
+# 2s; items with long text are bounded by the render budget instead
+MAX_ITEMS = 1000
+# Trips of one multi-trip invoice
+MAX_TRIPS = 10000
+# Problems listed in a DocumentTooLarge message; all of them are in .problems
+SUMMARY_PROBLEMS = 3
+
+# Render time model, measured on the three themes: seconds per document, line item, trip and
+# thousand characters of text
+BASE_SECONDS = 0.02
+SECONDS_PER_ITEM = 0.0015
+SECONDS_PER_TRIP = 0.002
+SECONDS_PER_KILOCHAR = 0.005
+
+
+class DocumentTooLarge(ValueError):
+    """Fields of the document are over their limits; carries every problem found"""
+
+    def __init__(self, problems):
+        self.problems = list(problems)
+        hidden = len(self.problems) - SUMMARY_PROBLEMS
+        ValueError.__init__(self, '; '.join(self.problems[:SUMMARY_PROBLEMS])
+                            + (f" (and {hidden} more)" if hidden > 0 else ''))
+
+    def as_dict(self):
+        """JSON body of the 400 response"""
+        return {'error': str(self), 'errors': self.problems}
+
+
+class RenderBudgetExceeded(RuntimeError):
+    """The render was stopped (or refused) because it would take longer than its budget"""
+
+
+class Deadline:
+    """Point in time a render must finish by; check() raises RenderBudgetExceeded past it.
+
+    Wall-clock based, so a Deadline handed to a worker process means the same moment there.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.time() + seconds
+
+    def remaining(self):
+        return self.expires - time.time()
+
+    def check(self):
+        if time.time() > self.expires:
+            raise RenderBudgetExceeded(f"Rendering took longer than its {self.seconds:g}s budget; "
+                                       f"shorten the notes, descriptions or trip list")
+
+    def progress(self, kind, value):
+        """ReportLab progress callback (doc.setProgressCallBack), called after every flowable"""
+        self.check()
+
+
+def _text_fields(document):
+    yield 'Client name', document.client.name, 'short'
+    yield 'Client address', document.client.address, 'address'
+    yield 'Client contact', document.client.contact, 'short'
+    yield 'Number', document.number, 'short'
+    yield 'Date', document.date, 'short'
+    yield 'Notes', document.notes, 'notes'
+    if document.trip is not None:
+        for name in ('trip_type', 'pickup', 'destination', 'dropoff'):
+            yield f"Trip {name.replace('_', ' ')}", getattr(document.trip, name), 'short'
+    if document.payment is not None:
+        yield 'Payment method', document.payment.method, 'short'
+    for index, item in enumerate(document.items, 1):
+        prefix = '' if len(document.items) == 1 else f"Line item {index} "
+        yield f"{prefix}description".capitalize(), item.description, 'description'
+        yield f"{prefix}route".capitalize(), item.route, 'short'
+        yield f"{prefix}service scope".capitalize(), item.service_scope, 'service_scope'
+
+
+def check_document(document):
+    """Raise DocumentTooLarge listing every field over FIELD_LIMITS and too many items or trips"""
+    problems = []
+    for label, value, kind in _text_fields(document):
+        if not value:
+            continue
+        max_chars, max_lines = FIELD_LIMITS[kind]
+        if len(value) > max_chars:
+            problems.append(f"{label}: {len(value):,} characters, at most {max_chars:,} allowed")
+        lines = value.count('\n') + 1
+        if lines > max_lines:
+            problems.append(f"{label}: {lines:,} lines, at most {max_lines:,} allowed")
+    if len(document.items) > MAX_ITEMS:
+        problems.append(f"Line items: {len(document.items):,}, at most {MAX_ITEMS:,} allowed")
+    if len(document.trips) > MAX_TRIPS:
+        problems.append(f"Trips: {len(document.trips):,}, at most {MAX_TRIPS:,} allowed")
+    for index, trip in enumerate(document.trips, 1):
+        # Trip fields are short: one check per trip keeps a 10,000-trip manifest cheap
+        if max(len(trip.pickup), len(trip.destination), len(trip.dropoff)) > FIELD_LIMITS['short'][0]:
+            problems.append(f"Trip {index}: a place name over {FIELD_LIMITS['short'][0]} characters")
+    if problems:
+        raise DocumentTooLarge(problems)
+
+
+def estimate_seconds(document):
+    """Rough single-process render time of document, from its items, trips and text"""
+    characters = sum(len(value or '') for _label, value, _kind in _text_fields(document))
+    return (BASE_SECONDS + SECONDS_PER_ITEM * len(document.items) + SECONDS_PER_TRIP * len(document.trips)
+            + SECONDS_PER_KILOCHAR * characters / 1000)
+
+
+def check_budget(document, budget, processes=1):
+    """Deadline for rendering document within budget seconds on processes processes.
+
+    Raises RenderBudgetExceeded when the estimate is already over the budget.
+    """
+    estimate = estimate_seconds(document) / processes
+    if estimate > budget:
+        raise RenderBudgetExceeded(f"The {document.kind} would take about {estimate:.0f}s to render, over the "
+                                   f"{budget:g}s budget; split it into smaller documents")
+    return Deadline(budget)
+
+
+def page_overflow(document, error):
+    """DocumentTooLarge for a ReportLab LayoutError: a section too long to fit on a page"""
+    print(f"WARNING: {document.kind} {document.number} does not fit the page: {str(error)[:200]}")
+    return DocumentTooLarge([f"A section of the {document.kind} is too long to fit on a page; "
+                             f"shorten the notes, descriptions or service scope"])
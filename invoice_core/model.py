@@ -0,0 +1,128 @@
+"""Document model shared by every invoice and receipt layout"""
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+# Keys of the company_info dictionaries kept by the Flask apps
+COMPANY_FIELDS = ('name', 'address', 'phones', 'emails', 'tagline', 'description', 'footer', 'bank_details')
+
+
+@dataclass
+class Branding:
+    """Company details, logo and signature printed on every document"""
+    name: str = ''
+    address: str = ''
+    phones: str = ''
+    emails: str = ''
+    tagline: str = ''
+    description: str = ''
+    footer: str = ''
+    bank_details: str = ''
+    logo_path: Optional[str] = None
+    signature_path: Optional[str] = None
+
+    @classmethod
+    def from_company_info(cls, company_info, logo_path=None, signature_path=None):
+        """Build branding from a company_info dictionary"""
+        values = {key: company_info.get(key, '') or '' for key in COMPANY_FIELDS}
+        return cls(logo_path=logo_path, signature_path=signature_path, **values)
+
+
+@dataclass
+class Client:
+    """The party billed on an invoice or paying on a receipt"""
+    name: str = ''
+    address: str = ''
+    contact: str = ''
+
+
+@dataclass
+class Trip:
+    """A single journey; multi-trip invoices carry a list of these"""
+    trip_type: str = ''
+    pickup: str = ''
+    destination: str = ''
+    dropoff: str = ''
+    trip_date: str = ''
+    trip_time: str = ''
+    return_date: str = ''
+    return_time: str = ''
+    price: float = 0.0
+
+
+@dataclass
+class LineItem:
+    """A billed service row (description x quantity x price)"""
+    description: str = ''
+    quantity: int = 1
+    price: float = 0.0
+    amount: Optional[float] = None
+    route: str = ''
+    service_scope: str = ''
+    group: str = ''  # optional heading the item is listed under
+
+    def __post_init__(self):
+        if self.amount is None:
+            self.amount = self.quantity * self.price
+
+
+@dataclass
+class Payment:
+    """Money received against a receipt"""
+    amount: float = 0.0
+    method: str = ''
+    date: str = ''
+
+
+@dataclass
+class StatementEntry:
+    """An invoice (charged) or receipt (paid) listed on a client statement"""
+    number: str = ''
+    kind: str = ''
+    date: str = ''
+    description: str = ''
+    amount: float = 0.0
+    balance: float = 0.0  # owed by the client after this entry
+
+
+@dataclass
+class Document:
+    """An invoice or receipt ready to be rendered by a theme"""
+    kind: str
+    number: str
+    date: str
+    client: Client
+    branding: Branding
+    trip: Optional[Trip] = None
+    trips: List[Trip] = field(default_factory=list)
+    items: List[LineItem] = field(default_factory=list)
+    payment: Optional[Payment] = None
+    notes: str = ''
+    verification: str = ''  # QR payload set by invoice_core.verification when the document is issued
+    period: str = ''  # statements: the dates covered
+    opening_balance: float = 0.0  # statements: owed before the period
+    entries: List[StatementEntry] = field(default_factory=list)  # statements: documents of the period
+
+    @property
+    def total(self):
+        """Total billed on the document (paid on a receipt, owed at the end of a statement)"""
+        if self.kind == 'receipt' and self.payment is not None:
+            return self.payment.amount
+        if self.kind == 'statement':
+            return self.entries[-1].balance if self.entries else self.opening_balance
+        return sum(item.amount for item in self.items)
+
+    def item_groups(self):
+        """Line items grouped by heading in order of first appearance.
+
+        Returns a list of (group, items, subtotal) built in a single pass;
+        ungrouped items share the '' group.
+        """
+        groups = {}
+        for item in self.items:
+            entry = groups.get(item.group)
+            if entry is None:
+                entry = groups[item.group] = [item.group, [], 0]
+            entry[1].append(item)
+            entry[2] += item.amount
+        return [tuple(entry) for entry in groups.values()]
+
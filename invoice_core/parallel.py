@@ -0,0 +1,247 @@
+"""Chunked parallel rendering of long trip manifests
+
+A document whose PagedTable runs to many pages is laid out in three steps:
+
+1. worker processes measure the table rows in slices;
+2. the parent paginates the rows from those heights, so every page of the
+   table is known in advance, and splits the pages into contiguous chunks;
+3. workers render the chunks as separate PDFs (the first chunk with the
+   sections before the table, the last with the totals and the sections
+   after it, every page numbered from its chunk's offset) and the parent
+   merges them in order with pypdf.
+
+Each worker process compiles the theme layout, fonts and images once and
+reuses them for every chunk it renders. Workers are started by a fork
+server (spawned where there is none), never forked from the caller: the web
+apps render from threaded workers, and a child forked while another thread
+holds a lock (SQLite, font registration, stdout) could wait on it forever.
+pypdf is optional: without it the document is rendered in one pass.
+"""
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from reportlab.platypus import PageBreak, SimpleDocTemplate
+from reportlab.platypus.flowables import Flowable
+
+from .limits import PageLayoutError, RenderBudgetExceeded, check_budget, page_overflow
+from .tables import PagedTable
+from .themes import get_theme
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:
+    PdfReader = PdfWriter = None
+
+# Rows measured per task in the measuring step
+MEASURE_SLICE = 250
+# A chunk is never smaller than this many pages
+MIN_CHUNK_PAGES = 4
+# How worker processes are started (see the module docstring)
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+_executor = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def _get_executor(workers):
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(START_METHOD))
+            _executor_workers = workers
+        return _executor
+
+
+class _Probe(Flowable):
+    """Zero-size flowable remembering the space left and the page it landed on"""
+
+    def __init__(self, record):
+        Flowable.__init__(self)
+        self.record = record
+
+    def wrap(self, availWidth, availHeight):
+        self.record.setdefault('heights', []).append(availHeight)
+        self.record['width'] = availWidth
+        return 0, 0
+
+    def draw(self):
+        self.record.setdefault('pages', []).append(self.canv.getPageNumber())
+
+
+def _parts(theme, document):
+    """Split the document's flowables around its PagedTable"""
+    elements = theme.flowables(document)
+    for index, element in enumerate(elements):
+        if isinstance(element, PagedTable):
+            return elements[:index], element, elements[index + 1:]
+    return elements, None, []
+
+
+def _doc_template(theme, output):
+    layout = theme.layout
+    return SimpleDocTemplate(output, pagesize=layout.pagesize, **layout.margins)
+
+
+def _measure_rows(theme_name, document, start, stop, width):
+    """Heights of table rows start:stop (worker)"""
+    theme = get_theme(theme_name)
+    table = _parts(theme, document)[1]
+    rows = table.source.rows(start, stop)
+    page = table.page_table(rows, final=False)
+    page.wrap(width, 1e9)
+    header_count = len(table.header)
+    return page._rowHeights[header_count:header_count + len(rows)]
+
+
+def _render_chunk(theme_name, document, pages, first, last, page_offset, deadline=None):
+    """Render the table pages of one chunk to PDF bytes (worker).
+
+    pages is a list of (start, stop) row ranges, None standing for a page
+    break before the table starts; past deadline the chunk is abandoned.
+    """
+    theme = get_theme(theme_name)
+    before, table, after = _parts(theme, document)
+    story = list(before) if first else []
+    for index, page in enumerate(pages):
+        if page is None:
+            story.append(PageBreak())
+            continue
+        start, stop = page
+        final = last and index == len(pages) - 1
+        story.append(table.page_table(table.source.rows(start, stop), final, continued=True))
+        if not final:
+            story.append(PageBreak())
+    if last:
+        story.extend(after)
+
+    output = io.BytesIO()
+    doc = _doc_template(theme, output)
+    if deadline is not None:
+        doc.setProgressCallBack(deadline.progress)
+    on_page = theme.document_layout(document).page_callback(document, page_offset)
+    if on_page:
+        doc.build(story, onFirstPage=on_page, onLaterPages=on_page)
+    else:
+        doc.build(story)
+    return output.getvalue(), doc.page
+
+
+def _paginate(heights, fixed, first_space, page_space, totals):
+    """Group row heights into pages; fixed is the header plus page subtotal height"""
+    pages = []
+    if heights and fixed + heights[0] > first_space:
+        pages.append(None)
+        first_space = page_space
+
+    start, used, space = 0, fixed, first_space
+    for index, height in enumerate(heights):
+        if used + height > space and index > start:
+            pages.append((start, index))
+            start, used, space = index, fixed, page_space
+        used += height
+
+    # The last page also carries the totals
+    stop = len(heights)
+    while used + totals > space and stop - start > 1:
+        stop -= 1
+        used -= heights[stop]
+    pages.append((start, stop))
+    if stop < len(heights):
+        pages.append((stop, len(heights)))
+    return pages
+
+
+def render_chunked(document, theme='monospace', output=None, workers=None, budget=None):
+    """Render document, laying out its long table on several processes.
+
+    Returns output (a BytesIO when omitted), like render_document(); budget
+    (seconds) bounds the whole render the same way.
+    """
+    workers = workers or default_workers()
+    deadline = check_budget(document, budget, workers) if budget else None
+    try:
+        return _render_chunked(document, theme, output, workers, deadline)
+    except PageLayoutError as e:
+        raise page_overflow(document, e) from e
+
+
+def _render_chunked(document, theme, output, workers, deadline):
+    theme_obj = get_theme(theme)
+    if output is None:
+        output = io.BytesIO()
+
+    before, table, _after = _parts(theme_obj, document)
+    if table is None or table.source is None or PdfWriter is None or workers < 2:
+        if PdfWriter is None:
+            print("WARNING: pypdf is not installed; rendering the manifest in one pass.")
+        return theme_obj.render(document, output, deadline)
+
+    # Space left for the table on its first page and on a full page
+    probe = {}
+    _doc_template(theme_obj, io.BytesIO()).build(list(before) + [_Probe(probe), PageBreak(), _Probe(probe)])
+    first_space, page_space = probe['heights'][0], probe['heights'][-1]
+    table_page = probe['pages'][0]
+    width = probe['width']
+
+    # Header, page subtotal and totals heights from an empty final page
+    empty = table.page_table([], final=True, continued=True)
+    empty.wrap(width, page_space)
+    header_count = len(table.header)
+    header = sum(empty._rowHeights[:header_count])
+    subtotal = empty._rowHeights[header_count]
+    totals = sum(empty._rowHeights[header_count + 1:])
+
+    executor = _get_executor(workers)
+    count = len(table.source)
+    slices = [(start, min(start + MEASURE_SLICE, count)) for start in range(0, count, MEASURE_SLICE)]
+    heights = []
+    for part in executor.map(_measure_rows, *zip(*[(theme, document, start, stop, width)
+                                                   for start, stop in slices])):
+        heights.extend(part)
+
+    if deadline is not None:
+        deadline.check()
+    pages = _paginate(heights, header + subtotal, first_space, page_space, totals)
+    real_pages = [page for page in pages if page is not None]
+    if len(real_pages) < 2 * MIN_CHUNK_PAGES:
+        return theme_obj.render(document, output, deadline)
+
+    chunk_count = min(workers, len(real_pages) // MIN_CHUNK_PAGES)
+    per_chunk = -(-len(pages) // chunk_count)
+    chunks = [pages[i:i + per_chunk] for i in range(0, len(pages), per_chunk)]
+
+    # Every chunk but the last ends with a table page, so page numbers follow from the
+    # chunk sizes (a None entry is the page the table could not start on)
+    futures = []
+    page_offset = 0
+    for index, chunk in enumerate(chunks):
+        first, last = index == 0, index == len(chunks) - 1
+        futures.append(executor.submit(_render_chunk, theme, document, chunk, first, last, page_offset, deadline))
+        page_offset += len(chunk)
+        if first:
+            page_offset += table_page - 1
+
+    writer = PdfWriter()
+    try:
+        for future in futures:
+            data, _pages = future.result(timeout=max(0, deadline.remaining()) if deadline else None)
+            writer.append(PdfReader(io.BytesIO(data)))
+    except (FutureTimeout, RenderBudgetExceeded):
+        # Chunks not started yet are dropped; running ones stop at their next flowable
+        for future in futures:
+            future.cancel()
+        raise RenderBudgetExceeded(f"Rendering took longer than its {deadline.seconds:g}s budget; "
+                                   f"split the trip list into smaller invoices") from None
+    writer.write(output)
+    print(f"Rendered {count} rows on {len(chunks)} worker chunks")
+    return output
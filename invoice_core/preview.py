@@ -0,0 +1,243 @@
+"""Live preview of draft documents, rebuilding only the sections that changed
+
+A preview is re-rendered on every pause in typing, so PreviewCache keeps, per
+draft, the flowables each block of the theme's layout built last time (the
+header, bill-to and trip details, the services table, the signature and
+footer, ...) and rebuilds only the blocks whose inputs changed:
+
+- the inputs of a block are the Document attributes it read while building,
+  recorded through a tracing proxy, so no section has to declare them; a
+  block whose inputs compare equal would build the same flowables;
+- reused flowables keep their measured layout: each is held by a stand-in
+  remembering its wrap() for the last available size, so an unchanged
+  table above the edited field is not measured again, and each build gets
+  shallow copies so ReportLab's per-build markers never leak into the next
+  preview.
+
+    previews = PreviewCache()
+    pdf = previews.render(draft_id, document, theme='latex')
+
+Generating a draft discards it (previews.discard(draft_id)); drafts
+abandoned without being generated are dropped least recently used first,
+and a layout file reload drops the blocks built with the old layout.
+"""
+import copy
+import io
+import threading
+from collections import OrderedDict
+
+from reportlab.platypus import Flowable
+from reportlab.platypus.doctemplate import ActionFlowable
+from reportlab.platypus.flowables import DDIndenter, NullDraw, _ContainerSpace
+
+from .limits import PageLayoutError, check_budget, page_overflow
+from .themes import get_theme
+
+# Drafts whose built sections are kept
+PREVIEW_DRAFTS = 64
+# Attributes ReportLab sets on a flowable during a build
+BUILD_MARKERS = ('_postponed', '_frame')
+# Attributes holding the flowables of containers (KeepTogether, ListFlowable)
+CONTENT_ATTRIBUTES = ('_content', '_list_content')
+
+
+class _Inputs:
+    """Stand-in for a Document recording which of its attributes a section reads"""
+
+    def __init__(self, document):
+        object.__setattr__(self, '_document', document)
+        object.__setattr__(self, '_names', [])
+
+    def __getattr__(self, name):
+        document = self._document
+        descriptor = getattr(type(document), name, None)
+        # Methods are not inputs (bound to another document they never compare equal), what they read is
+        if not callable(descriptor) and name not in self._names:
+            self._names.append(name)
+        # Methods and properties run against the stand-in, so what they read is recorded too
+        if hasattr(descriptor, '__get__'):
+            return descriptor.__get__(self, type(document))
+        return getattr(document, name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Sections must not modify the document")
+
+
+class _RememberedWrap(Flowable):
+    """Stand-in for a built flowable remembering its last wrap(), so an unchanged reused flowable is not measured
+    again; everything else is passed to the flowable.
+
+    A flowable that fitted its available height measures the same in any
+    height it still fits (only long tables stop measuring at the bottom of
+    the frame), so only the width has to match then.
+    """
+
+    def __init__(self, flowable):
+        self._flowable = flowable
+        self._remembered_wrap = None
+
+    def __getattr__(self, name):
+        flowable = self.__dict__.get('_flowable')
+        if flowable is None or name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(flowable, name)
+
+    def _remembered(self, availWidth, availHeight):
+        if self._remembered_wrap is not None:
+            (width, height), size = self._remembered_wrap
+            if width == availWidth and (height == availHeight or size[1] <= min(height, availHeight)):
+                return size
+        return None
+
+    def wrap(self, availWidth, availHeight):
+        size = self._remembered(availWidth, availHeight)
+        if size is None:
+            size = self._flowable.wrap(availWidth, availHeight)
+            self._remembered_wrap = ((availWidth, availHeight), size)
+        return size
+
+    def wrapOn(self, canv, availWidth, availHeight):
+        size = self._remembered(availWidth, availHeight)
+        if size is None:
+            size = self._flowable.wrapOn(canv, availWidth, availHeight)
+            self._remembered_wrap = ((availWidth, availHeight), size)
+        return size
+
+
+def _forwarded(name):
+    return property(lambda self: getattr(self._flowable, name),
+                    lambda self, value: setattr(self._flowable, name, value))
+
+
+# Flowable's own methods and defaults (drawOn, split, getSpaceBefore, ...) are the wrapped flowable's
+for _name in vars(Flowable):
+    if not _name.startswith('__') and _name not in vars(_RememberedWrap):
+        setattr(_RememberedWrap, _name, _forwarded(_name))
+
+
+def _children(flowable):
+    """The lists holding the flowables flowable contains: container content and table rows"""
+    for name in CONTENT_ATTRIBUTES:
+        content = flowable.__dict__.get(name)
+        if isinstance(content, list):
+            yield content
+    # Table cells are measured again when the table is drawn
+    rows = flowable.__dict__.get('_cellvalues')
+    if isinstance(rows, list):
+        for index, row in enumerate(rows):
+            if isinstance(row, tuple):
+                row = rows[index] = list(row)
+            if isinstance(row, list):
+                yield row
+
+
+def _remember_wrap(flowable):
+    """flowable, or its stand-in remembering wrap(), with the flowables it contains replaced likewise"""
+    for values in _children(flowable):
+        for index, value in enumerate(values):
+            if isinstance(value, list):
+                value[:] = [_remember_wrap(cell) if isinstance(cell, Flowable) else cell for cell in value]
+            elif isinstance(value, Flowable):
+                values[index] = _remember_wrap(value)
+    # The document template and containers treat actions, spacers, indenters and containers by their class, and
+    # measuring those costs nothing
+    if isinstance(flowable, (ActionFlowable, NullDraw, DDIndenter, _ContainerSpace, _RememberedWrap)):
+        return flowable
+    return _RememberedWrap(flowable)
+
+
+def _fresh(flowable):
+    """Copy of a built flowable for the next build, sharing its content and measurements"""
+    fresh = copy.copy(flowable)
+    for marker in BUILD_MARKERS:
+        fresh.__dict__.pop(marker, None)
+    if isinstance(fresh, _RememberedWrap):
+        fresh._flowable = _fresh(fresh._flowable)
+    for name in CONTENT_ATTRIBUTES:
+        content = fresh.__dict__.get(name)
+        if isinstance(content, list):
+            fresh.__dict__[name] = [_fresh(child) for child in content]
+    return fresh
+
+
+class _Draft:
+    def __init__(self, theme, layout, kind):
+        self.theme = theme
+        self.layout = layout
+        self.kind = kind
+        self.blocks = {}  # block index -> (input names, input values, flowables)
+        self.lock = threading.Lock()
+
+
+class PreviewCache:
+    """Built sections of the drafts being previewed, shared by the threads of one process"""
+
+    def __init__(self, max_drafts=PREVIEW_DRAFTS):
+        self.max_drafts = max_drafts
+        self.rebuilt = 0
+        self.reused = 0
+        self._drafts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _draft(self, draft_id, theme, layout, kind):
+        with self._lock:
+            draft = self._drafts.get(draft_id)
+            if draft is None or (draft.theme, draft.layout, draft.kind) != (theme.name, layout, kind):
+                draft = self._drafts[draft_id] = _Draft(theme.name, layout, kind)
+            self._drafts.move_to_end(draft_id)
+            while len(self._drafts) > self.max_drafts:
+                self._drafts.popitem(last=False)
+            return draft
+
+    def flowables(self, draft, sections, document):
+        """Flowables of document, rebuilding the blocks whose inputs changed; returns (flowables, rebuilt)"""
+        elements = []
+        rebuilt = 0
+        for index, build in enumerate(sections):
+            cached = draft.blocks.get(index)
+            if cached is not None:
+                names, values, built = cached
+                if tuple(getattr(document, name) for name in names) == values:
+                    fresh = [_fresh(flowable) for flowable in built]
+                    draft.blocks[index] = (names, values, fresh)
+                    elements.extend(fresh)
+                    continue
+            inputs = _Inputs(document)
+            built = [_remember_wrap(flowable) for flowable in build(inputs)]
+            names = tuple(inputs._names)
+            draft.blocks[index] = (names, tuple(getattr(document, name) for name in names), built)
+            elements.extend(built)
+            rebuilt += 1
+        with self._lock:
+            self.rebuilt += rebuilt
+            self.reused += len(sections) - rebuilt
+        # doc.build consumes the list it is given
+        return list(elements), rebuilt
+
+    def render(self, draft_id, document, theme='latex', output=None, budget=None):
+        """Render the draft document with the named theme, reusing the sections unchanged since its last preview"""
+        theme = get_theme(theme)
+        layout = theme.layout
+        draft = self._draft(draft_id, theme, layout, document.kind)
+        deadline = check_budget(document, budget) if budget else None
+        with draft.lock:
+            elements, rebuilt = self.flowables(draft, theme.document_layout(document).sections, document)
+            try:
+                return theme.render(document, output if output is not None else io.BytesIO(), deadline,
+                                    flowables=elements)
+            except PageLayoutError as e:
+                raise page_overflow(document, e) from e
+            except Exception:
+                # Flowables left half-built by a failed build are not reused
+                draft.blocks.clear()
+                raise
+
+    def discard(self, draft_id):
+        """Forget the sections of a draft, e.g. once it is generated"""
+        with self._lock:
+            self._drafts.pop(draft_id, None)
+
+    def stats(self):
+        """Drafts cached and sections rebuilt and reused so far"""
+        with self._lock:
+            return {'drafts': len(self._drafts), 'rebuilt': self.rebuilt, 'reused': self.reused}
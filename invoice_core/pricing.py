@@ -0,0 +1,123 @@
+"""Route price book
+
+invoice_core/pricebook.json (or the file named by PRICEBOOK_PATH) lists the
+routes we run with their one-way price, place-name aliases and the
+multiplier of every trip type. It is compiled (again only when the file
+changes) into a dict keyed by
+(pickup, dropoff) place names normalized with normalize_text, so a price
+suggestion is a couple of hash lookups:
+
+    book = get_price_book()
+    book.suggest('Gbagada Phase 2', 'MM Airport', 'Round Trip')
+
+A place that is not listed matches its longest listed leading words
+("Ikeja GRA, Lagos" prices as "Ikeja").
+
+A trip type is priced as its multiplier times the one-way price; trip types
+that are not listed, or listed with a null multiplier, get no suggestion.
+
+The shipped pricebook.json lists no routes, so nothing is suggested until
+the real prices are entered as {"from": "Gbagada", "to": "Ikeja", "price":
+15000} entries of "routes"; leave AUTOFILL_PRICES off until then. Its rental
+trip types (Hourly, Daily, Weekly and Monthly Rental) are null until their
+price is entered as a multiple of the one-way price, e.g. "Daily Rental": 2.5.
+"""
+import json
+import os
+
+from .text import normalize_text
+
+PRICEBOOK_PATH = os.environ.get('PRICEBOOK_PATH',
+                                os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pricebook.json'))
+
+# Distinct typed place names whose match is remembered
+MATCH_CACHE_SIZE = 10000
+
+_books = {}
+
+
+class PriceBook:
+    """Hashed route prices and trip-type multipliers"""
+
+    def __init__(self, spec):
+        self.currency = spec.get('currency', 'NGN')
+        self.multipliers = {normalize_text(name): float(value) if value is not None else None
+                            for name, value in spec.get('multipliers', {}).items()}
+        self.aliases = {normalize_text(name): normalize_text(place) for name, place in spec.get('aliases', {}).items()}
+        self.places = set(self.aliases)
+        self.routes = {}
+        for route in spec.get('routes', []):
+            pickup, dropoff = self.canonical(route['from']), self.canonical(route['to'])
+            self.places.update((pickup, dropoff))
+            self.routes[(pickup, dropoff)] = float(route['price'])
+        if spec.get('symmetric', True):
+            for (pickup, dropoff), price in list(self.routes.items()):
+                self.routes.setdefault((dropoff, pickup), price)
+        self._matches = {}
+
+    def canonical(self, place):
+        """Normalized name of place, following aliases"""
+        name = normalize_text(place)
+        return self.aliases.get(name, name)
+
+    def match(self, place):
+        """Listed place name matching place, or None"""
+        name = normalize_text(place)
+        if name in self._matches:
+            return self._matches[name]
+        words = name.split()
+        found = None
+        for count in range(len(words), 0, -1):
+            candidate = ' '.join(words[:count])
+            if candidate in self.places:
+                found = self.aliases.get(candidate, candidate)
+                break
+        if len(self._matches) >= MATCH_CACHE_SIZE:
+            self._matches.clear()
+        self._matches[name] = found
+        return found
+
+    def base_price(self, pickup, dropoff):
+        """One-way price of the route, or None"""
+        pickup, dropoff = self.match(pickup), self.match(dropoff)
+        if pickup is None or dropoff is None:
+            return None
+        return self.routes.get((pickup, dropoff))
+
+    def suggest(self, pickup, dropoff, trip_type='One Way'):
+        """Suggested price of a trip as a dict with price, base and multiplier.
+
+        base is None when the route is not in the book, multiplier when the
+        trip type is not priced in it; price is None in either case.
+        """
+        multiplier = self.multipliers.get(normalize_text(trip_type))
+        base = self.base_price(pickup, dropoff)
+        return {
+            'pickup': pickup,
+            'dropoff': dropoff,
+            'trip_type': trip_type,
+            'base': base,
+            'multiplier': multiplier,
+            'price': round(base * multiplier, 2) if base is not None and multiplier is not None else None,
+        }
+
+    def suggest_many(self, trips, trip_type='One Way'):
+        """Suggestions for a list of {pickup, destination or dropoff, trip_type} dicts"""
+        return [self.suggest(trip.get('pickup', ''), trip.get('destination') or trip.get('dropoff', ''),
+                             trip.get('trip_type') or trip_type)
+                for trip in trips]
+
+
+def load_price_book(path):
+    with open(path, encoding='utf-8') as f:
+        return PriceBook(json.load(f))
+
+
+def get_price_book(path=PRICEBOOK_PATH):
+    """Compiled price book of path, reloaded when the file changes"""
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    entry = _books.get(path)
+    if entry is None or entry[0] != signature:
+        entry = _books[path] = (signature, load_price_book(path))
+    return entry[1]
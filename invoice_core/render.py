@@ -0,0 +1,29 @@
+"""Entry point used by the Flask apps and the headless generator"""
+import os
+
+from .limits import PageLayoutError, check_budget, page_overflow
+from .themes import get_theme
+
+
+def render_document(document, output=None, theme='latex', budget=None):
+    """Render document with the named theme.
+
+    output may be a file path or a file-like object; when omitted an in-memory
+    BytesIO is used. Returns output. With a budget (seconds) a document
+    estimated to take longer is refused and a render running longer is
+    stopped, both with RenderBudgetExceeded; a section too long for its page
+    raises DocumentTooLarge (see invoice_core.limits). The budget is checked
+    before output is opened, and a render that fails leaves no file at an
+    output path; callers record the document only once this returns.
+    """
+    deadline = check_budget(document, budget) if budget else None
+    try:
+        try:
+            return get_theme(theme).render(document, output, deadline)
+        except PageLayoutError as e:
+            raise page_overflow(document, e) from e
+    except Exception:
+        # No half-written PDF is left behind
+        if isinstance(output, str) and os.path.exists(output):
+            os.remove(output)
+        raise
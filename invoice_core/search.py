@@ -0,0 +1,181 @@
+"""Full-text search over issued invoices and receipts
+
+Each generated document's structured fields (client, trips, line items and
+notes) are stored as JSON in search_sources and indexed in an SQLite FTS5
+table whose rowids are those of search_sources, so replacing a document
+touches a single indexed row. Queries are ranked with bm25, weighting
+client matches above trips, services and notes, and every word of the query
+is matched as a prefix ("gbag" finds "Gbagada").
+
+Rebuild the index from the stored sources and from archived PDFs:
+
+    python rebuild_search_index.py [PDF_DIR ...]
+
+Archived PDFs (Invoice_<number>.pdf, Receipt_<number>.pdf) are indexed by
+their extracted text when pypdf is installed.
+"""
+import glob
+import json
+import os
+import re
+from dataclasses import asdict
+
+from .storage import DEFAULT_DB_PATH, connect, prepare
+from .verification import DuplicateNumber
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+# bm25 weights of the indexed columns, in table order
+COLUMN_WEIGHTS = {'client': 10.0, 'trips': 5.0, 'services': 3.0, 'notes': 1.0, 'body': 1.0}
+ARCHIVE_PATTERN = re.compile(r'^(Invoice|Receipt)_(.+)\.pdf$', re.IGNORECASE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_sources (
+    id INTEGER PRIMARY KEY,
+    number TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    date TEXT NOT NULL,
+    client TEXT NOT NULL,
+    total REAL NOT NULL,
+    source TEXT NOT NULL,
+    fields TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    client, trips, services, notes, body,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def _join(*values):
+    return ' '.join(str(value) for value in values if value)
+
+
+def document_fields(data):
+    """Indexed text columns of a document given as a dict (dataclasses.asdict)"""
+    client = data.get('client') or {}
+    trips = list(data.get('trips') or [])
+    if data.get('trip'):
+        trips.insert(0, data['trip'])
+    payment = data.get('payment') or {}
+    return {
+        'client': _join(client.get('name'), client.get('address'), client.get('contact')),
+        'trips': ' '.join(_join(trip.get('trip_type'), trip.get('pickup'), trip.get('destination'),
+                                trip.get('dropoff'), trip.get('trip_date'), trip.get('return_date'))
+                          for trip in trips),
+        'services': ' '.join(_join(item.get('group'), item.get('description'), item.get('route'),
+                                   item.get('service_scope'))
+                             for item in data.get('items') or []),
+        'notes': _join(data.get('notes'), payment.get('method')),
+        'body': '',
+    }
+
+
+def query_expression(text):
+    """FTS5 query matching every word of text as a prefix"""
+    words = re.findall(r'\w+', text or '')
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+class SearchIndex:
+    """FTS5 index of issued documents"""
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        prepare(path)
+        with connect(path) as conn:
+            conn.executescript(SCHEMA)
+
+    def _store(self, conn, number, kind, date, client, total, source, fields):
+        values = (kind, date, client, total, source, json.dumps(fields))
+        row = conn.execute("SELECT id FROM search_sources WHERE number = ?", (number,)).fetchone()
+        if row is None:
+            rowid = conn.execute("INSERT INTO search_sources (kind, date, client, total, source, fields, number) "
+                                 "VALUES (?, ?, ?, ?, ?, ?, ?)", values + (number,)).lastrowid
+        else:
+            rowid = row['id']
+            conn.execute("DELETE FROM search_index WHERE rowid = ?", (rowid,))
+            conn.execute("UPDATE search_sources SET kind = ?, date = ?, client = ?, total = ?, source = ?, "
+                         "fields = ? WHERE id = ?", values + (rowid,))
+        self._index(conn, rowid, fields)
+
+    def _index(self, conn, rowid, fields):
+        conn.execute("INSERT INTO search_index (rowid, client, trips, services, notes, body) "
+                     "VALUES (?, ?, ?, ?, ?, ?)",
+                     (rowid, fields['client'], fields['trips'], fields['services'], fields['notes'], fields['body']))
+
+    def add(self, document):
+        """Index a generated document, replacing an archived PDF indexed under the same number.
+
+        Raises DuplicateNumber when a generated document already has the number.
+        """
+        data = asdict(document)
+        data.pop('branding', None)
+        with connect(self.path) as conn:
+            row = conn.execute("SELECT source FROM search_sources WHERE number = ?", (document.number,)).fetchone()
+            if row is not None and row['source'] == 'generated':
+                raise DuplicateNumber(f"Number {document.number} is already indexed")
+            self._store(conn, document.number, document.kind, document.date, document.client.name,
+                        document.total, 'generated', document_fields(data))
+
+    def add_archive(self, path):
+        """Index an archived PDF by its text; returns False when it cannot be read"""
+        match = ARCHIVE_PATTERN.match(os.path.basename(path))
+        if not match or PdfReader is None:
+            return False
+        try:
+            text = ' '.join(page.extract_text() or '' for page in PdfReader(path).pages)
+        except Exception as e:
+            print(f"Error reading {path}: {e}")
+            return False
+        kind, number = match.group(1).lower(), match.group(2)
+        fields = {'client': '', 'trips': '', 'services': '', 'notes': '', 'body': ' '.join(text.split())}
+        with connect(self.path) as conn:
+            # Documents generated since indexing began keep their structured fields
+            row = conn.execute("SELECT source FROM search_sources WHERE number = ?", (number,)).fetchone()
+            if row is not None and row['source'] == 'generated':
+                return True
+            self._store(conn, number, kind, '', '', 0, os.path.abspath(path), fields)
+        return True
+
+    def search(self, text, limit=20, kind=None):
+        """Documents matching text, best first.
+
+        Returns a list of dicts with number, kind, date, client, total,
+        snippet and score (lower is better, as reported by bm25).
+        """
+        expression = query_expression(text)
+        if not expression:
+            return []
+        weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS.values())
+        sql = (f"SELECT s.number, s.kind, s.date, s.client, s.total, bm25(search_index, {weights}) AS score, "
+               "snippet(search_index, -1, '[', ']', '...', 12) AS snippet "
+               "FROM search_index JOIN search_sources s ON s.id = search_index.rowid "
+               "WHERE search_index MATCH ?")
+        params = [expression]
+        if kind:
+            sql += " AND s.kind = ?"
+            params.append(kind)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+        with connect(self.path) as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def rebuild(self, archive_dirs=()):
+        """Re-create the index from stored sources and archived PDFs in archive_dirs"""
+        with connect(self.path) as conn:
+            conn.execute("DELETE FROM search_index")
+            rows = conn.execute("SELECT id, fields FROM search_sources").fetchall()
+            for row in rows:
+                self._index(conn, row['id'], json.loads(row['fields']))
+        archived = 0
+        for directory in archive_dirs:
+            for path in sorted(glob.glob(os.path.join(directory, '*.pdf'))):
+                archived += self.add_archive(path)
+        with connect(self.path) as conn:
+            conn.execute("INSERT INTO search_index (search_index) VALUES ('optimize')")
+        return len(rows), archived
+
@@ -0,0 +1,186 @@
+"""Speculative renders of drafts, ready before Generate is pressed
+
+Staff fill in the form and then click Generate, so the form posts its state
+in the background (debounced) and SpeculativeRenders renders it ahead of
+time, numbered and signed as it would be issued, keyed by a hash of its
+content. When Generate is pressed with the same inputs the finished PDF is
+issued at once:
+
+    speculative = SpeculativeRenders(busy=lambda: admission.render_in_use > 0)
+    key = content_key(document, base_url)     # the number is not part of it
+    speculative.submit(draft_id, key, numbered_document)
+    ...
+    found = speculative.take(key)             # (document, pdf bytes) or None
+    speculative.discard(draft_id)             # once the draft is generated
+
+Speculative work never delays real requests:
+
+- renders run one at a time on a background thread at the lowest OS
+  priority, and pause between flowables while busy() says real renders are
+  running;
+- a newer state of the same draft cancels the render of the older one, and
+  take() cancels a render that is not finished instead of waiting for it;
+  cancelled renders stop at the next flowable.
+
+Nothing is recorded until the PDF is taken. Generating a draft discards
+what is left of it (a render of another state, or one Generate did not
+use); finished PDFs of drafts never generated are dropped least recently
+used first.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+
+from .themes import get_theme
+
+# Finished speculative PDFs kept in memory
+SPECULATIVE_CACHE = 32
+# Drafts whose latest state is remembered
+SPECULATIVE_DRAFTS = 256
+# Seconds a paused render sleeps before checking again whether the server is still busy
+BUSY_POLL = 0.02
+# Niceness of the render thread (Linux applies it to the thread alone)
+SPECULATIVE_NICENESS = 19
+
+
+class Cancelled(Exception):
+    """A speculative render was cancelled"""
+
+
+def content_key(document, *context):
+    """Hash of everything printed on document except its number and verification code, plus context (e.g. the
+    site root of the QR link)"""
+    data = asdict(document)
+    data.update(number='', verification='')
+    body = json.dumps([data, context], sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+def _lower_priority():
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), SPECULATIVE_NICENESS)
+    except (AttributeError, OSError):
+        pass
+
+
+class _Job:
+    """A queued or running speculative render; also its ReportLab progress callback"""
+
+    def __init__(self, draft_id, key, document, busy):
+        self.draft_id = draft_id
+        self.key = key
+        self.document = document
+        self.busy = busy
+        self.cancelled = threading.Event()
+
+    def progress(self, kind, value):
+        """Called after every flowable: stop when cancelled, wait while real renders run"""
+        while True:
+            if self.cancelled.is_set():
+                raise Cancelled()
+            if self.busy is None or not self.busy():
+                return
+            time.sleep(BUSY_POLL)
+
+
+class SpeculativeRenders:
+    """Background renders of draft documents by content key, shared by the threads of one process"""
+
+    def __init__(self, theme='latex', busy=None, max_entries=SPECULATIVE_CACHE):
+        self.theme = theme
+        self.busy = busy
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+        self._ready = OrderedDict()  # key -> (document, pdf bytes)
+        self._jobs = {}  # key -> queued or running _Job
+        self._drafts = OrderedDict()  # draft_id -> key of its latest state
+        self._lock = threading.Lock()
+        self._background = ThreadPoolExecutor(max_workers=1, thread_name_prefix='speculative',
+                                              initializer=_lower_priority)
+
+    def _cancel(self, job):
+        # Called with the lock held
+        job.cancelled.set()
+        if self._jobs.get(job.key) is job:
+            del self._jobs[job.key]
+        self.cancelled += 1
+
+    def submit(self, draft_id, key, document):
+        """Render document (numbered and signed as it will be issued) in the background under key, replacing the
+        draft's earlier state; returns False when key is already rendered or queued"""
+        with self._lock:
+            previous = self._drafts.get(draft_id)
+            self._drafts[draft_id] = key
+            self._drafts.move_to_end(draft_id)
+            while len(self._drafts) > SPECULATIVE_DRAFTS:
+                self._drafts.popitem(last=False)
+            if previous is not None and previous != key:
+                job = self._jobs.get(previous)
+                if job is not None:
+                    self._cancel(job)
+                # The earlier state will not be generated any more
+                self._ready.pop(previous, None)
+            if key in self._ready or key in self._jobs:
+                return False
+            job = self._jobs[key] = _Job(draft_id, key, document, self.busy)
+        self._background.submit(self._run, job)
+        return True
+
+    def _run(self, job):
+        if job.cancelled.is_set():
+            return
+        try:
+            pdf = get_theme(self.theme).render(job.document, io.BytesIO(), job).getvalue()
+        except Cancelled:
+            return
+        except Exception as e:
+            print(f"WARNING: Speculative render of draft {job.draft_id} failed: {e}")
+            with self._lock:
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+            return
+        with self._lock:
+            if self._jobs.get(job.key) is not job:
+                return
+            del self._jobs[job.key]
+            self._ready[job.key] = (job.document, pdf)
+            while len(self._ready) > self.max_entries:
+                self._ready.popitem(last=False)
+
+    def take(self, key):
+        """(document, PDF bytes) rendered for key, or None; a render still in progress is cancelled"""
+        with self._lock:
+            found = self._ready.pop(key, None)
+            if found is not None:
+                self.hits += 1
+                return found
+            self.misses += 1
+            job = self._jobs.get(key)
+            if job is not None:
+                self._cancel(job)
+            return None
+
+    def discard(self, draft_id):
+        """Cancel and drop the speculative render of a draft, e.g. once it is generated"""
+        with self._lock:
+            key = self._drafts.pop(draft_id, None)
+            if key is None:
+                return
+            job = self._jobs.get(key)
+            if job is not None:
+                self._cancel(job)
+            self._ready.pop(key, None)
+
+    def stats(self):
+        """Renders ready and queued, and how often Generate found one"""
+        with self._lock:
+            return {'ready': len(self._ready), 'queued': len(self._jobs), 'hits': self.hits, 'misses': self.misses,
+                    'cancelled': self.cancelled}
@@ -0,0 +1,63 @@
+"""Client statements built from the ledger
+
+A statement lists a client's invoices and receipts for a period with the
+balance owed after each one. build_statement() reads the client's history up
+to the end of the period in one query over the ledger's (client, date, number)
+index and walks it once: documents before the period only move the opening
+balance, the others become StatementEntry rows carrying the running balance.
+
+    document = build_statement(ledger, 'Mrs Adeola Ajibadade', '2025-05-01', '2025-05-31', branding)
+    render_document(document, 'statement.pdf', theme='mobile')
+"""
+import hashlib
+from datetime import datetime
+
+from .model import Client, Document, StatementEntry
+
+
+def statement_number(client, end):
+    """Statement number, the same for every statement of a client ending on end"""
+    digest = hashlib.sha1(client.strip().lower().encode('utf-8')).hexdigest()[:6].upper()
+    return f"STM-{end.replace('-', '')}-{digest}"
+
+
+def statement_entries(rows, start=None):
+    """(opening balance, entries) of ledger rows sorted by date, in a single pass.
+
+    Invoices add to the balance the client owes and receipts take from it;
+    rows dated before start only count towards the opening balance, and so do
+    rows whose printed date could not be read (no ISO date, sorted first by
+    the ledger) when there is a start.
+    """
+    opening, balance, entries = 0.0, 0.0, []
+    for row in rows:
+        amount = -row['total'] if row['kind'] == 'receipt' else row['total']
+        balance += amount
+        if start and (not row['date'] or row['date'] < start):
+            opening = balance
+            continue
+        entries.append(StatementEntry(number=row['number'], kind=row['kind'], date=row['date'] or row['printed_date'],
+                                      description=row['description'], amount=amount, balance=balance))
+    return opening, entries
+
+
+def _long_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').strftime('%B %d, %Y')
+
+
+def build_statement(ledger, client, start, end, branding, number=None):
+    """Statement Document of client's documents dated start to end (YYYY-MM-DD)"""
+    contact = ''
+
+    def history():
+        # The latest contact on record is printed on the statement
+        nonlocal contact
+        for row in ledger.client_history(client, end):
+            contact = row['contact'] or contact
+            yield row
+
+    opening, entries = statement_entries(history(), start)
+    return Document(kind='statement', number=number or statement_number(client, end),
+                    date=datetime.now().strftime('%B %d, %Y'), client=Client(name=client, contact=contact),
+                    branding=branding, period=f"{_long_date(start)} - {_long_date(end)}", opening_balance=opening,
+                    entries=entries)
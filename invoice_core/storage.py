@@ -0,0 +1,25 @@
+"""SQLite database shared by the document registry and the search index"""
+import os
+import sqlite3
+from contextlib import contextmanager
+
+DEFAULT_DB_PATH = os.environ.get('DOCUMENT_DB', os.path.join('data', 'documents.db'))
+
+
+@contextmanager
+def connect(path):
+    """Connection committing on success and closed on exit"""
+    conn = sqlite3.connect(path, timeout=10)
+    conn.row_factory = sqlite3.Row
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def prepare(path):
+    """Create the directory of path; returns it"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    return directory
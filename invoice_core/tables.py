@@ -0,0 +1,163 @@
+"""Long line-item tables split across pages
+
+PagedTable measures its rows once and, when it does not fit, builds only the
+rows that fit on the current page: the header is repeated on every page, each
+page but the last ends with a page subtotal, and the last page carries the
+totals. Layout work therefore grows linearly with the number of rows instead
+of re-measuring the remainder of the table on every page break.
+"""
+from reportlab.platypus import Table
+from reportlab.platypus.flowables import Flowable
+
+
+class RowSource:
+    """Table rows built on demand from a list of items.
+
+    build(items, start) returns the rows for items, start being the index of
+    the first one; parallel rendering builds only the slice each worker needs.
+    """
+
+    def __init__(self, items, build):
+        self.items = items
+        self.build = build
+
+    def __len__(self):
+        return len(self.items)
+
+    def rows(self, start=0, stop=None):
+        return self.build(self.items[start:stop], start)
+
+
+def _row_commands(commands, index):
+    """Move TableStyle commands written for row 0 to row index"""
+    moved = []
+    for op, (c0, r0), (c1, r1), *args in commands:
+        moved.append((op, (c0, r0 + index), (c1, r1 + index), *args))
+    return moved
+
+
+class PagedTable(Flowable):
+    """Table of body rows with repeated header, page subtotals and final totals.
+
+    rows are (cells, amount, kind) tuples, or a RowSource producing them:
+    amount is added to the page subtotal (None for headings and subtotal rows)
+    and kind selects extra style commands from row_styles, written for row 0.
+    page_subtotal(amount) returns the cells of the page subtotal row, styled
+    with row_styles['page_subtotal']. With carry_forward, amounts are running
+    balances and the subtotal row carries the last one on the page forward.
+    """
+
+    def __init__(self, header, rows, total_rows, col_widths, style, page_subtotal, row_styles=None,
+                 row_heights=None, continued=False, carry_forward=False):
+        Flowable.__init__(self)
+        self.header = header
+        self.source = rows if isinstance(rows, RowSource) else None
+        self._rows = None if self.source else rows
+        self.total_rows = total_rows
+        self.col_widths = col_widths
+        self.style = style
+        self.page_subtotal = page_subtotal
+        self.row_styles = row_styles or {}
+        self.row_heights = row_heights
+        self.continued = continued
+        self.carry_forward = carry_forward
+        self.hAlign = 'CENTER'
+        self._table = None
+
+    @property
+    def rows(self):
+        if self._rows is None:
+            self._rows = self.source.rows()
+        return self._rows
+
+    def page_table(self, rows, final, continued=False):
+        """Table for one page holding rows; final pages carry the totals"""
+        data = list(self.header)
+        extra = []
+        amount = 0
+        for cells, row_amount, kind in rows:
+            if kind in self.row_styles:
+                extra.extend(_row_commands(self.row_styles[kind], len(data)))
+            if row_amount is not None:
+                amount = row_amount if self.carry_forward else amount + row_amount
+            data.append(cells)
+
+        # A carried-forward balance would only repeat the final one
+        if not final or (continued and rows and not self.carry_forward):
+            extra.extend(_row_commands(self.row_styles.get('page_subtotal', []), len(data)))
+            data.append(self.page_subtotal(amount))
+        if final:
+            data.extend(self.total_rows)
+
+        table = Table(data, colWidths=self.col_widths)
+        table.setStyle(self.style)
+        if extra:
+            table.setStyle(extra)
+        return table
+
+    def _measure(self, availWidth, availHeight):
+        """Wrap the whole table once and remember every row height"""
+        table = self.page_table(self.rows, True, self.continued)
+        table.wrap(availWidth, availHeight)
+        heights = table._rowHeights
+        header_count = len(self.header)
+        self.row_heights = {
+            'header': sum(heights[:header_count]),
+            'rows': heights[header_count:header_count + len(self.rows)],
+            'totals': sum(heights[len(heights) - len(self.total_rows):]),
+        }
+        self._table = table
+
+    def _estimate(self):
+        heights = self.row_heights
+        height = heights['header'] + sum(heights['rows']) + heights['totals']
+        if self.continued:
+            height += heights['totals']
+        return height
+
+    def wrap(self, availWidth, availHeight):
+        if self.row_heights is None:
+            self._measure(availWidth, availHeight)
+        elif self._table is None and self._estimate() <= availHeight:
+            self._table = self.page_table(self.rows, True, self.continued)
+        if self._table is None:
+            self.width, self.height = sum(self.col_widths), self._estimate()
+        else:
+            self.width, self.height = self._table.wrap(availWidth, availHeight)
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        if self.row_heights is None:
+            self._measure(availWidth, availHeight)
+        heights = self.row_heights
+        # Page subtotal rows are styled like the totals, so use their height as the estimate
+        used = heights['header'] + heights['totals']
+        count = 0
+        for height in heights['rows']:
+            if used + height > availHeight:
+                break
+            used += height
+            count += 1
+
+        # Keep at least one row with the totals and never end a page on a group heading
+        if count == len(self.rows) and count > 1:
+            count -= 1
+        while count and self.rows[count - 1][2] == 'group_heading':
+            count -= 1
+
+        while count:
+            table = self.page_table(self.rows[:count], False)
+            if table.wrap(availWidth, availHeight)[1] <= availHeight:
+                break
+            count -= 1
+        if not count:
+            return []
+
+        rest = PagedTable(self.header, self.rows[count:], self.total_rows, self.col_widths, self.style,
+                          self.page_subtotal, self.row_styles,
+                          row_heights=dict(heights, rows=heights['rows'][count:]), continued=True,
+                          carry_forward=self.carry_forward)
+        return [table, rest]
+
+    def draw(self):
+        self._table.drawOn(self.canv, 0, 0)
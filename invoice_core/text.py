@@ -0,0 +1,62 @@
+"""Text helpers shared by the themes, the client directory, analytics and the price book"""
+import re
+
+BULLET_CHARACTERS = '•-*◦‣⁃⁌⁍⦁⦾⦿'
+# Defaults the forms print for fields left blank; they say nothing about the client or trip
+PLACEHOLDERS = ('not provided', 'n/a')
+
+
+def parse_service_scope(scope_text):
+    """Parse service scope text into bullet points"""
+    if not scope_text:
+        return []
+
+    items = []
+    for line in scope_text.split('\n'):
+        line = line.strip().lstrip(BULLET_CHARACTERS).strip()
+        if line:
+            items.append(line)
+    return items
+
+
+def format_text_for_monospace(text, max_length=None):
+    """Format text to work well with monospaced font"""
+    if not text:
+        return ""
+
+    # Replace multiple spaces with single spaces for better alignment
+    text = ' '.join(text.split())
+
+    if max_length and len(text) > max_length:
+        # Simple word wrap for monospace
+        lines = []
+        current_line = []
+        current_length = 0
+
+        for word in text.split():
+            if current_length + len(word) + 1 <= max_length:
+                current_line.append(word)
+                current_length += len(word) + 1
+            else:
+                if current_line:
+                    lines.append(' '.join(current_line))
+                current_line = [word]
+                current_length = len(word)
+
+        if current_line:
+            lines.append(' '.join(current_line))
+
+        return '<br/>'.join(lines)
+
+    return text
+
+
+def normalize_text(value):
+    """Lower-case words separated by single spaces, for matching names typed by hand"""
+    return ' '.join(re.findall(r'\w+', (value or '').casefold()))
+
+
+def filled(value):
+    """value stripped, or '' when it is blank or a placeholder such as 'Not Provided' or 'N/A'"""
+    value = str(value or '').strip()
+    return '' if value.casefold() in PLACEHOLDERS else value
@@ -0,0 +1,31 @@
+"""Theme registry"""
+from .base import Theme
+from .latex import LatexTheme
+from .mobile import MobileTheme
+from .monospace import MonospaceTheme
+
+THEMES = {}
+
+
+def register_theme(theme):
+    """Register a Theme instance under its name"""
+    THEMES[theme.name] = theme
+    return theme
+
+
+def get_theme(name):
+    """Return the registered theme called name"""
+    try:
+        return THEMES[name]
+    except KeyError:
+        raise ValueError(f"Unknown theme: {name}") from None
+
+
+def load_layouts(*names):
+    """Compile the layouts of the named themes (all themes when none are given) ahead of the first request"""
+    for name in names or list(THEMES):
+        get_theme(name).layout
+
+
+for _theme_class in (LatexTheme, MonospaceTheme, MobileTheme):
+    register_theme(_theme_class())
@@ -0,0 +1,95 @@
+"""Base class for document themes"""
+import io
+import os
+
+from reportlab.graphics.barcode.qr import QrCodeWidget
+from reportlab.graphics.shapes import Drawing
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Table
+
+from ..layout import LAYOUT_DIR, get_layout
+
+
+class Theme:
+    """A complete invoice/receipt layout.
+
+    Everything declarative (page setup, styles, column widths, decorations and
+    section order) comes from the theme's layout file, see invoice_core.layout.
+    Subclasses implement one ``section_<name>(document)`` method per named
+    section used by the layout, returning the flowables for that section.
+    """
+    name = None
+    layout_file = None  # defaults to layouts/<name>.json
+
+    @property
+    def layout_path(self):
+        return os.path.join(LAYOUT_DIR, self.layout_file or f"{self.name}.json")
+
+    @property
+    def layout(self):
+        """Compiled layout, reloaded when the layout file changes"""
+        return get_layout(self)
+
+    @property
+    def styles(self):
+        return self.layout.styles
+
+    @property
+    def table_styles(self):
+        return self.layout.table_styles
+
+    @property
+    def widths(self):
+        return self.layout.widths
+
+    def fonts(self):
+        """Font names available to the layout as $font and $bold_font"""
+        return {'font': 'Helvetica', 'bold_font': 'Helvetica-Bold'}
+
+    def section_verification(self, document):
+        """QR code linking to /verify for issued documents (widths "qr", style "verification")"""
+        if not document.verification:
+            return []
+        size = self.widths['qr']
+        widget = QrCodeWidget(document.verification, barLevel='M')
+        x0, y0, x1, y1 = widget.getBounds()
+        qr = Drawing(size, size, transform=[size / (x1 - x0), 0, 0, size / (y1 - y0), 0, 0])
+        qr.add(widget)
+        label = Paragraph(f"Scan to verify this {document.kind}<br/>{document.verification}",
+                          self.styles['verification'])
+        table = Table([[qr, label]], colWidths=[size + 6, None])
+        table.setStyle([('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                        ('LEFTPADDING', (0, 0), (-1, -1), 0)])
+        table.hAlign = 'LEFT'
+        return [table]
+
+    def document_layout(self, document):
+        documents = self.layout.documents
+        if document.kind not in documents:
+            raise ValueError(f"Theme '{self.name}' has no {document.kind} layout")
+        return documents[document.kind]
+
+    def flowables(self, document):
+        """Build the flowables for every section of the document"""
+        return self.document_layout(document).flowables(document)
+
+    def render(self, document, output=None, deadline=None, flowables=None):
+        """Render document to output (a path or file-like); returns output.
+
+        deadline (invoice_core.limits.Deadline) is checked after every flowable.
+        flowables are the document's elements when already built (see
+        invoice_core.preview).
+        """
+        if output is None:
+            output = io.BytesIO()
+        layout = self.layout
+        document_layout = self.document_layout(document)
+        doc = SimpleDocTemplate(output, pagesize=layout.pagesize, **layout.margins)
+        if deadline is not None:
+            doc.setProgressCallBack(deadline.progress)
+        elements = flowables if flowables is not None else document_layout.flowables(document)
+        on_page = document_layout.page_callback(document)
+        if on_page:
+            doc.build(elements, onFirstPage=on_page, onLaterPages=on_page)
+        else:
+            doc.build(elements)
+        return output
@@ -0,0 +1,198 @@
+"""LaTeX-like Helvetica layout (app.py); styles and section order live in layouts/latex.json"""
+from reportlab.platypus import Paragraph, Spacer, Table, ListFlowable, ListItem
+
+from ..images import load_image
+from ..tables import PagedTable
+from ..text import parse_service_scope
+from .base import Theme
+
+
+class LatexTheme(Theme):
+    """Brand-blue Helvetica layout modelled on the LaTeX invoice"""
+    name = 'latex'
+
+    def service_description(self, item):
+        """Title, description, route and scope bullets of a line item"""
+        styles = self.styles
+        elements = []
+
+        if item.description:
+            lines = item.description.split('\n')
+            elements.append(Paragraph(lines[0], styles['service_title']))
+            if len(lines) > 1:
+                elements.append(Paragraph(' '.join(lines[1:]), styles['service_desc']))
+
+        if item.route:
+            elements.append(Paragraph(f"<i>Route: {item.route}</i>", styles['route']))
+
+        scope_items = parse_service_scope(item.service_scope)
+        if scope_items:
+            elements.append(Paragraph("<b>Service Scope Includes:</b>", styles['scope_header']))
+            elements.append(ListFlowable([ListItem(Paragraph(scope, styles['bullet']), leftIndent=10)
+                                          for scope in scope_items],
+                                         bulletType='bullet', leftIndent=20))
+
+        return elements
+
+    # --- Sections ---
+
+    def section_header(self, document):
+        styles = self.styles
+        branding = document.branding
+
+        logo_width, logo_height = self.widths['logo']
+        logo_img = load_image(branding.logo_path, width=logo_width, height=logo_height)
+        logo_cell = [logo_img] if logo_img else [Paragraph("NEXT RIDE", styles['company_name'])]
+
+        right_content = [
+            Paragraph(f"<b>{branding.name}</b>", styles['company_address']),
+            Paragraph(branding.address, styles['company_address']),
+            Paragraph(f"Tel: {branding.phones}", styles['company_address']),
+            Paragraph(f"Email: {branding.emails}", styles['company_address'])
+        ]
+
+        header_table = Table([[logo_cell, right_content]], colWidths=self.widths['header'])
+        header_table.setStyle(self.table_styles['header'])
+        return [header_table]
+
+    def section_tagline(self, document):
+        return [Paragraph(f"<i>{document.branding.tagline}</i>", self.styles['tagline'])]
+
+    def section_details(self, document):
+        styles = self.styles
+        client = document.client
+
+        if document.kind == 'invoice':
+            heading = "BILL TO:"
+            trip = document.trip
+            details = [
+                Paragraph("<b>INVOICE DETAILS:</b>", styles['section_header']),
+                Paragraph(f"Invoice No: {document.number}", styles['details_content']),
+                Paragraph(f"Date: {document.date}", styles['details_content']),
+                Paragraph(f"Trip Date: {trip.trip_date}", styles['details_content']),
+                Paragraph(f"Trip Type: {trip.trip_type}", styles['details_content'])
+            ]
+        else:
+            heading = "RECEIVED FROM:"
+            details = [
+                Paragraph("<b>RECEIPT DETAILS:</b>", styles['section_header']),
+                Paragraph(f"Receipt No: {document.number}", styles['details_content']),
+                Paragraph(f"Date: {document.date}", styles['details_content']),
+                Paragraph(f"Payment Method: {document.payment.method}", styles['details_content'])
+            ]
+
+        client_column = [
+            Paragraph(f"<b>{heading}</b>", styles['section_header']),
+            Paragraph(f"<b>{client.name}</b>", styles['details_content']),
+            Paragraph(client.address, styles['details_content']),
+            Paragraph(f"Tel: {client.contact}", styles['details_content'])
+        ]
+
+        details_table = Table([[client_column, details]], colWidths=self.widths['two_column'])
+        details_table.setStyle(self.table_styles['two_column'])
+        return [details_table]
+
+    def section_services(self, document):
+        layout = self.layout
+        styles = layout.styles
+
+        header = [[
+            Paragraph('Description', styles['table_header']),
+            Paragraph('Qty', styles['table_header']),
+            Paragraph(f'Price ({layout.currency_bold})', styles['table_header']),
+            Paragraph(f'Total ({layout.currency_bold})', styles['table_header'])
+        ]]
+
+        # Group headings and subtotals are only shown when items are grouped
+        rows = []
+        for group, items, subtotal in document.item_groups():
+            if group:
+                rows.append(([Paragraph(group, styles['group_heading']), '', '', ''], None, 'group_heading'))
+            for item in items:
+                rows.append(([
+                    self.service_description(item),
+                    Paragraph(str(item.quantity), styles['table_cell_center']),
+                    Paragraph(f"{item.price:,.2f}", styles['table_cell_right']),
+                    Paragraph(f"{item.amount:,.2f}", styles['table_cell_right'])
+                ], item.amount, None))
+            if group:
+                rows.append((['', '',
+                              Paragraph('<b>Subtotal:</b>', styles['total_label']),
+                              Paragraph(f"{subtotal:,.2f}", styles['table_cell_right'])], None, 'group_subtotal'))
+
+        total_row = [
+            '',
+            '',
+            Paragraph('<b>TOTAL AMOUNT:</b>', styles['total_label']),
+            Paragraph(f'<b>{layout.money(document.total, bold=True)}</b>', styles['total_amount'])
+        ]
+
+        def page_subtotal(amount):
+            return ['', '',
+                    Paragraph('<b>PAGE SUBTOTAL:</b>', styles['total_label']),
+                    Paragraph(f'<b>{layout.money(amount, bold=True)}</b>', styles['total_amount'])]
+
+        row_styles = {kind: layout.table_styles[kind].getCommands()
+                      for kind in ('group_heading', 'group_subtotal', 'page_subtotal')}
+        return [PagedTable(header, rows, [total_row], layout.widths['services'], layout.table_styles['services'],
+                           page_subtotal, row_styles)]
+
+    def section_amount(self, document):
+        layout = self.layout
+        amount = Paragraph(layout.money(document.payment.amount, bold=True), layout.styles['amount_paid'])
+        amount_box = Table([[amount]], colWidths=[layout.widths['amount_box']])
+        amount_box.setStyle(layout.table_styles['amount_box'])
+        return [
+            Paragraph("<b>AMOUNT RECEIVED:</b>", layout.styles['section_header']),
+            Spacer(1, 5),
+            amount_box,
+        ]
+
+    def section_description(self, document):
+        elements = [Paragraph("<b>SERVICE DESCRIPTION:</b>", self.styles['section_header']), Spacer(1, 5)]
+        for item in document.items:
+            elements.extend(self.service_description(item))
+        return elements
+
+    def section_signature(self, document):
+        layout = self.layout
+        styles = layout.styles
+        width = layout.widths['signature']
+        signature_data = []
+
+        image_width, image_height = layout.widths['signature_image']
+        signature_img = load_image(document.branding.signature_path, width=image_width, height=image_height)
+        if signature_img:
+            signature_cell = Table([[signature_img]], colWidths=[width])
+            signature_cell.setStyle(layout.table_styles['centered'])
+            signature_data.append([signature_cell])
+
+        signature_text = Table([
+            [Paragraph("Authorized Signature", styles['centered_content'])],
+            [Paragraph(document.branding.name, styles['bold_centered'])]
+        ], colWidths=[width])
+        signature_text.setStyle(layout.table_styles['signature_text'])
+        signature_data.append([signature_text])
+
+        signature_table = Table(signature_data, colWidths=[width])
+        signature_table.setStyle(layout.table_styles['signature'])
+        return [signature_table]
+
+    def section_footer(self, document):
+        layout = self.layout
+        styles = layout.styles
+        default_notes = layout.documents[document.kind].strings.get('default_notes', '')
+        footer_data = [[
+            [
+                Paragraph("<b>ACCOUNT DETAILS:</b>", styles['footer']),
+                Paragraph(document.branding.bank_details, styles['details_content'])
+            ],
+            [
+                Paragraph("<b>Notes:</b>", styles['footer_right']),
+                Paragraph(document.notes or default_notes, styles['notes'])
+            ]
+        ]]
+
+        footer_table = Table(footer_data, colWidths=layout.widths['two_column'])
+        footer_table.setStyle(layout.table_styles['footer'])
+        return [footer_table]
@@ -0,0 +1,188 @@
+"""Compact Helvetica layout for phone screens (HeadlessPDFGenerator); styles live in layouts/mobile.json"""
+from reportlab.platypus import Paragraph, Table
+
+from ..images import load_image
+from ..tables import PagedTable
+from .base import Theme
+
+
+class MobileTheme(Theme):
+    """Small-margin layout with reduced font sizes for mobile readability"""
+    name = 'mobile'
+
+    def details_table(self, rows):
+        """Grey label/value table used for client and trip details"""
+        style = self.styles['details_content']
+        table = Table([[Paragraph(f"<b>{label}</b>", style), Paragraph(value, style)] for label, value in rows],
+                      colWidths=self.widths['details'])
+        table.setStyle(self.table_styles['details'])
+        return table
+
+    def info_table(self, title, document):
+        """Centred title with the document number and date"""
+        styles = self.styles
+        info_table = Table([
+            [Paragraph(title.upper(), styles['title'])],
+            [Paragraph(f"{title} No: <b>{document.number}</b>", styles['details_content'])],
+            [Paragraph(f"Date: <b>{document.date}</b>", styles['details_content'])],
+        ], colWidths=[self.widths['full']])
+        info_table.setStyle(self.table_styles['center'])
+        return info_table
+
+    def client_details(self, heading, client):
+        return [
+            Paragraph(heading, self.styles['section_header']),
+            self.details_table([("Name:", client.name), ("Address:", client.address), ("Contact:", client.contact)]),
+        ]
+
+    # --- Sections ---
+
+    def section_header(self, document):
+        layout = self.layout
+        styles = layout.styles
+        branding = document.branding
+        header_data = [
+            [Paragraph(branding.name, styles['company_name'])],
+            [Paragraph(branding.address, styles['company_address'])],
+            [Paragraph(f"Phones: {branding.phones}", styles['company_contact'])],
+            [Paragraph(f"Emails: {branding.emails}", styles['company_contact'])],
+        ]
+
+        logo_width, logo_height = layout.widths['logo']
+        logo = load_image(branding.logo_path, width=logo_width, height=logo_height, keep_aspect=False)
+        if logo:
+            header_text = Table(header_data, colWidths=[layout.widths['header_text']],
+                                style=layout.table_styles['header_data'])
+            header_table = Table([[logo, header_text]], colWidths=layout.widths['header'])
+            header_table.setStyle(layout.table_styles['top'])
+        else:
+            header_table = Table(header_data, colWidths=[layout.widths['full']])
+            header_table.setStyle(layout.table_styles['left'])
+        return [header_table]
+
+    def section_invoice_info(self, document):
+        return [self.info_table("Invoice", document)]
+
+    def section_receipt_info(self, document):
+        return [self.info_table("Receipt", document)]
+
+    def section_bill_to(self, document):
+        return self.client_details("BILL TO:", document.client)
+
+    def section_received_from(self, document):
+        return self.client_details("RECEIVED FROM:", document.client)
+
+    def section_payment(self, document):
+        payment = document.payment
+        rows = [("Amount Paid:", f"<b>{self.layout.money(payment.amount, bold=True)}</b>"),
+                ("Payment Method:", payment.method)]
+        if payment.date:
+            rows.append(("Payment Date:", payment.date))
+        return [Paragraph("PAYMENT DETAILS:", self.styles['section_header']), self.details_table(rows)]
+
+    def section_trip(self, document):
+        trip = document.trip
+        rows = [
+            ("Trip Type:", trip.trip_type),
+            ("Pickup Point:", trip.pickup),
+            ("Drop Off Point:", trip.dropoff),
+            ("Trip Date:", trip.trip_date),
+        ]
+        if trip.return_date:
+            rows.append(("Return Date:", trip.return_date))
+        return [Paragraph("TRIP DETAILS:", self.styles['section_header']), self.details_table(rows)]
+
+    def section_services(self, document):
+        layout = self.layout
+        styles = layout.styles
+        services_data = [[
+            Paragraph('Description', styles['table_header']),
+            Paragraph('Qty', styles['table_header']),
+            Paragraph(f'Price ({layout.currency_bold})', styles['table_header']),
+            Paragraph(f'Amount ({layout.currency_bold})', styles['table_header'])
+        ]]
+        # The services billed; on a receipt document.total is the amount paid instead
+        services_total = 0
+        for item in document.items:
+            services_total += item.amount
+            services_data.append([
+                Paragraph(item.description, styles['table_cell']),
+                Paragraph(str(item.quantity), styles['table_cell']),
+                Paragraph(f"{item.price:,.2f}", styles['table_cell']),
+                Paragraph(f"{item.amount:,.2f}", styles['table_cell'])
+            ])
+        services_data.append(['', '', Paragraph('<b>TOTAL:</b>', styles['total_label']),
+                              Paragraph(f'<b>{layout.money(services_total, bold=True)}</b>', styles['total_amount'])])
+
+        services_table = Table(services_data, colWidths=layout.widths['services'])
+        services_table.setStyle(layout.table_styles['services'])
+        return [Paragraph("SERVICES:", styles['section_header']), services_table]
+
+    def section_statement_info(self, document):
+        return [self.info_table("Statement", document)]
+
+    def section_statement_summary(self, document):
+        money = self.layout.money
+        charged = sum(entry.amount for entry in document.entries if entry.amount > 0)
+        paid = -sum(entry.amount for entry in document.entries if entry.amount < 0)
+        rows = [("Period:", document.period),
+                ("Opening Balance:", money(document.opening_balance)),
+                ("Invoiced:", money(charged)),
+                ("Paid:", money(paid)),
+                ("Balance Due:", f"<b>{money(document.total, bold=True)}</b>")]
+        return [Paragraph("ACCOUNT SUMMARY:", self.styles['section_header']), self.details_table(rows)]
+
+    def section_statement(self, document):
+        """Every document of the period with the running balance, split across pages with balances carried forward"""
+        layout = self.layout
+        styles = layout.styles
+        money = layout.money
+        header = [[Paragraph(label, styles['table_header'])
+                   for label in ('Date', 'Document', 'Description', 'Invoiced', 'Paid', 'Balance')]]
+
+        def balance_row(label, balance):
+            return [Paragraph(f'<b>{label}</b>', styles['total_label']), '', '', '', '',
+                    Paragraph(f'<b>{money(balance, bold=True)}</b>', styles['total_amount'])]
+
+        rows = [(balance_row('OPENING BALANCE:', document.opening_balance), document.opening_balance, 'opening')]
+        for entry in document.entries:
+            rows.append(([
+                Paragraph(entry.date, styles['table_cell']),
+                Paragraph(f"{entry.kind.capitalize()} {entry.number}", styles['table_cell']),
+                Paragraph(entry.description, styles['table_cell']),
+                Paragraph(money(entry.amount) if entry.amount > 0 else '', styles['table_cell_right']),
+                Paragraph(money(-entry.amount) if entry.amount < 0 else '', styles['table_cell_right']),
+                Paragraph(money(entry.balance), styles['table_cell_right']),
+            ], entry.balance, None))
+
+        table = PagedTable(header, rows, [balance_row('BALANCE DUE:', document.total)],
+                           layout.widths['statement'], layout.table_styles['statement'],
+                           lambda balance: balance_row('BALANCE CARRIED FORWARD:', balance),
+                           {'opening': layout.table_styles['statement_opening'].getCommands(),
+                            'page_subtotal': layout.table_styles['statement_page_subtotal'].getCommands()},
+                           carry_forward=True)
+        return [Paragraph("STATEMENT OF ACCOUNT:", styles['section_header']), table]
+
+    def section_notes(self, document):
+        notes_table = Table([[Paragraph(document.notes, self.styles['details_content'])]],
+                            colWidths=[self.widths['full']])
+        notes_table.setStyle(self.table_styles['notes'])
+        return [Paragraph("ADDITIONAL NOTES:", self.styles['section_header']), notes_table]
+
+    def section_signature(self, document):
+        signature_path = document.branding.signature_path
+        width, height = self.widths['signature_image']
+        signature = load_image(signature_path, width=width, height=height, keep_aspect=False)
+        if not signature:
+            return []
+        return [signature]
+
+    def section_footer(self, document):
+        style = self.styles['details_content']
+        branding = document.branding
+        return [
+            Paragraph(f"<b>Account Details:</b> {branding.bank_details}", style),
+            Paragraph("Thank you for your patronage!", style),
+            Paragraph(f"■ {branding.tagline} ■", style),
+            Paragraph(branding.description, style),
+        ]
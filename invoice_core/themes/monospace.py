@@ -0,0 +1,215 @@
+"""Monospaced Courier layout (nextride_app.py); styles and section order live in layouts/monospace.json"""
+from reportlab.platypus import Paragraph, Spacer, Table
+
+from ..fonts import monospace_fonts
+from ..images import load_image
+from ..tables import PagedTable, RowSource
+from ..text import format_text_for_monospace
+from .base import Theme
+
+
+class MonospaceTheme(Theme):
+    """Courier layout with boxed label/value tables"""
+    name = 'monospace'
+
+    def fonts(self):
+        normal_font, bold_font = monospace_fonts()
+        return {'font': normal_font, 'bold_font': bold_font}
+
+    def label_table(self, rows):
+        """Two-column label/value table"""
+        styles = self.styles
+        table = Table([[Paragraph(label, styles['label']), Paragraph(value, styles['value'])] for label, value in rows],
+                      colWidths=self.widths['label_table'])
+        table.setStyle(self.table_styles['label_table'])
+        return table
+
+    # --- Invoice sections ---
+
+    def section_company(self, document):
+        styles = self.styles
+        branding = document.branding
+        if not branding.name:
+            return []
+
+        company_lines = [[Paragraph(branding.name, styles['company_header'])]]
+        if branding.address:
+            company_lines.append([Paragraph(branding.address, styles['company_subheader'])])
+        if branding.phones:
+            company_lines.append([Paragraph(f"Phones: {branding.phones}", styles['company_subheader'])])
+        if branding.emails:
+            company_lines.append([Paragraph(f"Emails: {branding.emails}", styles['company_subheader'])])
+
+        company_info_table = Table(company_lines, colWidths=[self.widths['full']])
+        company_info_table.setStyle(self.table_styles['company'])
+        return [company_info_table]
+
+    def section_invoice_header(self, document):
+        styles = self.styles
+        invoice_header_table = Table([
+            [Paragraph("TAX INVOICE", styles['title'])],
+            [Paragraph(f"Invoice Number: {document.number}", styles['value'])],
+            [Paragraph(f"Invoice Date: {document.date}", styles['value'])]
+        ], colWidths=[self.widths['full']])
+        invoice_header_table.setStyle(self.table_styles['invoice_header'])
+        return [invoice_header_table]
+
+    def section_client(self, document):
+        client = document.client
+        return [
+            Paragraph("CLIENT INFORMATION", self.styles['header']),
+            self.label_table([
+                ("Name:", format_text_for_monospace(client.name, 50)),
+                ("Address:", format_text_for_monospace(client.address, 50)),
+                ("Contact:", format_text_for_monospace(client.contact, 50)),
+            ]),
+        ]
+
+    def section_trips(self, document):
+        elements = [Paragraph("TRIP DETAILS", self.styles['header'])]
+        if document.trips:
+            elements.append(self.label_table([
+                ("Trip Type:", f"Multiple Round Trips - {len(document.trips)} Scheduled Trips")
+            ]))
+            elements.append(Spacer(1, 8))
+            elements.append(self.trips_table(document.trips))
+        else:
+            trip = document.trip
+            rows = [
+                ("Trip Type:", trip.trip_type),
+                ("Pickup Point:", format_text_for_monospace(trip.pickup, 50)),
+                ("Drop Off Point:", format_text_for_monospace(trip.dropoff, 50)),
+                ("Trip Date:", trip.trip_date),
+                ("Trip Time:", trip.trip_time),
+            ]
+            if trip.trip_type == "Round Trip":
+                rows.extend([("Return Date:", trip.return_date), ("Return Time:", trip.return_time)])
+            elements.append(self.label_table(rows))
+        return elements
+
+    def trips_table(self, trips):
+        """One row per scheduled trip plus a total row, with page subtotals when it runs over pages"""
+        layout = self.layout
+        styles = layout.styles
+        header = [[
+            Paragraph('Trip #', styles['table_header']),
+            Paragraph('Pickup Point', styles['table_header']),
+            Paragraph('Destination', styles['table_header']),
+            Paragraph('Drop Off Point', styles['table_header']),
+            Paragraph('Trip Date/Time', styles['table_header']),
+            Paragraph('Return Date/Time', styles['table_header']),
+            Paragraph('Amount', styles['table_header'])
+        ]]
+
+        def trip_rows(trips_slice, start):
+            rows = []
+            for i, trip in enumerate(trips_slice, start + 1):
+                departure_info = f"{trip.trip_date}\n{trip.trip_time}" if trip.trip_date != 'N/A' else 'N/A'
+                return_info = f"{trip.return_date}\n{trip.return_time}" if trip.return_date != 'N/A' else 'N/A'
+                rows.append(([
+                    Paragraph(str(i), styles['table_cell_center']),
+                    Paragraph(format_text_for_monospace(trip.pickup, 20), styles['table_cell']),
+                    Paragraph(format_text_for_monospace(trip.destination, 20), styles['table_cell']),
+                    Paragraph(format_text_for_monospace(trip.dropoff, 20), styles['table_cell']),
+                    Paragraph(departure_info, styles['table_cell']),
+                    Paragraph(return_info, styles['table_cell']),
+                    Paragraph(layout.money(trip.price), styles['table_cell_right'])
+                ], trip.price, None))
+            return rows
+
+        def total_row(label, amount, label_style='table_header'):
+            return [
+                Paragraph('', styles['table_cell']),
+                Paragraph('', styles['table_cell']),
+                Paragraph('', styles['table_cell']),
+                Paragraph('', styles['table_cell']),
+                Paragraph('', styles['table_cell']),
+                Paragraph(f'<b>{label}</b>', styles[label_style]),
+                Paragraph(f'<b>{layout.money(amount, bold=True)}</b>', styles['total'])
+            ]
+
+        total_amount = sum(trip.price for trip in trips)
+        return PagedTable(header, RowSource(trips, trip_rows), [total_row('TOTAL:', total_amount)],
+                          layout.widths['trips'], layout.table_styles['trips'],
+                          lambda amount: total_row('PAGE SUBTOTAL:', amount, 'total'),
+                          {'page_subtotal': layout.table_styles['trips_page_subtotal'].getCommands()})
+
+    def section_services(self, document):
+        layout = self.layout
+        styles = layout.styles
+        item = document.items[0]
+        services_data = [
+            [Paragraph('Description', styles['table_header']),
+             Paragraph('Qty', styles['table_header']),
+             Paragraph('Unit Price', styles['table_header']),
+             Paragraph('Amount', styles['table_header'])],
+            [Paragraph(format_text_for_monospace(item.description, 35), styles['table_cell']),
+             Paragraph(str(item.quantity), styles['table_cell_center']),
+             Paragraph(layout.money(item.price), styles['table_cell_right']),
+             Paragraph(layout.money(item.amount), styles['table_cell_right'])],
+            ['', '', Paragraph('<b>GRAND TOTAL:</b>', styles['table_header']),
+             Paragraph(f'<b>{layout.money(document.total, bold=True)}</b>', styles['total'])]
+        ]
+
+        services_table = Table(services_data, colWidths=layout.widths['services'])
+        services_table.setStyle(layout.table_styles['services'])
+        return [Paragraph("SERVICES & PAYMENT SUMMARY", styles['header']), services_table]
+
+    def section_notes(self, document):
+        if not document.notes:
+            return []
+        notes_table = Table([[Paragraph(format_text_for_monospace(document.notes, 70), self.styles['value'])]],
+                            colWidths=[self.widths['full']])
+        notes_table.setStyle(self.table_styles['notes'])
+        return [Paragraph("ADDITIONAL NOTES", self.styles['header']), notes_table]
+
+    def section_closing(self, document):
+        styles = self.styles
+        branding = document.branding
+        footer_data = []
+
+        if branding.bank_details:
+            footer_data.append([Paragraph(f"Bank Account Details: {branding.bank_details}", styles['value'])])
+        footer_data.append([Paragraph("Thank you for your business! We appreciate your patronage.", styles['value'])])
+        if branding.tagline:
+            footer_data.append([Paragraph(f"{branding.tagline}", styles['label'])])
+        if branding.description:
+            footer_data.append([Paragraph(branding.description, styles['footer'])])
+
+        footer_table = Table(footer_data, colWidths=[self.widths['full']])
+        footer_table.setStyle(self.table_styles['closing'])
+        return [footer_table]
+
+    def section_signature(self, document):
+        width, height = self.widths['signature_image']
+        signature = load_image(document.branding.signature_path, width=width, height=height)
+        if not signature:
+            return []
+        signature_table = Table([[signature]], colWidths=[self.widths['full']])
+        signature_table.setStyle(self.table_styles['signature'])
+        return [signature_table, Paragraph("Authorized Signature", self.styles['footer'])]
+
+    # --- Receipt sections ---
+
+    def section_receipt_company(self, document):
+        if not document.branding.name:
+            return []
+        return [Paragraph(document.branding.name, self.styles['receipt_title'])]
+
+    def section_receipt_details(self, document):
+        styles = self.styles
+        payment = document.payment
+        description = document.items[0].description if document.items else ''
+        rows = [
+            ("Receipt Number:", document.number),
+            ("Payment Date:", payment.date),
+            ("Client Name:", document.client.name),
+            ("Contact:", document.client.contact),
+            ("Amount Paid:", self.layout.money(payment.amount)),
+            ("Payment Method:", payment.method),
+            ("Description:", description),
+        ]
+        receipt_table = Table([[Paragraph(label, styles['receipt_header']), Paragraph(value, styles['value'])]
+                               for label, value in rows], colWidths=self.widths['receipt'])
+        receipt_table.setStyle(self.table_styles['receipt'])
+        return [receipt_table]
@@ -0,0 +1,225 @@
+"""Cached first-page thumbnails of issued documents
+
+Listings and previews show each invoice's first page as a small PNG instead
+of downloading the PDF. Thumbnails are rasterised with pypdfium2 (optional:
+without it thumbnail() raises ThumbnailUnavailable) at THUMBNAIL_DPI,
+reduced to THUMBNAIL_COLOURS colours and kept in a size-bounded LRU keyed by
+the SHA-256 of the PDF they show, so a re-issued document gets a new
+thumbnail and identical PDFs share one. The hash of a stored PDF is
+remembered with the file's modification time and size, so a request reads
+and hashes the file again only when it has changed. Documents whose PDF is
+not stored are located as a LazyPdf, rendered only when its version (e.g.
+the hash of the archived snapshot) has no thumbnail yet.
+
+    thumbnails = Thumbnails(locate=stored_pdf)   # number -> PDF path, bytes or LazyPdf, or None
+    thumbnails.remember(number, pdf)             # render ahead of time, in the background
+    thumbnails.prewarm(numbers)                  # e.g. the latest documents at startup
+    digest, png = thumbnails.thumbnail(number)   # lazily, on a miss
+
+Background renders run on a single thread so they never take more than one
+core from the requests; a request for a thumbnail being rendered in the
+background waits for that render instead of starting another.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable
+
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
+
+# Resolution of thumbnails: an A4 page is 298 x 421 pixels
+THUMBNAIL_DPI = 36
+# Colours of the PNG palette; a quarter of the size of a true-colour PNG
+THUMBNAIL_COLOURS = 64
+# Bytes of PNG kept in memory
+THUMBNAIL_CACHE_BYTES = 32 * 1024 * 1024
+# Document numbers whose latest PDF hash (and file version) is remembered
+REMEMBERED_NUMBERS = 10000
+
+# PDFium is not thread-safe
+_pdfium_lock = threading.Lock()
+
+
+class ThumbnailUnavailable(RuntimeError):
+    """Thumbnails need the pypdfium2 package"""
+
+
+@dataclass(frozen=True)
+class LazyPdf:
+    """PDF built by render() only when needed; version changes whenever the PDF would"""
+    version: str
+    render: Callable[[], bytes]
+
+
+def document_hash(pdf):
+    """SHA-256 of a PDF's bytes, the key of its thumbnail"""
+    return hashlib.sha256(pdf).hexdigest()
+
+
+def render_thumbnail(pdf, dpi=THUMBNAIL_DPI):
+    """PNG of the first page of pdf (bytes) at dpi"""
+    if pypdfium2 is None:
+        raise ThumbnailUnavailable("Thumbnails need the pypdfium2 package (pip install pypdfium2)")
+    with _pdfium_lock:
+        document = pypdfium2.PdfDocument(pdf)
+        try:
+            page = document[0]
+            image = page.render(scale=dpi / 72, draw_annots=False).to_pil()
+            page.close()
+        finally:
+            document.close()
+    output = io.BytesIO()
+    image.quantize(THUMBNAIL_COLOURS).save(output, 'PNG')
+    return output.getvalue()
+
+
+def _version(source):
+    """(modification time, size) of a PDF path, the version of a LazyPdf, None for bytes"""
+    if isinstance(source, (bytes, bytearray)):
+        return None
+    if isinstance(source, LazyPdf):
+        return source.version
+    stat = os.stat(source)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read(source):
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if isinstance(source, LazyPdf):
+        return source.render()
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+class Thumbnails:
+    """Size-bounded LRU of first-page PNGs, shared by the threads of one process.
+
+    locate(number) returns the path, bytes or LazyPdf of a document's PDF, or
+    None; documents passed to remember() are found without it while their
+    thumbnail is cached.
+    """
+
+    def __init__(self, locate=None, max_bytes=THUMBNAIL_CACHE_BYTES, dpi=THUMBNAIL_DPI):
+        self.locate = locate
+        self.max_bytes = max_bytes
+        self.dpi = dpi
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._pngs = OrderedDict()
+        self._hashes = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._background = ThreadPoolExecutor(max_workers=1, thread_name_prefix='thumbnails')
+
+    def _note(self, number, digest, version=None):
+        with self._lock:
+            self._hashes[number] = (digest, version)
+            self._hashes.move_to_end(number)
+            while len(self._hashes) > REMEMBERED_NUMBERS:
+                self._hashes.popitem(last=False)
+
+    def _png(self, digest, pdf):
+        """Cached PNG of digest, rendering pdf (bytes) once however many threads ask"""
+        with self._lock:
+            png = self._pngs.get(digest)
+            if png is not None:
+                self._pngs.move_to_end(digest)
+                self.hits += 1
+                return png
+            future = self._pending.get(digest)
+            owner = future is None
+            if owner:
+                future = self._pending[digest] = Future()
+                self.misses += 1
+        if not owner:
+            return future.result()
+
+        try:
+            png = render_thumbnail(pdf, self.dpi)
+        except BaseException as e:
+            with self._lock:
+                self._pending.pop(digest, None)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._pending.pop(digest, None)
+            if len(png) <= self.max_bytes:
+                self._pngs[digest] = png
+                self.size += len(png)
+                while self.size > self.max_bytes:
+                    self.size -= len(self._pngs.popitem(last=False)[1])
+        future.set_result(png)
+        return png
+
+    def thumbnail(self, number):
+        """(hash, PNG) of the first page of document number, or None when no PDF of it is stored or cached"""
+        source = self.locate(number) if self.locate is not None else None
+        if source is not None:
+            version = _version(source)
+            with self._lock:
+                digest, known = self._hashes.get(number, (None, None))
+                png = self._pngs.get(digest) if version is not None and version == known else None
+                if png is not None:
+                    # The file is unchanged since it was hashed: it is not read (or rendered) again
+                    self._pngs.move_to_end(digest)
+                    self._hashes.move_to_end(number)
+                    self.hits += 1
+                    return digest, png
+            pdf = _read(source)
+            digest = document_hash(pdf)
+            self._note(number, digest, version)
+            return digest, self._png(digest, pdf)
+
+        with self._lock:
+            digest = self._hashes.get(number, (None, None))[0]
+            png = self._pngs.get(digest) if digest is not None else None
+            if png is not None:
+                self._pngs.move_to_end(digest)
+                self.hits += 1
+                return digest, png
+            future = self._pending.get(digest) if digest is not None else None
+        return (digest, future.result()) if future is not None else None
+
+    def _remember(self, number, source):
+        try:
+            version = _version(source)
+            pdf = _read(source)
+            digest = document_hash(pdf)
+            self._note(number, digest, version)
+            self._png(digest, pdf)
+        except ThumbnailUnavailable:
+            pass
+        except Exception as e:
+            print(f"WARNING: Could not render the thumbnail of {number}: {e}")
+
+    def remember(self, number, pdf):
+        """Render the thumbnail of a newly issued document (PDF path, bytes or LazyPdf) in the background"""
+        if pypdfium2 is not None:
+            self._background.submit(self._remember, number, pdf)
+
+    def _prewarm(self, numbers):
+        for number in numbers:
+            try:
+                self.thumbnail(number)
+            except Exception as e:
+                print(f"WARNING: Could not render the thumbnail of {number}: {e}")
+
+    def prewarm(self, numbers):
+        """Render the thumbnails of stored documents numbers in the background"""
+        if pypdfium2 is not None and self.locate is not None:
+            self._background.submit(self._prewarm, list(numbers))
+
+    def stats(self):
+        """Thumbnails cached, their bytes and the hit rate so far"""
+        with self._lock:
+            return {'thumbnails': len(self._pngs), 'bytes': self.size, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses, 'available': pypdfium2 is not None}
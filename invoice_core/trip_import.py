@@ -0,0 +1,198 @@
+"""Trips imported from CSV or XLSX spreadsheets
+
+Corporate clients send their trip lists as spreadsheets with one trip per
+row. read_rows() streams the rows of an uploaded file (CSV is decoded line by
+line; XLSX is read with openpyxl in read-only mode when it is installed) and
+import_trips() validates them as it goes into Trip records, collecting every
+error with its row number instead of stopping at the first one:
+
+    result = import_trips(upload.stream, upload.filename)
+    result['trips']   # [Trip, ...] ready for a multi-trip Document
+    result['errors']  # [{'row': 7, 'errors': ['Trip date is required']}, ...]
+
+Columns are matched by header, ignoring case, spaces and punctuation
+("Pickup Point", "pickup", "From" all name the pickup).
+"""
+import codecs
+import csv
+import os
+import re
+from datetime import date, datetime, time
+
+from .ledger import iso_date
+from .model import Trip
+
+try:
+    from openpyxl import load_workbook
+except ImportError:
+    load_workbook = None
+
+# Header spellings accepted for each trip field
+COLUMN_ALIASES = {
+    'pickup': ('pickup', 'pickuppoint', 'pickuplocation', 'from', 'origin'),
+    'destination': ('destination', 'to', 'dest'),
+    'dropoff': ('dropoff', 'dropoffpoint', 'drop', 'dropofflocation'),
+    'trip_date': ('tripdate', 'date', 'pickupdate'),
+    'trip_time': ('triptime', 'time', 'pickuptime'),
+    'return_date': ('returndate',),
+    'return_time': ('returntime',),
+    'price': ('price', 'amount', 'fare', 'cost'),
+}
+REQUIRED_COLUMNS = ('pickup', 'destination', 'trip_date')
+# Rows with errors reported in full; later ones are only counted
+MAX_REPORTED_ERRORS = 100
+
+
+class TripImportError(ValueError):
+    """The file cannot be read as a trip spreadsheet"""
+
+
+def _header_key(value):
+    return re.sub(r'[^a-z0-9]', '', str(value or '').lower())
+
+
+def column_map(header):
+    """Trip field of each header column index, for the columns that name one"""
+    aliases = {alias: field for field, names in COLUMN_ALIASES.items() for alias in names}
+    columns = {}
+    for index, name in enumerate(header):
+        field = aliases.get(_header_key(name))
+        if field and field not in columns.values():
+            columns[index] = field
+    missing = [field for field in REQUIRED_COLUMNS if field not in columns.values()]
+    if missing:
+        raise TripImportError(f"Missing column(s): {', '.join(missing)}")
+    return columns
+
+
+def _csv_rows(stream):
+    # Decoded line by line: the upload is never read into memory as a whole
+    try:
+        yield from csv.reader(codecs.iterdecode(stream, 'utf-8-sig'))
+    except UnicodeDecodeError:
+        raise TripImportError("The CSV file is not UTF-8 text; save it as \"CSV UTF-8\"") from None
+    except csv.Error as e:
+        raise TripImportError(f"Could not read the CSV file: {e}") from e
+
+
+def _xlsx_rows(stream):
+    if load_workbook is None:
+        raise TripImportError("XLSX files need the openpyxl package; upload the trips as CSV instead")
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise TripImportError(f"Could not read the XLSX file: {e}") from e
+    try:
+        for values in workbook.worksheets[0].iter_rows(values_only=True):
+            yield ['' if value is None else value for value in values]
+    finally:
+        workbook.close()
+
+
+def read_rows(stream, filename):
+    """Generate (row number, {field: value}) for the trips of a CSV or XLSX upload"""
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        rows = _xlsx_rows(stream)
+    elif extension in ('.csv', '.txt', ''):
+        rows = _csv_rows(stream)
+    else:
+        raise TripImportError(f"Unsupported file type '{extension}'; upload a CSV or XLSX file")
+
+    columns = None
+    for number, values in enumerate(rows, 1):
+        if not any(str(value).strip() for value in values):
+            continue
+        if columns is None:
+            columns = column_map(values)
+            continue
+        yield number, {field: values[index] for index, field in columns.items() if index < len(values)}
+    if columns is None:
+        raise TripImportError("The file is empty")
+
+
+def _date_text(value):
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    return str(value or '').strip()
+
+
+def _time_text(value):
+    if isinstance(value, (datetime, time)):
+        return value.strftime('%H:%M')
+    return str(value or '').strip()
+
+
+def parse_price(value):
+    """Amount of a price cell ("25000", "N25,000.00", "NGN 25,000"), or None when blank"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = re.sub(r'[^\d.\-]', '', str(value or ''))
+    if not text:
+        return None
+    return float(text)
+
+
+def parse_trip(fields, trip_type, price_book=None):
+    """Validate one row's fields: (Trip, []) when they are valid, else (None, errors)"""
+    errors = []
+    pickup = str(fields.get('pickup') or '').strip()
+    destination = str(fields.get('destination') or '').strip()
+    dropoff = str(fields.get('dropoff') or '').strip()
+    if not pickup:
+        errors.append("Pickup is required")
+    if not destination:
+        errors.append("Destination is required")
+
+    dates = {}
+    for field, label in (('trip_date', 'Trip date'), ('return_date', 'Return date')):
+        text = _date_text(fields.get(field))
+        if text and iso_date(text) is None:
+            errors.append(f"{label} '{text}' is not a date")
+        dates[field] = iso_date(text) or text
+    if not dates['trip_date']:
+        errors.append("Trip date is required")
+
+    try:
+        price = parse_price(fields.get('price'))
+    except ValueError:
+        price = None
+        errors.append(f"Price '{fields.get('price')}' is not a number")
+    else:
+        if not price and price_book is not None and pickup and (destination or dropoff):
+            price = price_book.suggest(pickup, destination or dropoff, trip_type)['price']
+        if not price or price <= 0:
+            errors.append("Price must be greater than 0")
+
+    if errors:
+        return None, errors
+    return Trip(trip_type=trip_type, pickup=pickup, destination=destination, dropoff=dropoff or 'N/A',
+                trip_date=dates['trip_date'], trip_time=_time_text(fields.get('trip_time')) or 'N/A',
+                return_date=dates['return_date'] or 'N/A',
+                return_time=_time_text(fields.get('return_time')) or 'N/A', price=price), []
+
+
+def import_trips(stream, filename, trip_type='Multiple Round Trips', price_book=None, max_rows=None):
+    """Validate the trips of an upload in one pass.
+
+    Returns a dict with the valid trips (Trip records), the rows read, their
+    total and the errors of invalid rows as [{'row': n, 'errors': [...]}];
+    price_book fills prices left blank. Raises TripImportError when the file
+    cannot be read or has more than max_rows trips.
+    """
+    trips, errors = [], []
+    rows = invalid = 0
+    total = 0.0
+    for number, fields in read_rows(stream, filename):
+        rows += 1
+        if max_rows is not None and rows > max_rows:
+            raise TripImportError(f"Too many trips: at most {max_rows} can be imported at once")
+        trip, row_errors = parse_trip(fields, trip_type, price_book)
+        if trip is None:
+            invalid += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'row': number, 'errors': row_errors})
+            continue
+        trips.append(trip)
+        total += trip.price
+    return {'trips': trips, 'rows': rows, 'invalid_rows': invalid, 'total': total, 'errors': errors}
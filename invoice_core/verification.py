@@ -0,0 +1,143 @@
+"""Verification codes for issued invoices and receipts
+
+Every issued document is recorded in a small SQLite registry keyed by its
+number, together with a truncated HMAC-SHA256 of its number, kind, date,
+client and total. The QR code printed on the document carries the number and
+that code; /verify/<number>?code=... looks the number up by primary key and
+compares the codes in constant time, so checking a receipt costs one indexed
+read whatever the size of the archive.
+
+The signing key comes from the DOCUMENT_SIGNING_KEY environment variable, or
+from a random key generated once into the registry's directory. A number is
+issued once: issue() raises DuplicateNumber for a number already recorded,
+so the code printed on the first copy of a document is the only one that
+verifies.
+"""
+import hashlib
+import hmac
+import os
+import secrets
+import sqlite3
+from datetime import datetime
+from urllib.parse import quote
+
+from .storage import DEFAULT_DB_PATH, connect, prepare
+
+# Hex digits of the HMAC printed on documents (64 bits)
+CODE_LENGTH = 16
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    number TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    date TEXT NOT NULL,
+    client TEXT NOT NULL,
+    total REAL NOT NULL,
+    code TEXT NOT NULL,
+    issued_at TEXT NOT NULL
+)
+"""
+
+
+class DuplicateNumber(ValueError):
+    """The document number has already been issued"""
+
+
+def load_key(directory):
+    """Signing key from DOCUMENT_SIGNING_KEY or <directory>/signing.key (created once)"""
+    key = os.environ.get('DOCUMENT_SIGNING_KEY')
+    if key:
+        return key.encode('utf-8')
+
+    path = os.path.join(directory, 'signing.key')
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    key = secrets.token_hex(32).encode('ascii')
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another process created it first
+        with open(path, 'rb') as f:
+            return f.read()
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    print(f"Generated document signing key: {path}")
+    return key
+
+
+def signed_fields(number, kind, date, client, total):
+    """Canonical text covered by a document's code"""
+    return '\x1f'.join([number, kind, date, client, f"{float(total):.2f}"])
+
+
+def sign(key, number, kind, date, client, total):
+    """Truncated HMAC of a document's identifying fields"""
+    message = signed_fields(number, kind, date, client, total).encode('utf-8')
+    return hmac.new(key, message, hashlib.sha256).hexdigest()[:CODE_LENGTH]
+
+
+class DocumentRegistry:
+    """Issued documents and their verification codes"""
+
+    def __init__(self, path=DEFAULT_DB_PATH, key=None):
+        self.path = path
+        self.key = key or load_key(prepare(path))
+        with connect(path) as conn:
+            conn.execute(SCHEMA)
+
+    def stamp(self, document, base_url=''):
+        """Set the QR payload document will print when issued, without recording it; returns its code"""
+        code = sign(self.key, document.number, document.kind, document.date, document.client.name, document.total)
+        document.verification = f"{base_url.rstrip('/')}/verify/{quote(document.number, safe='')}?code={code}"
+        return code
+
+    def issue(self, document, base_url=''):
+        """Record document and set the QR payload it prints; returns its code.
+
+        base_url is the site root the /verify link is built on. Raises
+        DuplicateNumber when the number has already been issued.
+        """
+        total = document.total
+        code = self.stamp(document, base_url)
+        try:
+            with connect(self.path) as conn:
+                conn.execute(
+                    "INSERT INTO documents (number, kind, date, client, total, code, issued_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (document.number, document.kind, document.date, document.client.name, total, code,
+                     datetime.now().isoformat(timespec='seconds')))
+        except sqlite3.IntegrityError:
+            # Issued by another request since check_unused()
+            raise DuplicateNumber(f"Number {document.number} has already been issued; use a new number")
+        return code
+
+    def check_unused(self, number):
+        """Raise DuplicateNumber when number has already been issued"""
+        if self.lookup(number) is not None:
+            raise DuplicateNumber(f"Number {number} has already been issued; use a new number")
+
+    def lookup(self, number):
+        """Registry row of number, or None"""
+        with connect(self.path) as conn:
+            return conn.execute("SELECT * FROM documents WHERE number = ?", (number,)).fetchone()
+
+    def recent(self, limit=50):
+        """Numbers of the limit documents issued last, newest first"""
+        with connect(self.path) as conn:
+            return [row['number'] for row in conn.execute(
+                "SELECT number FROM documents ORDER BY issued_at DESC LIMIT ?", (limit,))]
+
+    def verify(self, number, code):
+        """Return the document's row when code matches it, else None"""
+        row = self.lookup(number)
+        supplied = (code or '').strip().lower().encode('utf-8')
+        if row is None or not hmac.compare_digest(row['code'].encode('ascii'), supplied):
+            return None
+        # Also reject rows edited after issue
+        expected = sign(self.key, row['number'], row['kind'], row['date'], row['client'], row['total'])
+        if not hmac.compare_digest(expected, row['code']):
+            return None
+        return row
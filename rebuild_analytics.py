@@ -0,0 +1,21 @@
+import sys
+import time
+
+from invoice_core import Analytics
+from invoice_core.analytics import np
+
+
+def rebuild_analytics(db_path=None):
+    """Count the ledger documents missing from the revenue analytics and recompute its daily and monthly aggregates"""
+    if np is None:
+        print("WARNING: numpy is not installed; analytics rollups will use the slower pure-Python path.")
+    start = time.perf_counter()
+    analytics = Analytics(db_path) if db_path else Analytics()
+    added = analytics.backfill()
+    documents = analytics.rebuild()
+    print(f"Backfilled {added} ledger documents and rebuilt the aggregates of {documents} documents "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    rebuild_analytics(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,20 @@
+import os
+import sys
+import time
+
+from invoice_core import SearchIndex
+from invoice_core.search import PdfReader
+
+
+def rebuild_search_index(archive_dirs):
+    """Re-index stored documents and the archived invoice/receipt PDFs in archive_dirs"""
+    if archive_dirs and PdfReader is None:
+        print("WARNING: pypdf is not installed; archived PDFs will not be indexed.")
+    start = time.perf_counter()
+    stored, archived = SearchIndex().rebuild(archive_dirs)
+    print(f"Indexed {stored} stored documents and {archived} archived PDFs in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    # Archived PDFs are kept next to the apps unless directories are given
+    rebuild_search_index(sys.argv[1:] or [os.path.dirname(os.path.abspath(__file__))])
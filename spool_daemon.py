@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+from batch_generate import QUEUED_PER_JOB, _render, _start_worker, output_name
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = flags = None
+
+# Seconds between directory scans without inotify, and the longest wait for an event with it
+POLL_INTERVAL = 1.0
+# Seconds between throughput lines while the daemon is busy
+STATS_INTERVAL = 30.0
+
+
+def _start_spool_worker(logo_path, signature_path):
+    # Ctrl+C stops the daemon, which lets the workers finish their documents
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _start_worker(logo_path, signature_path)
+
+
+def _write_json(path, data):
+    # Written under a temporary name and renamed, so readers never see half a status file
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+class SpoolDaemon:
+    """Render the JSON specs dropped into a spool directory.
+
+    A spec is one JSON object with the fields read by batch_generate.py,
+    written to spool_dir under a temporary name and renamed to *.json when
+    complete. The daemon claims it by renaming it into processing/, renders
+    it on a pool of worker processes and moves it to done/ or error/ next to
+    a .status.json file; the PDF goes to output_dir (spool_dir/pdf by default).
+
+    Specs are claimed oldest first and only as workers free up, so a burst of
+    thousands of files waits in the spool instead of in memory and is
+    rendered at the pool's steady rate. One daemon runs per spool directory.
+    """
+
+    def __init__(self, spool_dir, output_dir=None, jobs=None, logo_path=None, signature_path=None, poll=False):
+        self.spool_dir = os.path.abspath(spool_dir)
+        self.processing_dir = os.path.join(self.spool_dir, 'processing')
+        self.done_dir = os.path.join(self.spool_dir, 'done')
+        self.error_dir = os.path.join(self.spool_dir, 'error')
+        self.output_dir = os.path.abspath(output_dir or os.path.join(self.spool_dir, 'pdf'))
+        for directory in (self.processing_dir, self.done_dir, self.error_dir, self.output_dir):
+            os.makedirs(directory, exist_ok=True)
+        self.jobs = jobs or os.cpu_count() or 1
+        self.logo_path = logo_path
+        self.signature_path = signature_path
+
+        self.backlog = deque()
+        self.pending = {}
+        self.running = False
+        self.rendered = self.failed = 0
+
+        self.inotify = None
+        if INotify is not None and not poll:
+            try:
+                self.inotify = INotify()
+                self.inotify.add_watch(self.spool_dir, flags.CLOSE_WRITE | flags.MOVED_TO)
+            except OSError as e:
+                print(f"WARNING: Could not watch {self.spool_dir} with inotify ({e}). Polling instead.")
+                self.inotify = None
+
+    def stop(self, *_args):
+        """Stop claiming specs; run() returns once the ones being rendered are finished"""
+        if self.running:
+            print("Stopping: finishing the documents being rendered")
+        self.running = False
+
+    def recover(self):
+        """Put back specs left in processing/ by a daemon that stopped mid-render"""
+        for name in os.listdir(self.processing_dir):
+            os.replace(os.path.join(self.processing_dir, name), os.path.join(self.spool_dir, name))
+            print(f"Re-queued {name}")
+
+    def scan(self):
+        """Queue the complete specs waiting in the spool, oldest first"""
+        entries = []
+        with os.scandir(self.spool_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.json') and not entry.name.startswith('.') and entry.is_file():
+                    try:
+                        entries.append((entry.stat().st_mtime, entry.name))
+                    except FileNotFoundError:
+                        continue
+        entries.sort()
+        self.backlog.extend(name for _mtime, name in entries)
+
+    def claim(self, executor, name):
+        """Move a spec into processing/ and submit it; False when it was already gone"""
+        path = os.path.join(self.processing_dir, name)
+        try:
+            os.rename(os.path.join(self.spool_dir, name), path)
+        except FileNotFoundError:
+            return False
+        try:
+            with open(path, encoding='utf-8-sig') as f:
+                spec = json.load(f)
+            if not isinstance(spec, dict):
+                raise ValueError("Expected a JSON object")
+            output_path = os.path.join(self.output_dir, output_name(spec))
+        except ValueError as e:
+            self.finish(name, None, 0.0, f"Invalid spec: {e}")
+            return True
+        self.pending[executor.submit(_render, spec, output_path)] = (name, output_path)
+        return True
+
+    def finish(self, name, output_path, seconds, error):
+        """Move a rendered spec to done/ or error/ with its status file"""
+        status = {'spec': name, 'status': 'failed' if error else 'done', 'output': None if error else output_path,
+                  'error': error, 'seconds': round(seconds, 3),
+                  'finished_at': datetime.now().isoformat(timespec='seconds')}
+        directory = self.error_dir if error else self.done_dir
+        os.replace(os.path.join(self.processing_dir, name), os.path.join(directory, name))
+        _write_json(os.path.join(directory, name[:-len('.json')] + '.status.json'), status)
+        if error:
+            self.failed += 1
+            print(f"ERROR: {name}: {error}")
+        else:
+            self.rendered += 1
+
+    def fill(self, executor, capacity, rescan):
+        """Claim specs until capacity documents are in flight; returns whether the spool still needs a scan"""
+        while self.running and len(self.pending) < capacity:
+            if not self.backlog:
+                if not rescan:
+                    break
+                self.scan()
+                rescan = False
+                if not self.backlog:
+                    break
+            self.claim(executor, self.backlog.popleft())
+        return rescan
+
+    def changed(self, timeout):
+        """Wait up to timeout seconds for new specs; True when the spool should be scanned again"""
+        if self.inotify is None:
+            time.sleep(timeout)
+            return True
+        # Any event (including a queue overflow) just triggers a full scan
+        return bool(self.inotify.read(timeout=int(timeout * 1000)))
+
+    def run(self, once=False):
+        """Render specs until stop() (or, with once, until the spool is empty)"""
+        self.running = True
+        self.recover()
+        capacity = self.jobs * QUEUED_PER_JOB
+        print(f"Watching {self.spool_dir} with {'inotify' if self.inotify else 'polling'} on {self.jobs} "
+              f"worker process(es); PDFs go to {self.output_dir}")
+
+        rescan, last_scan = True, time.monotonic()
+        last_stats, last_count = time.monotonic(), 0
+        with ProcessPoolExecutor(max_workers=self.jobs, initializer=_start_spool_worker,
+                                 initargs=(self.logo_path, self.signature_path)) as executor:
+            while self.running or self.pending:
+                if rescan:
+                    last_scan = time.monotonic()
+                rescan = self.fill(executor, capacity, rescan)
+                if once and not self.pending and not self.backlog and not rescan:
+                    break
+
+                if self.pending:
+                    for future in wait(self.pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED).done:
+                        name, output_path = self.pending.pop(future)
+                        self.finish(name, output_path, *future.result())
+                    if self.inotify is not None:
+                        rescan = rescan or bool(self.inotify.read(timeout=0))
+                    else:
+                        rescan = rescan or time.monotonic() - last_scan >= POLL_INTERVAL
+                elif self.running:
+                    rescan = self.changed(POLL_INTERVAL)
+
+                now = time.monotonic()
+                if now - last_stats >= STATS_INTERVAL:
+                    done = self.rendered + self.failed
+                    if done != last_count:
+                        rate = (done - last_count) / (now - last_stats)
+                        print(f"{self.rendered} rendered, {self.failed} failed; {rate:.1f} documents/s; "
+                              f"{len(self.backlog)} queued, {len(self.pending)} in progress")
+                    last_stats, last_count = now, done
+        print(f"Stopped: {self.rendered} rendered, {self.failed} failed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render invoice and receipt specs dropped into a spool directory.")
+    parser.add_argument('spool_dir', help="directory watched for *.json specs")
+    parser.add_argument('--output', help="directory the PDFs are written to (default: SPOOL_DIR/pdf)")
+    parser.add_argument('--jobs', '-j', type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument('--poll', action='store_true', help="scan the directory every second instead of using inotify")
+    parser.add_argument('--once', action='store_true', help="exit once the spool is empty")
+    parser.add_argument('--logo', help="logo image (default: static/logo.png)")
+    parser.add_argument('--signature', help="signature image (default: static/signature.png)")
+    args = parser.parse_args()
+
+    daemon = SpoolDaemon(args.spool_dir, args.output, args.jobs, args.logo, args.signature, args.poll)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    daemon.run(args.once)
+    sys.exit(0)
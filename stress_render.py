@@ -0,0 +1,74 @@
+import hashlib
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from reportlab import rl_config
+
+from invoice_core import Branding, Client, Document, LineItem, Payment, Trip, render_document
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOGO_PATH = os.path.join(BASE_DIR, 'static', 'logo.png')
+SIGNATURE_PATH = os.path.join(BASE_DIR, 'static', 'signature.png')
+
+# Theme and document kind of every rendered sample, cycled
+VARIANTS = (('latex', 'invoice'), ('latex', 'receipt'), ('monospace', 'invoice'), ('monospace', 'receipt'),
+            ('mobile', 'invoice'))
+
+
+def sample_document(index):
+    """Invoice or receipt number index, different for every index"""
+    theme, kind = VARIANTS[index % len(VARIANTS)]
+    branding = Branding(name='NextRide & Logistics', address='No 29 Amoda Alli Street, Gbagada, Lagos',
+                        phones='08023428564', emails='nextflight77@gmail.com', tagline='Safety. Luxury. Value.',
+                        footer=f'Stress render {index}', bank_details='Bank: Sterling Bank',
+                        logo_path=LOGO_PATH, signature_path=SIGNATURE_PATH)
+    client = Client(name=f'Client {index}', address=f'{index} Ikorodu Road, Lagos', contact=f'0803{index:07d}')
+    trips = [Trip(trip_type='Multiple Round Trips', pickup=f'Gbagada {index}-{n}', destination='Ikeja',
+                  dropoff='Gbagada', trip_date='2025-05-01', trip_time='09:00', return_date='2025-05-01',
+                  return_time='17:00', price=1000.0 + n)
+             for n in range(index % 40)]
+    items = [LineItem(description=f'Bus hire {n}', quantity=n + 1, price=25000.0 + index,
+                      route='Gbagada -> Ikeja', service_scope='- AC\n- Driver')
+             for n in range(1 + index % 4)]
+    return theme, Document(kind=kind, number=f'STRESS-{index:05d}', date='May 01, 2025', client=client,
+                           branding=branding, trips=trips if kind == 'invoice' else [],
+                           trip=Trip(trip_type='One Way', pickup='Gbagada', dropoff='Ikeja', trip_date='2025-05-01'),
+                           items=items, payment=Payment(amount=5000.0 + index, method='Transfer', date='May 01, 2025'),
+                           notes=f'Reference {index}', verification=f'https://example.com/verify/STRESS-{index:05d}')
+
+
+def render(index):
+    theme, document = sample_document(index)
+    return hashlib.sha256(render_document(document, theme=theme).getvalue()).hexdigest()
+
+
+def stress_render(count=300, threads=16):
+    """Render count documents serially, then on threads in random order, and compare the bytes"""
+    # Fixed creation dates and document ids, so equal input gives equal bytes
+    rl_config.invariant = 1
+    start = time.perf_counter()
+    serial = [render(index) for index in range(count)]
+    serial_time = time.perf_counter() - start
+
+    order = list(range(count))
+    random.shuffle(order)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        threaded = dict(zip(order, executor.map(render, order)))
+    threaded_time = time.perf_counter() - start
+
+    mismatches = [index for index in range(count) if threaded[index] != serial[index]]
+    print(f"Serial: {count} documents in {serial_time:.2f}s; "
+          f"{threads} threads: {threaded_time:.2f}s; mismatches: {len(mismatches)}")
+    for index in mismatches[:10]:
+        print(f"  {VARIANTS[index % len(VARIANTS)]} document {index} differs from its serial render")
+    return not mismatches
+
+
+if __name__ == "__main__":
+    # python stress_render.py [DOCUMENTS] [THREADS]
+    arguments = [int(value) for value in sys.argv[1:3]]
+    sys.exit(0 if stress_render(*arguments) else 1)